@@ -0,0 +1,3 @@
+from komm_vqa.cli import main
+
+raise SystemExit(main())
@@ -1,16 +1,33 @@
 """Image viewer component with caching for thumbnails."""
 
-from io import BytesIO
+import math
+import os
+from contextlib import suppress
 
 import streamlit as st
-from PIL import Image
 
 from komm_vqa.app.db import get_service
+from komm_vqa.app.file_server import URL_ENV, get_file_server
+from komm_vqa.ingest.atlas import ThumbnailAtlas, open_atlas
+from komm_vqa.ingest.blobs import get_blob_store
+from komm_vqa.ingest.image_cache import get_image_cache
+from komm_vqa.ingest.images import image_metadata
+from komm_vqa.ingest.lookups import get_document_pages, get_image_refs, get_page
+from komm_vqa.ingest.pipeline import get_page_image, get_page_images
+from komm_vqa.ingest.renditions import FULL, MEDIUM, RENDITION_SIZES, THUMBNAIL, get_renditions, make_thumbnail
+
+# Pages per window of a page gallery
+GALLERY_PAGE_SIZE = 24
 
 
 @st.cache_data(ttl=3600, max_entries=500)
 def load_thumbnail(page_id: str, size: tuple[int, int] = (200, 200)) -> bytes | None:
-    """Load and cache page thumbnail from ImageChunk.
+    """Load and cache page thumbnail.
+
+    The thumbnail rendition stored at ingest is returned as-is when it fits
+    ``size``. Otherwise the smallest larger rendition (or, for pages without
+    renditions, the full ImageChunk image) is decoded at reduced scale and
+    downscaled. Results are also kept in the persistent disk cache.
 
     Args:
         page_id: Page ID (used as cache key)
@@ -19,25 +36,95 @@ def load_thumbnail(page_id: str, size: tuple[int, int] = (200, 200)) -> bytes |
     Returns:
         JPEG image bytes or None if not found
     """
-    service = get_service()
-    with service._create_uow() as uow:
-        # Load image from ImageChunk (not Page.image_contents)
-        image_chunks = uow.image_chunks.get_by_page_id(page_id)
-        if image_chunks and image_chunks[0].contents:
-            try:
-                img = Image.open(BytesIO(image_chunks[0].contents))
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                buffer = BytesIO()
-                img.save(buffer, format="JPEG", quality=85)
-                return buffer.getvalue()
-            except Exception:
-                return None
-    return None
+    return _load_thumbnails([page_id], size).get(page_id)
+
+
+@st.cache_data(ttl=3600, max_entries=100)
+def load_thumbnails(page_ids: tuple[str, ...], size: tuple[int, int] = (200, 200)) -> dict[str, bytes]:
+    """Load and cache the thumbnails of several pages, made like ``load_thumbnail``.
+
+    Pages missing from the disk cache are fetched together: one query for
+    their renditions and, for pages without one, one query for their full
+    images; the disk cache is then filled for all of them.
+
+    Args:
+        page_ids: Page IDs (used as cache key)
+        size: Maximum thumbnail size (width, height)
+
+    Returns:
+        JPEG image bytes by page ID; pages without an image are left out
+    """
+    return _load_thumbnails(list(page_ids), size)
+
+
+def _load_thumbnails(page_ids: list[str], size: tuple[int, int]) -> dict[str, bytes]:
+    return get_image_cache().get_or_load_many(
+        page_ids, f"{THUMBNAIL}:{size[0]}x{size[1]}", lambda missing: _make_thumbnails(missing, size)
+    )
+
+
+def _make_thumbnails(page_ids: list[str], size: tuple[int, int]) -> dict[str, bytes]:
+    name = THUMBNAIL if max(size) <= RENDITION_SIZES[THUMBNAIL] else MEDIUM
+    renditions = get_renditions(get_service(), page_ids, name)
+
+    thumbnails, sources = {}, {}
+    for page_id, rendition in renditions.items():
+        if rendition.width <= size[0] and rendition.height <= size[1]:
+            thumbnails[page_id] = rendition.contents
+        else:
+            sources[page_id] = rendition.contents
+    sources.update(_load_full_images([page_id for page_id in page_ids if page_id not in renditions]))
+
+    for page_id, source in sources.items():
+        # Images Pillow cannot decode get no thumbnail
+        with suppress(Exception):
+            thumbnails[page_id] = make_thumbnail(source, size).contents
+    return thumbnails
+
+
+@st.cache_data(ttl=300, max_entries=50)
+def load_preview(page_id: str) -> bytes | None:
+    """Load and cache the medium preview of a page, or its full image if it is not larger than that.
+
+    Args:
+        page_id: Page ID (used as cache key)
+
+    Returns:
+        Image bytes or None if not found
+    """
+    return _load_previews([page_id]).get(page_id)
+
+
+@st.cache_data(ttl=300, max_entries=20)
+def load_previews(page_ids: tuple[str, ...]) -> dict[str, bytes]:
+    """Load and cache the previews of several pages (see ``load_preview``) with batched queries.
+
+    Args:
+        page_ids: Page IDs (used as cache key)
+
+    Returns:
+        Image bytes by page ID; pages without an image are left out
+    """
+    return _load_previews(list(page_ids))
+
+
+def _load_previews(page_ids: list[str]) -> dict[str, bytes]:
+    return get_image_cache().get_or_load_many(page_ids, MEDIUM, _fetch_previews)
+
+
+def _fetch_previews(page_ids: list[str]) -> dict[str, bytes]:
+    previews = {page_id: r.contents for page_id, r in get_renditions(get_service(), page_ids, MEDIUM).items()}
+    previews.update(_load_full_images([page_id for page_id in page_ids if page_id not in previews]))
+    return previews
+
+
+def _load_full_images(page_ids: list[str]) -> dict[str, bytes]:
+    return get_image_cache().get_or_load_many(page_ids, FULL, lambda missing: get_page_images(get_service(), missing))
 
 
 @st.cache_data(ttl=300, max_entries=50)
 def load_full_image(page_id: str) -> bytes | None:
-    """Load and cache full page image from ImageChunk.
+    """Load and cache full page image from ImageChunk, through the persistent disk cache.
 
     Args:
         page_id: Page ID (used as cache key)
@@ -45,13 +132,114 @@ def load_full_image(page_id: str) -> bytes | None:
     Returns:
         Image bytes or None if not found
     """
-    service = get_service()
-    with service._create_uow() as uow:
-        # Load image from ImageChunk (not Page.image_contents)
-        image_chunks = uow.image_chunks.get_by_page_id(page_id)
-        if image_chunks and image_chunks[0].contents:
-            return image_chunks[0].contents
-    return None
+    return get_image_cache().get_or_load(page_id, FULL, lambda: get_page_image(get_service(), page_id))
+
+
+@st.cache_data(ttl=300, max_entries=500)
+def load_page_metadata(page_id: str) -> dict:
+    """Load and cache the ``page_metadata`` of a page (image size, codec, DPI, ...).
+
+    Args:
+        page_id: Page ID (used as cache key)
+
+    Returns:
+        Page metadata, empty if the page does not exist
+    """
+    with get_service()._create_uow() as uow:
+        page = get_page(uow, page_id)
+        return dict(page.page_metadata or {}) if page else {}
+
+
+def format_image_info(metadata: dict) -> str:
+    """Summarize image metadata recorded at ingest, e.g. ``1240 x 1754 px | 412 KB | JPEG | 150 DPI``.
+
+    Args:
+        metadata: Page metadata (see ``komm_vqa.ingest.images.image_metadata``)
+
+    Returns:
+        Summary of the fields that are present
+    """
+    parts = []
+    if "width" in metadata and "height" in metadata:
+        parts.append(f"{metadata['width']} x {metadata['height']} px")
+    if metadata.get("bytes"):
+        parts.append(f"{metadata['bytes'] / 1024:,.0f} KB")
+    if metadata.get("codec"):
+        parts.append(metadata["codec"].upper())
+    if metadata.get("dpi"):
+        parts.append(f"{metadata['dpi']} DPI")
+    return " | ".join(parts)
+
+
+def serves_images() -> bool:
+    """Whether page images are shown through file server URLs (see ``image_sources``)."""
+    return bool(os.environ.get(URL_ENV)) and get_blob_store() is not None
+
+
+@st.cache_data(ttl=3600, max_entries=200)
+def load_image_urls(page_ids: tuple[str, ...], rendition: str = FULL) -> dict[str, str]:
+    """Load and cache the file server URLs of page images kept in the blob store, without loading the images.
+
+    Args:
+        page_ids: Page IDs (used as cache key)
+        rendition: ``FULL``, ``MEDIUM`` or ``THUMBNAIL``
+
+    Returns:
+        URL by page ID; pages whose image is stored inline in Postgres are left out
+    """
+    with get_service()._create_uow() as uow:
+        refs = get_image_refs(uow, list(page_ids), rendition)
+    file_server = get_file_server()
+    return {page_id: file_server.url_for_blob(key, mimetype) for page_id, (key, mimetype) in refs.items()}
+
+
+def image_sources(page_ids: list[str], rendition: str = FULL) -> dict[str, str | bytes]:
+    """Get what to pass to ``st.image`` for several page images: their URLs or their bytes.
+
+    When ``KOMM_VQA_FILE_SERVER_URL`` gives an address of the file server the
+    browser can reach, images in the blob store are shown through their
+    immutable URLs, so the browser fetches each one once and keeps it across
+    reruns and sessions. Other images are loaded through the caches and sent
+    over the websocket.
+
+    Args:
+        page_ids: Page IDs
+        rendition: ``FULL``, ``MEDIUM`` (preview, see ``load_preview``) or ``THUMBNAIL`` (see ``load_thumbnail``)
+
+    Returns:
+        URL or image bytes by page ID; pages without an image are left out
+    """
+    sources: dict[str, str | bytes] = {}
+    if serves_images():
+        sources.update(load_image_urls(tuple(page_ids), rendition))
+    missing = tuple(page_id for page_id in page_ids if page_id not in sources)
+    if missing:
+        if rendition == THUMBNAIL:
+            sources.update(load_thumbnails(missing))
+        elif rendition == MEDIUM:
+            sources.update(load_previews(missing))
+        else:
+            sources.update((page_id, data) for page_id in missing if (data := load_full_image(page_id)))
+    return sources
+
+
+def image_source(page_id: str, rendition: str = FULL) -> str | bytes | None:
+    """Get what to pass to ``st.image`` for one page image (see ``image_sources``)."""
+    return image_sources([page_id], rendition).get(page_id)
+
+
+@st.cache_resource(max_entries=20)
+def load_atlas(document_id: str, page_count: int) -> ThumbnailAtlas:
+    """Open and cache the memory-mapped thumbnail atlas of a document.
+
+    Args:
+        document_id: Document ID (used as cache key)
+        page_count: Current page count (used as cache key, so a grown document gets a fresh atlas)
+
+    Returns:
+        The atlas, built first if missing or stale
+    """
+    return open_atlas(get_service(), document_id, page_count)
 
 
 def render_page_thumbnail(page_id: str, page_num: int, size: tuple[int, int] = (200, 200)) -> None:
@@ -62,7 +250,11 @@ def render_page_thumbnail(page_id: str, page_num: int, size: tuple[int, int] = (
         page_num: Page number for caption
         size: Thumbnail size
     """
-    thumb = load_thumbnail(page_id, size)
+    # The stored thumbnail rendition fits any box at least its size
+    if min(size) >= RENDITION_SIZES[THUMBNAIL]:
+        thumb = image_source(page_id, THUMBNAIL)
+    else:
+        thumb = load_thumbnail(page_id, size)
     if thumb:
         st.image(thumb, caption=f"Page {page_num}", width="stretch")
     else:
@@ -74,44 +266,161 @@ def render_page_gallery(
     columns: int = 4,
     selectable: bool = False,
     selected_ids: set[str] | None = None,
+    atlas: ThumbnailAtlas | None = None,
+    page_size: int = GALLERY_PAGE_SIZE,
+    key: str = "gallery",
 ) -> list[str]:
-    """Render page gallery with optional selection.
+    """Render page gallery with optional selection, one window of ``page_size`` pages at a time.
+
+    Only the thumbnails of the visible window are loaded, so a document with
+    thousands of pages renders like a short one. The thumbnails of the next
+    window are loaded as well and preloaded by the browser, so paging
+    forward shows them immediately. Without selection the gallery is a
+    fragment: paging (also with the Left/Right/Home/End keys) reruns only the
+    gallery, not the whole page. A selectable gallery reruns the whole page,
+    so the selection it returns is never stale. The selection is kept in
+    session state across windows.
 
     Args:
         pages: List of Page objects
         columns: Number of columns in gallery
         selectable: Whether to show checkboxes for selection
-        selected_ids: Set of pre-selected page IDs
+        selected_ids: Set of pre-selected page IDs (used when the gallery is first shown)
+        atlas: Thumbnail atlas of the pages' document; thumbnails of pages not in it are loaded in one batch
+        page_size: Number of pages per window
+        key: Session state key prefix, unique per gallery on a page
 
     Returns:
-        List of selected page IDs (if selectable=True)
+        List of selected page IDs, in page order (if selectable=True)
     """
-    if selected_ids is None:
-        selected_ids = set()
+    if not selectable:
+        _render_gallery_fragment(pages, columns, False, None, atlas, page_size, key)
+        return []
+    return _render_gallery(pages, columns, True, selected_ids, atlas, page_size, key)
 
-    selected = []
-    cols = st.columns(columns)
 
-    for i, page in enumerate(pages):
+def gallery_window(page_count: int, page_size: int, window: int) -> tuple[int, int, int]:
+    """Clamp a requested gallery window to the pages there are.
+
+    Args:
+        page_count: Number of pages in the gallery
+        page_size: Number of pages per window
+        window: Requested window (0-based), e.g. kept from before the page count shrank
+
+    Returns:
+        Tuple of (window, window count, index of the window's first page)
+    """
+    window_count = max(1, math.ceil(page_count / page_size))
+    window = min(max(window, 0), window_count - 1)
+    return window, window_count, window * page_size
+
+
+def _render_gallery(
+    pages: list,
+    columns: int,
+    selectable: bool,
+    selected_ids: set[str] | None,
+    atlas: ThumbnailAtlas | None,
+    page_size: int,
+    key: str,
+) -> list[str]:
+    selection_key, window_key = f"{key}_selected", f"{key}_window"
+    if selection_key not in st.session_state:
+        st.session_state[selection_key] = set(selected_ids or ())
+    selection: set[str] = st.session_state[selection_key]
+
+    window, window_count, start = gallery_window(len(pages), page_size, st.session_state.get(window_key, 0))
+    visible = pages[start : start + page_size]
+
+    if window_count > 1:
+        _render_window_navigation(window_key, window, window_count, start, len(visible), len(pages))
+
+    thumbnails = _window_thumbnails(visible, atlas)
+    cols = st.columns(columns)
+    for i, page in enumerate(visible):
         with cols[i % columns]:
-            thumb = load_thumbnail(page.id)
+            thumb = thumbnails.get(page.id)
             if thumb:
                 st.image(thumb, width="stretch")
             else:
                 st.info(f"Page {page.page_num}")
 
             if selectable:
-                is_selected = st.checkbox(
+                checkbox_key = f"{key}_select_{page.id}"
+                st.checkbox(
                     f"Page {page.page_num}",
-                    value=page.id in selected_ids,
-                    key=f"page_select_{page.id}",
+                    value=page.id in selection,
+                    key=checkbox_key,
+                    on_change=_toggle_selection,
+                    args=(selection_key, page.id, checkbox_key),
                 )
-                if is_selected:
-                    selected.append(page.id)
             else:
                 st.caption(f"Page {page.page_num}")
 
-    return selected
+    next_window = pages[start + page_size : start + 2 * page_size]
+    if next_window:
+        _prefetch(_window_thumbnails(next_window, atlas))
+
+    return [page.id for page in pages if page.id in selection] if selectable else []
+
+
+_render_gallery_fragment = st.fragment(_render_gallery)
+
+
+def _window_thumbnails(pages: list, atlas: ThumbnailAtlas | None) -> dict[str, str | bytes]:
+    # Thumbnail URLs when images are served, then the atlas, then one batch for the rest
+    thumbnails: dict[str, str | bytes] = {}
+    if serves_images():
+        thumbnails.update(load_image_urls(tuple(page.id for page in pages), THUMBNAIL))
+    for page in pages:
+        if atlas and page.id not in thumbnails and (thumb := atlas.get(page.id)):
+            thumbnails[page.id] = thumb
+    missing = tuple(page.id for page in pages if page.id not in thumbnails)
+    if missing:
+        thumbnails.update(load_thumbnails(missing))
+    return thumbnails
+
+
+def _render_window_navigation(
+    window_key: str, window: int, window_count: int, start: int, visible: int, total: int
+) -> None:
+    first, prev, label, next_, last = st.columns([1, 1, 4, 1, 1], vertical_alignment="center")
+    for col, target, text, shortcut, disabled in [
+        (first, 0, "⏮", "Home", window == 0),
+        (prev, window - 1, "◀", "Left", window == 0),
+        (next_, window + 1, "▶", "Right", window == window_count - 1),
+        (last, window_count - 1, "⏭", "End", window == window_count - 1),
+    ]:
+        col.button(
+            text,
+            key=f"{window_key}_{shortcut}",
+            on_click=_set_window,
+            args=(window_key, target),
+            shortcut=shortcut,
+            disabled=disabled,
+        )
+    label.caption(f"Pages {start + 1}-{start + visible} of {total}")
+
+
+def _set_window(window_key: str, window: int) -> None:
+    st.session_state[window_key] = window
+
+
+def _toggle_selection(selection_key: str, page_id: str, checkbox_key: str) -> None:
+    if st.session_state[checkbox_key]:
+        st.session_state[selection_key].add(page_id)
+    else:
+        st.session_state[selection_key].discard(page_id)
+
+
+def _prefetch(thumbnails: dict[str, str | bytes]) -> None:
+    # Hidden images make the browser download the next window into its cache (the URLs are immutable);
+    # thumbnails sent as bytes are only loaded into the server-side caches
+    urls = [url for url in thumbnails.values() if isinstance(url, str)]
+    if not urls:
+        return
+    images = "".join(f'<img src="{url}" alt="">' for url in urls)
+    st.html(f'<div style="display: none">{images}</div>')
 
 
 def render_document_gallery(document_id: str, columns: int = 4) -> None:
@@ -123,13 +432,13 @@ def render_document_gallery(document_id: str, columns: int = 4) -> None:
     """
     service = get_service()
     with service._create_uow() as uow:
-        pages = uow.pages.get_by_document_id(document_id)
+        pages = get_document_pages(uow, document_id)
 
     if not pages:
         st.info("No pages found for this document")
         return
 
-    render_page_gallery(pages, columns=columns)
+    render_page_gallery(pages, columns=columns, atlas=load_atlas(document_id, len(pages)), key=f"gallery_{document_id}")
 
 
 def render_image_modal(page_id: str, page_num: int) -> None:
@@ -139,9 +448,9 @@ def render_image_modal(page_id: str, page_num: int) -> None:
         page_id: Page ID
         page_num: Page number for title
     """
-    img_bytes = load_full_image(page_id)
-    if img_bytes:
-        st.image(img_bytes, caption=f"Page {page_num} (Full Size)")
+    image = image_source(page_id)
+    if image:
+        st.image(image, caption=f"Page {page_num} (Full Size)")
     else:
         st.error("Could not load image")
 
@@ -154,11 +463,13 @@ def show_full_image_dialog(page_id: str, page_num: int) -> None:
         page_id: Page ID
         page_num: Page number for title
     """
-    img_bytes = load_full_image(page_id)
-    if img_bytes:
-        # Show image info
-        img = Image.open(BytesIO(img_bytes))
-        st.caption(f"Page {page_num} | Size: {img.width} x {img.height} px")
-        st.image(img_bytes, width="stretch")
+    image = image_source(page_id)
+    if image:
+        # Image info recorded at ingest; pages not yet backfilled read it from the image header
+        metadata = load_page_metadata(page_id)
+        if "codec" not in metadata and (img_bytes := load_full_image(page_id)):
+            metadata = image_metadata(img_bytes)
+        st.caption(f"Page {page_num} | {format_image_info(metadata)}")
+        st.image(image, width="stretch")
     else:
         st.error("Could not load image")
@@ -1,30 +1,38 @@
 """Page selector component for multi-document page selection by page number."""
 
 import streamlit as st
+from autorag_research.exceptions import SessionNotSetError
+from sqlalchemy import select
 
-from komm_vqa.app.components.image_viewer import load_full_image
+from komm_vqa.app.components.image_viewer import format_image_info, image_source, image_sources
 from komm_vqa.app.db import get_service
+from komm_vqa.ingest import lookups
+from komm_vqa.ingest.catalog import get_catalog_version, get_document_catalog
+from komm_vqa.ingest.renditions import MEDIUM
+
+
+@st.cache_data(ttl=3600, max_entries=4)
+def load_document_catalog(version: int) -> list[dict]:
+    """Load and cache the document catalog.
+
+    Args:
+        version: Catalog version (used as cache key; see ``komm_vqa.ingest.catalog``)
+
+    Returns:
+        List of document dicts with id, title, filename, file_path, page_count and doc_metadata
+    """
+    return get_document_catalog(get_service())
 
 
 def get_all_documents_info() -> list[dict]:
     """Get all documents info from database.
 
+    Only the catalog version is queried when no document changed since the last call.
+
     Returns:
-        List of document info dicts with id, title, filename, page_count
+        List of document info dicts with id, title, filename, file_path, page_count and doc_metadata
     """
-    service = get_service()
-    with service._create_uow() as uow:
-        documents = uow.documents.get_all()
-        doc_list = []
-        for doc in documents:
-            pages = uow.pages.get_by_document_id(doc.id)
-            doc_list.append({
-                "id": doc.id,
-                "title": doc.title,
-                "filename": doc.filename,
-                "page_count": len(pages),
-            })
-        return doc_list
+    return load_document_catalog(get_catalog_version(get_service()))
 
 
 def get_page_by_number(document_id: str, page_num: int) -> dict | None:
@@ -39,18 +47,16 @@ def get_page_by_number(document_id: str, page_num: int) -> dict | None:
     """
     service = get_service()
     with service._create_uow() as uow:
-        pages = uow.pages.get_by_document_id(document_id)
-        for page in pages:
-            if page.page_num == page_num:
-                # Get image chunk ID
-                image_chunks = uow.image_chunks.get_by_page_id(page.id)
-                image_chunk_id = image_chunks[0].id if image_chunks else None
-                return {
-                    "id": page.id,
-                    "page_num": page.page_num,
-                    "image_chunk_id": image_chunk_id,
-                }
-    return None
+        found = lookups.get_page_by_number(uow, document_id, page_num)
+    if found is None:
+        return None
+    page, image_chunk_id = found
+    return {
+        "id": page.id,
+        "page_num": page.page_num,
+        "image_chunk_id": image_chunk_id,
+        "metadata": page.page_metadata or {},
+    }
 
 
 def page_number_selector(
@@ -113,9 +119,11 @@ def page_number_selector(
     st.write("**Preview:**")
     page_info = get_page_by_number(doc_id, page_num)
     if page_info:
-        img_bytes = load_full_image(page_info["id"])
-        if img_bytes:
-            st.image(img_bytes, width="stretch")
+        image = image_source(page_info["id"])
+        if image:
+            st.image(image, width="stretch")
+            if info := format_image_info(page_info["metadata"]):
+                st.caption(info)
         else:
             st.warning("Could not load image")
 
@@ -177,7 +185,7 @@ def render_selected_pages_preview(
     page_ids: list[str],
     columns: int = 4,
 ) -> None:
-    """Render preview of selected pages with full images.
+    """Render preview of selected pages with their medium previews, loaded in one batch.
 
     Args:
         page_ids: List of selected page IDs
@@ -188,18 +196,24 @@ def render_selected_pages_preview(
         return
 
     service = get_service()
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model, doc_model = uow.pages.model_cls, uow.documents.model_cls
+        rows = uow.session.execute(
+            select(page_model.id, page_model.page_num, doc_model.title, doc_model.filename)
+            .outerjoin(doc_model, doc_model.id == page_model.document_id)
+            .where(page_model.id.in_(page_ids))
+        ).all()
+    titles = {
+        page_id: f"{title or filename or 'Untitled'} - Page {page_num}" for page_id, page_num, title, filename in rows
+    }
+    previews = image_sources(page_ids, MEDIUM)
 
     for page_id in page_ids:
-        with service._create_uow() as uow:
-            page = uow.pages.get_by_id(page_id)
-            if page:
-                page_num = page.page_num
-                doc = page.document
-                doc_title = doc.title or doc.filename or "Untitled" if doc else "Unknown"
-
-        with st.expander(f"{doc_title} - Page {page_num}", expanded=False):
-            img_bytes = load_full_image(page_id)
-            if img_bytes:
-                st.image(img_bytes, width="stretch")
+        with st.expander(titles.get(page_id, "Unknown page"), expanded=False):
+            preview = previews.get(page_id)
+            if preview:
+                st.image(preview, width="stretch")
             else:
                 st.warning("Could not load image")
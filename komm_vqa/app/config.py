@@ -1,16 +1,12 @@
 """App configuration and settings management."""
 
-import os
 from pathlib import Path
 
 import streamlit as st
 
-# Default values
-DEFAULT_PDF_STORAGE_PATH = "./data/pdfs"
-DEFAULT_DB_HOST = "localhost"
-DEFAULT_DB_PORT = "5432"
-DEFAULT_DB_NAME = "testdb"
-DEFAULT_DB_USER = "postgres"
+from komm_vqa.db import get_env_db_config
+from komm_vqa.ingest.image_cache import get_image_cache
+from komm_vqa.ingest.pipeline import DEFAULT_PDF_STORAGE_PATH
 
 
 def get_pdf_storage_path() -> Path:
@@ -24,20 +20,7 @@ def get_pdf_storage_path() -> Path:
 def get_db_config() -> dict[str, str]:
     """Get database configuration from session state, secrets, or environment."""
     # Priority: session_state > secrets > environment > defaults
-    config = {
-        "host": DEFAULT_DB_HOST,
-        "port": DEFAULT_DB_PORT,
-        "database": DEFAULT_DB_NAME,
-        "user": DEFAULT_DB_USER,
-        "password": "",
-    }
-
-    # Try environment variables
-    config["host"] = os.environ.get("POSTGRES_HOST", config["host"])
-    config["port"] = os.environ.get("POSTGRES_PORT", config["port"])
-    config["database"] = os.environ.get("POSTGRES_DB", os.environ.get("TEST_DB_NAME", config["database"]))
-    config["user"] = os.environ.get("POSTGRES_USER", config["user"])
-    config["password"] = os.environ.get("POSTGRES_PASSWORD", config["password"])
+    config = get_env_db_config()
 
     # Try Streamlit secrets
     if hasattr(st, "secrets") and "postgres" in st.secrets:
@@ -66,6 +49,17 @@ def render_settings_sidebar() -> None:
         )
         st.session_state.pdf_storage_path = pdf_path
 
+        st.subheader("Image Cache")
+        stats = get_image_cache().stats()
+        st.caption(
+            f"{stats.entries} images, {stats.total_bytes / 1024**2:.0f}/{stats.max_bytes / 1024**2:.0f} MB | "
+            f"{stats.hits} hits, {stats.misses} misses ({stats.hit_rate:.0%})"
+        )
+        if st.button("Clear Image Cache"):
+            get_image_cache().clear()
+            st.cache_data.clear()
+            st.rerun()
+
         st.subheader("Database")
         db_config = get_db_config()
 
@@ -3,18 +3,17 @@
 from collections.abc import Callable
 
 import streamlit as st
-from autorag_research.orm.schema_factory import create_schema
 from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
 from sqlalchemy import Engine, create_engine, text
 from sqlalchemy.orm import Session, sessionmaker
 
+from komm_vqa import db as core_db
 from komm_vqa.app.config import get_db_config
 
 
 def get_db_url() -> str:
     """Construct database URL from configuration."""
-    config = get_db_config()
-    return f"postgresql+psycopg://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
+    return core_db.build_db_url(get_db_config())
 
 
 @st.cache_resource
@@ -37,7 +36,7 @@ def get_session_factory() -> Callable[[], Session]:
 @st.cache_resource
 def get_schema():
     """Get schema with string primary keys for UUID support."""
-    return create_schema(768, primary_key_type="string")
+    return core_db.get_schema()
 
 
 def get_service() -> MultiModalIngestionService:
@@ -0,0 +1,272 @@
+"""Local HTTP server for large files shown in the app, with byte-range and caching support.
+
+Streamlit can only hand files to the browser through its websocket (or its
+in-memory media storage), so a PDF had to be read and base64-encoded whole
+on every rerun. This server runs in a background thread of the Streamlit
+process and serves registered files directly from disk. The browser's PDF
+viewer then requests byte ranges of the file as it needs them, and
+revalidates with ``If-None-Match`` instead of downloading the file again.
+
+Page images kept in the blob store (see ``komm_vqa.ingest.blobs``) are
+served as ``/images/<sha256>.<ext>``, with URLs built from the references
+stored in the database. The content never changes under a hash, so these
+responses are marked ``immutable`` and the browser keeps them across reruns
+and sessions instead of receiving the bytes over the websocket each time.
+
+Only files registered with ``FileServer.url_for`` are served, under an
+unguessable token. The server listens on ``KOMM_VQA_FILE_SERVER_HOST``
+(default ``127.0.0.1``) and ``KOMM_VQA_FILE_SERVER_PORT`` (default: any
+free port), and ``KOMM_VQA_FILE_SERVER_URL`` sets the base URL the browser
+uses. PDFs and page images are only shown through the server when that URL
+is set (see ``render_pdf_viewer`` on the File Management page and
+``komm_vqa.app.components.image_viewer.image_sources``): the default address
+is not reachable from a remote browser, nor allowed from an HTTPS page.
+"""
+
+import email.utils
+import mimetypes
+import os
+import re
+import secrets
+import threading
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from komm_vqa.ingest.blobs import BlobStore, get_blob_store
+
+HOST_ENV = "KOMM_VQA_FILE_SERVER_HOST"
+PORT_ENV = "KOMM_VQA_FILE_SERVER_PORT"
+URL_ENV = "KOMM_VQA_FILE_SERVER_URL"
+DEFAULT_HOST = "127.0.0.1"
+COPY_CHUNK_SIZE = 256 * 1024
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+IMAGE_PATTERN = re.compile(r"([0-9a-f]{64})\.(\w+)")
+# URL extension -> MIME type of the page image codecs (see komm_vqa.ingest.profiles.CODECS)
+IMAGE_TYPES = {"jpg": "image/jpeg", "webp": "image/webp", "avif": "image/avif", "png": "image/png"}
+IMAGE_EXTENSIONS = {mimetype: extension for extension, mimetype in IMAGE_TYPES.items()}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single-range ``Range`` header into an inclusive (start, end) byte range.
+
+    Args:
+        header: Value of the Range header, or None
+        size: Size of the file in bytes
+
+    Returns:
+        (start, end) of the requested range, clipped to the file, or None to
+        serve the whole file (no header, or a form this server does not
+        handle, like multiple ranges). Raises ValueError if the range is
+        unsatisfiable.
+    """
+    match = RANGE_PATTERN.fullmatch(header.strip()) if header else None
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+class FileServer:
+    """Background HTTP server for registered files."""
+
+    def __init__(
+        self, host: str = DEFAULT_HOST, port: int = 0, base_url: str | None = None, store: BlobStore | None = None
+    ):
+        self.store = store or get_blob_store()
+        self._files: dict[str, Path] = {}
+        self._tokens: dict[Path, str] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.base_url = (base_url or f"http://{host}:{self._server.server_address[1]}").rstrip("/")
+        self._thread = threading.Thread(target=self._server.serve_forever, name="komm-vqa-file-server", daemon=True)
+        self._thread.start()
+
+    def url_for(self, path: Path) -> str:
+        """Register a file and get the URL it is served at.
+
+        The URL stays the same for the same path, so the browser can reuse
+        what it has cached.
+
+        Args:
+            path: File to serve
+
+        Returns:
+            URL of the file
+        """
+        path = Path(path).resolve()
+        with self._lock:
+            token = self._tokens.get(path)
+            if token is None:
+                token = secrets.token_urlsafe(16)
+                self._tokens[path] = token
+                self._files[token] = path
+        return f"{self.base_url}/files/{token}/{path.name}"
+
+    def url_for_blob(self, key: str, mimetype: str) -> str:
+        """Get the immutable URL of an image in the blob store.
+
+        Args:
+            key: Blob key (see ``komm_vqa.ingest.lookups.get_image_refs``)
+            mimetype: MIME type of the image, as stored with it
+
+        Returns:
+            URL of the image
+        """
+        return f"{self.base_url}/images/{key}.{IMAGE_EXTENSIONS.get(mimetype, 'jpg')}"
+
+    def resolve(self, token: str) -> Path | None:
+        """Get the registered file of a token."""
+        return self._files.get(token)
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _make_handler(file_server: FileServer) -> type[BaseHTTPRequestHandler]:
+    class FileRequestHandler(BaseHTTPRequestHandler):
+        def do_HEAD(self) -> None:
+            self._serve(send_body=False)
+
+        def do_GET(self) -> None:
+            self._serve(send_body=True)
+
+        def log_request(self, code: int | str = "-", size: int | str = "-") -> None:
+            # Range requests are frequent; keep them out of the Streamlit console (errors are still logged)
+            pass
+
+        def _serve(self, send_body: bool) -> None:
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "images":
+                self._serve_image(parts[1], send_body)
+            else:
+                self._serve_file(parts, send_body)
+
+        def _serve_image(self, name: str, send_body: bool) -> None:
+            match = IMAGE_PATTERN.fullmatch(name)
+            if match is None or match.group(2) not in IMAGE_TYPES:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            key, extension = match.groups()
+            etag = f'"{key}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._send_immutable_headers(etag)
+                self.end_headers()
+                return
+            if file_server.store is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            try:
+                data = file_server.store.get(key)
+            except FileNotFoundError:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", IMAGE_TYPES[extension])
+            self.send_header("Content-Length", str(len(data)))
+            self._send_immutable_headers(etag)
+            self.end_headers()
+            if send_body:
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+        def _send_immutable_headers(self, etag: str) -> None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+
+        def _serve_file(self, parts: list[str], send_body: bool) -> None:
+            path = file_server.resolve(parts[1]) if len(parts) == 3 and parts[0] == "files" else None
+            try:
+                stat = path.stat() if path else None
+            except OSError:
+                stat = None
+            if path is None or stat is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            size = stat.st_size
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._send_cache_headers(etag, stat.st_mtime)
+                self.end_headers()
+                return
+
+            byte_range = None
+            if_range = self.headers.get("If-Range")
+            if if_range is None or if_range == etag:
+                try:
+                    byte_range = parse_range(self.headers.get("Range"), size)
+                except ValueError:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+            start, end = byte_range or (0, size - 1)
+            if byte_range:
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self._send_cache_headers(etag, stat.st_mtime)
+            self.end_headers()
+            if send_body and size:
+                self._copy(path, start, end - start + 1)
+
+        def _send_cache_headers(self, etag: str, mtime: float) -> None:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", email.utils.formatdate(mtime, usegmt=True))
+            # Files can be rebuilt in place (see build_document_pdf), so the browser revalidates before reuse
+            self.send_header("Cache-Control", "private, no-cache")
+
+        def _copy(self, path: Path, offset: int, length: int) -> None:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while length > 0:
+                    chunk = f.read(min(COPY_CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    try:
+                        self.wfile.write(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The viewer cancels range requests it no longer needs
+                        return
+                    length -= len(chunk)
+
+    return FileRequestHandler
+
+
+# Not a Streamlit resource: clearing st.cache_resource (e.g. on a DB config change) would drop a running
+# server without shutting it down, leaking its thread and port, and a fixed port could not be bound again
+@lru_cache(maxsize=1)
+def get_file_server() -> FileServer:
+    """Get the file server of this process, started on first use."""
+    return FileServer(
+        host=os.environ.get(HOST_ENV, DEFAULT_HOST),
+        port=int(os.environ.get(PORT_ENV, 0)),
+        base_url=os.environ.get(URL_ENV),
+    )
@@ -4,9 +4,10 @@ Run with: streamlit run autorag_research/app/main.py
 """
 
 import streamlit as st
-from autorag_research.orm.schema_factory import create_schema
 
 from komm_vqa.app.db import get_engine
+from komm_vqa.db import ensure_schema
+from komm_vqa.ingest.lookups import get_statistics
 
 st.set_page_config(
     page_title="VQA Dataset Creator",
@@ -34,13 +35,12 @@ def main():
     if is_connected:
         st.sidebar.success("DB Connected")
 
-        schema = create_schema(768, primary_key_type="string")
-        schema.Base.metadata.create_all(get_engine())
+        ensure_schema(get_engine())
 
         # Display statistics
         try:
             service = get_service()
-            stats = service.get_statistics()
+            stats = get_statistics(service)
 
             st.subheader("Dataset Statistics")
 
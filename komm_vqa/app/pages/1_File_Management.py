@@ -1,21 +1,60 @@
 """File Management page - Upload PDFs and browse documents."""
 
 import base64
-import uuid
-from io import BytesIO
+import os
 from pathlib import Path
 
 import streamlit as st
-from pdf2image import convert_from_bytes
-from PIL import Image
+import streamlit.components.v1 as components
 
-from komm_vqa.app.components.image_viewer import load_full_image
+from komm_vqa.app.components.image_viewer import image_source, render_document_gallery
+from komm_vqa.app.components.page_selector import load_document_catalog
 from komm_vqa.app.config import get_pdf_storage_path, render_settings_sidebar
 from komm_vqa.app.db import check_db_connection, get_service
+from komm_vqa.app.file_server import URL_ENV, get_file_server
+from komm_vqa.ingest.catalog import get_catalog_version
+from komm_vqa.ingest.dedup import content_sha256
+from komm_vqa.ingest.jobs import (
+    FINISHED_STATUSES,
+    JOB_DONE,
+    JOB_DUPLICATE,
+    JOB_KIND_BUILD_PDF,
+    JOB_KIND_THUMBNAILS,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    enqueue_job,
+    get_jobs,
+)
+from komm_vqa.ingest.lookups import get_page_by_number
+from komm_vqa.ingest.pipeline import (
+    CHECKPOINT_KEY,
+    PROFILE_KEY,
+    IngestResult,
+    default_title,
+    delete_document,
+    document_profile,
+    find_duplicate,
+    find_duplicate_pages,
+    is_complete,
+    new_storage_path,
+    remove_on_error,
+    save_upload,
+    store_image_document,
+)
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE, PROFILES
+
+JOB_POLL_SECONDS = 2
 
 
 def render_pdf_viewer(pdf_path: str, height: int = 800) -> None:
-    """Render PDF viewer using iframe with base64 encoded PDF.
+    """Render PDF viewer using an iframe.
+
+    When ``KOMM_VQA_FILE_SERVER_URL`` is set, the iframe points at the file
+    server and the browser's PDF viewer loads the file with byte-range
+    requests as pages are displayed, so large PDFs are never read whole into
+    the app. Otherwise the PDF is embedded base64 encoded: the server's
+    default local address is not reachable from a remote browser, nor
+    allowed from an HTTPS page.
 
     Args:
         pdf_path: Path to PDF file
@@ -26,6 +65,10 @@ def render_pdf_viewer(pdf_path: str, height: int = 800) -> None:
         st.error(f"PDF file not found: {pdf_path}")
         return
 
+    if os.environ.get(URL_ENV):
+        components.iframe(get_file_server().url_for(pdf_file), height=height)
+        return
+
     with open(pdf_file, "rb") as f:
         pdf_bytes = f.read()
 
@@ -43,6 +86,20 @@ def render_pdf_viewer(pdf_path: str, height: int = 800) -> None:
     st.markdown(pdf_display, unsafe_allow_html=True)
 
 
+@st.cache_data(ttl=3600, max_entries=50)
+def load_duplicate_pages(document_id: str, version: int) -> dict[int, dict]:
+    """Load and cache the duplicate pages of a document.
+
+    Args:
+        document_id: Document ID
+        version: Catalog version (used as cache key, so results are refreshed when documents change)
+
+    Returns:
+        Duplicate pages as returned by ``find_duplicate_pages``
+    """
+    return find_duplicate_pages(get_service(), document_id)
+
+
 st.set_page_config(page_title="File Management", page_icon="📁", layout="wide")
 st.title("📁 File Management")
 
@@ -56,260 +113,126 @@ if not is_connected:
     st.stop()
 
 
-def convert_images_to_pdf(uploaded_images: list) -> tuple[bytes, str]:
-    """Convert multiple uploaded images to a single PDF.
-
-    Args:
-        uploaded_images: List of Streamlit UploadedFile objects (images)
-
-    Returns:
-        Tuple of (pdf_bytes, suggested_filename)
-    """
-    if not uploaded_images:
-        raise ValueError("No images provided")
-
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    pil_images = []
-    for i, img_file in enumerate(uploaded_images):
-        status_text.text(f"Loading image {i + 1}/{len(uploaded_images)}...")
-        img = Image.open(img_file)
-        # Convert to RGB if necessary (for PNG with alpha channel, etc.)
-        if img.mode in ("RGBA", "P", "LA"):
-            img = img.convert("RGB")
-        pil_images.append(img)
-        progress_bar.progress((i + 1) / len(uploaded_images))
-
-    status_text.text("Creating PDF...")
-
-    # Create PDF from images
-    pdf_buffer = BytesIO()
-    if len(pil_images) == 1:
-        pil_images[0].save(pdf_buffer, format="PDF")
-    else:
-        pil_images[0].save(
-            pdf_buffer,
-            format="PDF",
-            save_all=True,
-            append_images=pil_images[1:],
-        )
-
-    pdf_bytes = pdf_buffer.getvalue()
-
-    status_text.text("PDF created successfully!")
-    progress_bar.empty()
-
-    # Generate filename from first image
-    first_name = Path(uploaded_images[0].name).stem
-    suggested_filename = f"{first_name}_combined.pdf"
-
-    return pdf_bytes, suggested_filename
-
-
-def convert_pdf_with_progress(pdf_bytes: bytes) -> list:
-    """Convert PDF to images with progress indication.
-
-    Args:
-        pdf_bytes: PDF file bytes
-
-    Returns:
-        List of PIL Image objects
-    """
-    status_text = st.empty()
-    status_text.text("Converting PDF pages...")
-
-    # Convert all pages at once (much faster than page-by-page)
-    images = convert_from_bytes(pdf_bytes, dpi=150, fmt="JPEG")
-
-    status_text.text(f"Converted {len(images)} pages!")
-    return images
-
-
-def upload_pdf(uploaded_file) -> tuple[str, int]:
-    """Process uploaded PDF file.
+def upload_pdf(uploaded_file, sha256: str, force: bool = False, profile: str = DEFAULT_PROFILE.name) -> str:
+    """Save an uploaded PDF file and enqueue it for ingestion.
 
     Args:
         uploaded_file: Streamlit UploadedFile object
+        sha256: Content hash of the upload
+        force: Re-ingest even if a document with the same content exists
+        profile: Raster profile name
 
     Returns:
-        Tuple of (document_id, page_count)
+        Ingestion job ID
     """
-    service = get_service()
     storage_path = get_pdf_storage_path()
 
     # Generate unique filename
-    file_uuid = str(uuid.uuid4())
     filename = uploaded_file.name
-    save_path = storage_path / f"{file_uuid}_{filename}"
-
-    # Save PDF to filesystem
-    with open(save_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
-    # Add File
-    file_ids = service.add_files([{"path": str(save_path), "type": "raw"}])
-    file_id = file_ids[0]
-
-    # Convert PDF pages to images
-    pdf_bytes = uploaded_file.getvalue()
-    images = convert_pdf_with_progress(pdf_bytes)
-
-    st.info(f"Processing {len(images)} pages...")
-
-    # Add Document (1:1 with File)
-    doc_ids = service.add_documents([
-        {
-            "path": file_id,
-            "filename": filename,
-            "title": filename.split(".")[0].strip(),
-        }
-    ])
-    doc_id = doc_ids[0]
-
-    # Add Pages and ImageChunks
-    for page_num, img in enumerate(images, start=1):
-        # Convert PIL image to JPEG bytes (much smaller than PNG)
-        buffer = BytesIO()
-        img.save(buffer, format="JPEG", quality=85)
-        img_bytes = buffer.getvalue()
-
-        # Add Page (without image_contents - stored only in ImageChunk)
-        page_ids = service.add_pages([
-            {
-                "document_id": doc_id,
-                "page_num": page_num,
-                "mimetype": "image/jpeg",
-            }
-        ])
-        page_id = page_ids[0]
-
-        # Add ImageChunk (1:1 with Page) - this stores the actual image
-        service.add_image_chunks([
-            {
-                "contents": img_bytes,
-                "mimetype": "image/jpeg",
-                "parent_page": page_id,
-            }
-        ])
-
-    return doc_id, len(images)
-
-
-def upload_images_as_pdf(uploaded_images: list, doc_title: str | None = None) -> tuple[str, int]:
-    """Process multiple uploaded images as a single PDF document.
+    save_path = new_storage_path(storage_path, filename)
+
+    # Stream the upload to its final path once; a worker rasterizes it from that file
+    with remove_on_error(save_path):
+        save_upload(uploaded_file, save_path)
+        return enqueue_job(
+            get_service(),
+            save_path,
+            filename,
+            default_title(filename),
+            sha256=sha256,
+            options={"force": force, "profile": profile},
+        )
+
+
+def upload_images_as_pdf(uploaded_images: list, doc_title: str | None = None) -> tuple[IngestResult, str]:
+    """Store multiple uploaded images as the pages of a single document.
+
+    The images become page images directly; the combined PDF for the viewer
+    is assembled afterwards by a background job.
 
     Args:
         uploaded_images: List of Streamlit UploadedFile objects (images)
         doc_title: Optional document title
 
     Returns:
-        Tuple of (document_id, page_count)
+        Tuple of (IngestResult of the new document, PDF build job ID)
     """
-    # Convert images to PDF
-    pdf_bytes, suggested_filename = convert_images_to_pdf(uploaded_images)
+    if not uploaded_images:
+        raise ValueError("No images provided")
 
-    service = get_service()
     storage_path = get_pdf_storage_path()
 
-    # Generate unique filename
-    file_uuid = str(uuid.uuid4())
-    filename = doc_title + ".pdf" if doc_title else suggested_filename
-    save_path = storage_path / f"{file_uuid}_{filename}"
-
-    # Save PDF to filesystem
-    with open(save_path, "wb") as f:
-        f.write(pdf_bytes)
-
-    # Add File
-    file_ids = service.add_files([{"path": str(save_path), "type": "raw"}])
-    file_id = file_ids[0]
-
-    # Convert PDF pages to images (re-convert for consistent quality)
-    images = convert_pdf_with_progress(pdf_bytes)
-
-    st.info(f"Processing {len(images)} pages...")
-
-    # Add Document
-    doc_ids = service.add_documents([
-        {
-            "path": file_id,
-            "filename": filename,
-            "title": doc_title or filename.split(".")[0].strip(),
-        }
-    ])
-    doc_id = doc_ids[0]
-
-    # Add Pages and ImageChunks
-    for page_num, img in enumerate(images, start=1):
-        # Convert PIL image to JPEG bytes (much smaller than PNG)
-        buffer = BytesIO()
-        img.save(buffer, format="JPEG", quality=85)
-        img_bytes = buffer.getvalue()
-
-        # Add Page (without image_contents - stored only in ImageChunk)
-        page_ids = service.add_pages([
-            {
-                "document_id": doc_id,
-                "page_num": page_num,
-                "mimetype": "image/jpeg",
-            }
-        ])
-        page_id = page_ids[0]
-
-        # Add ImageChunk (1:1 with Page) - this stores the actual image
-        service.add_image_chunks([
-            {
-                "contents": img_bytes,
-                "mimetype": "image/jpeg",
-                "parent_page": page_id,
-            }
-        ])
-
-    return doc_id, len(images)
-
-
-def delete_document(document_id: str) -> None:
-    """Delete a document and all related data.
+    # Generate unique filename (from the first image if no title is given)
+    filename = doc_title + ".pdf" if doc_title else f"{Path(uploaded_images[0].name).stem}_combined.pdf"
+    save_path = new_storage_path(storage_path, filename)
+    title = doc_title or default_title(filename)
 
-    Args:
-        document_id: Document ID to delete
-    """
-    service = get_service()
-    with service._create_uow() as uow:
-        # Get document to find file path
-        doc = uow.documents.get_by_id(document_id)
-        if doc:
-            file_id = doc.path  # File ID referenced by Document
+    progress_bar = st.progress(0)
+    status_text = st.empty()
 
-            # Get all pages for this document
-            pages = uow.pages.get_by_document_id(document_id)
+    def on_progress(pages_done: int, page_count: int) -> None:
+        progress_bar.progress(pages_done / page_count)
+        status_text.text(f"Stored {pages_done}/{page_count} images...")
 
-            # Delete ImageChunks and Captions for each page first (FK constraint)
-            for page in pages:
-                # Delete ImageChunks
-                image_chunks = uow.image_chunks.get_by_page_id(page.id)
-                for ic in image_chunks:
-                    uow.image_chunks.delete_by_id(ic.id)
+    service = get_service()
+    result = store_image_document(service, save_path, filename, title, uploaded_images, progress=on_progress)
+    progress_bar.empty()
+    status_text.empty()
 
-                # Delete Captions (if any)
-                if hasattr(uow, "captions"):
-                    captions = uow.captions.get_by_page_id(page.id)
-                    for caption in captions:
-                        uow.captions.delete_by_id(caption.id)
+    job_id = enqueue_job(service, save_path, filename, title, document_id=result.document_id, kind=JOB_KIND_BUILD_PDF)
+    return result, job_id
 
-            # Delete Pages (FK constraint)
-            for page in pages:
-                uow.pages.delete_by_id(page.id)
 
-            # Delete Document
-            uow.documents.delete_by_id(document_id)
+def track_job(job_id: str) -> None:
+    """Remember a job enqueued in this session so it stays listed after it finishes."""
+    st.session_state.setdefault("ingest_job_ids", []).append(job_id)
 
-            # Delete File (orphan after Document deletion)
-            if file_id:
-                uow.files.delete_by_id(file_id)
 
-            uow.commit()
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_ingest_jobs() -> None:
+    """Show queued, running and this session's finished ingestion jobs, refreshed periodically."""
+    job_ids = st.session_state.get("ingest_job_ids", [])
+    jobs = get_jobs(get_service(), job_ids)
+    if not jobs:
+        return
+
+    st.subheader("Ingestion Jobs")
+    if any(job["status"] == JOB_QUEUED for job in jobs):
+        st.caption("Jobs are processed by a separate worker: `uv run komm_vqa worker`")
+
+    for job in jobs:
+        name = job["title"] or job["filename"]
+        if job["kind"] == JOB_KIND_THUMBNAILS and job["status"] in (JOB_QUEUED, JOB_RUNNING):
+            st.caption(f"🖼️ {name} - preparing thumbnails")
+        elif job["status"] == JOB_QUEUED:
+            st.write(f"⏳ **{name}** - queued")
+        elif job["status"] == JOB_RUNNING:
+            page_count = job["page_count"] or 0
+            ratio = job["pages_done"] / page_count if page_count else 0.0
+            st.progress(ratio, text=f"⚙️ {name} - {job['pages_done']}/{page_count or '?'} pages")
+        elif job["status"] == JOB_DONE and job["kind"] == JOB_KIND_BUILD_PDF:
+            st.write(f"✅ **{name}** - PDF created")
+        elif job["status"] == JOB_DONE:
+            st.write(f"✅ **{name}** - {job['pages_done']} pages (Document ID: `{job['document_id'][:8]}...`)")
+        elif job["status"] == JOB_DUPLICATE:
+            st.write(f"🔁 **{name}** - already uploaded (Document ID: `{job['document_id'][:8]}...`)")
+        else:
+            st.write(f"❌ **{name}** - failed: {job['error']}")
+
+    # Rerun the page once for every job that finished since the last poll; the cached
+    # document catalog is keyed by its version, so it picks up the new documents by itself
+    finished = {job["id"] for job in jobs if job["status"] in FINISHED_STATUSES}
+    seen = st.session_state.setdefault("ingest_jobs_seen_finished", set())
+    if finished - seen:
+        seen.update(finished)
+        st.rerun(scope="app")
+
+    if finished and st.button("Clear finished jobs"):
+        st.session_state["ingest_job_ids"] = [job_id for job_id in job_ids if job_id not in finished]
+        st.rerun(scope="app")
+
+
+render_ingest_jobs()
 
 
 # Main content
@@ -328,15 +251,32 @@ with tab1:
         st.write(f"**File:** {uploaded_file.name}")
         st.write(f"**Size:** {uploaded_file.size / 1024:.1f} KB")
 
+        profile = st.selectbox(
+            "Raster profile",
+            options=list(PROFILES),
+            format_func=lambda name: f"{name} ({PROFILES[name].describe()})",
+            help="Resolution, image format and quality of the stored page images",
+        )
+        force = st.checkbox(
+            "Re-ingest if already uploaded",
+            help="Delete the existing document with identical content and process this file again",
+        )
+
         if st.button("Process PDF", type="primary"):
-            with st.spinner("Processing..."):
-                try:
-                    doc_id, page_count = upload_pdf(uploaded_file)
-                    st.success(f"Successfully processed! Document ID: {doc_id[:8]}..., {page_count} pages")
-                    st.cache_data.clear()  # Clear cache to show new data
+            try:
+                # Identical content is detected before anything is written or rasterized
+                sha256 = content_sha256(uploaded_file)
+                existing = None if force else find_duplicate(get_service(), sha256)
+                if existing:
+                    st.info(
+                        f"This file was already uploaded. Document ID: {existing.document_id[:8]}..., "
+                        f"{existing.page_count} pages"
+                    )
+                else:
+                    track_job(upload_pdf(uploaded_file, sha256, force=force, profile=profile or DEFAULT_PROFILE.name))
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Error processing PDF: {e}")
+            except Exception as e:
+                st.error(f"Error uploading PDF: {e}")
 
 with tab2:
     st.subheader("Upload Images as PDF")
@@ -372,11 +312,14 @@ with tab2:
         if st.button("Create PDF and Process", type="primary", key="process_images"):
             with st.spinner("Processing..."):
                 try:
-                    doc_id, page_count = upload_images_as_pdf(
+                    result, job_id = upload_images_as_pdf(
                         uploaded_images,
                         doc_title=doc_title.strip() if doc_title and doc_title.strip() else None,
                     )
-                    st.success(f"Successfully processed! Document ID: {doc_id[:8]}..., {page_count} pages")
+                    track_job(job_id)
+                    st.success(
+                        f"Successfully processed! Document ID: {result.document_id[:8]}..., {result.page_count} pages"
+                    )
                     st.cache_data.clear()
                     st.rerun()
                 except Exception as e:
@@ -387,26 +330,26 @@ with tab3:
 
     service = get_service()
 
-    # Get all documents with related data
-    with service._create_uow() as uow:
-        documents = uow.documents.get_all()
-        # Extract data while session is active to avoid DetachedInstanceError
-        doc_list = []
-        for doc in documents:
-            pages = uow.pages.get_by_document_id(doc.id)
-            doc_list.append({
-                "id": doc.id,
-                "title": doc.title,
-                "filename": doc.filename,
-                "file_path": doc.file.path if doc.file else None,
-                "page_count": len(pages),
-            })
+    # Get all documents with their page counts (cached until a document changes)
+    catalog_version = get_catalog_version(service)
+    doc_list = []
+    for doc in load_document_catalog(catalog_version):
+        doc_metadata = doc["doc_metadata"]
+        doc_list.append({
+            **doc,
+            "checkpoint": None if is_complete(doc_metadata) else doc_metadata[CHECKPOINT_KEY],
+            # Uploaded images are stored as-is and have no raster profile
+            "profile": document_profile(doc_metadata) if PROFILE_KEY in (doc_metadata or {}) else None,
+        })
 
     if not doc_list:
         st.info("No documents found. Upload a PDF to get started.")
     else:
         # Document selector
-        doc_options = {f"{d['title'] or d['filename'] or 'Untitled'} ({d['page_count']} pages)": d for d in doc_list}
+        doc_options = {}
+        for d in doc_list:
+            status = ", incomplete" if d["checkpoint"] else ""
+            doc_options[f"{d['title'] or d['filename'] or 'Untitled'} ({d['page_count']} pages{status})"] = d
 
         selected_doc_name = st.selectbox(
             "Select Document",
@@ -417,14 +360,51 @@ with tab3:
         if selected_doc_name:
             doc_info = doc_options[selected_doc_name]
 
+            # Pages whose image also appears elsewhere (same or nearly the same perceptual hash)
+            duplicate_pages = load_duplicate_pages(doc_info["id"], catalog_version)
+
             # Document info and delete button
             col1, col2 = st.columns([4, 1])
             with col1:
                 st.write(f"**Document ID:** `{doc_info['id'][:8]}...`")
                 st.write(f"**Pages:** {doc_info['page_count']}")
+                if doc_info["profile"]:
+                    st.write(f"**Raster profile:** {doc_info['profile'].name} ({doc_info['profile'].describe()})")
+                if checkpoint := doc_info["checkpoint"]:
+                    st.warning(
+                        f"Ingestion incomplete: {checkpoint['pages_done']}/{checkpoint['page_count']} pages stored."
+                    )
+                    # Only offer a resume if no job is working on this document's file
+                    active_paths = {job["pdf_path"] for job in get_jobs(service)}
+                    if doc_info["file_path"] not in active_paths and st.button("▶️ Resume Ingestion"):
+                        track_job(
+                            enqueue_job(
+                                service,
+                                Path(doc_info["file_path"]),
+                                doc_info["filename"],
+                                doc_info["title"],
+                                document_id=doc_info["id"],
+                            )
+                        )
+                        st.rerun()
+                if duplicate_pages:
+                    with st.expander(f"⚠️ {len(duplicate_pages)} duplicate page(s)"):
+                        st.caption(
+                            "These pages look identical or nearly identical to other pages. "
+                            "Avoid writing queries against them."
+                        )
+                        for dup_page_num, duplicate in duplicate_pages.items():
+                            others = ", ".join(
+                                f"{m['title'] or m['filename'] or 'Untitled'} p.{m['page_num']}"
+                                + (" (near-identical)" if m["distance"] else "")
+                                for m in duplicate["matches"]
+                            )
+                            if more := duplicate["count"] - len(duplicate["matches"]):
+                                others += f" and {more} more"
+                            st.write(f"**Page {dup_page_num}** = {others}")
             with col2:
                 if st.button("🗑️ Delete Document", type="secondary"):
-                    delete_document(doc_info["id"])
+                    delete_document(get_service(), doc_info["id"])
                     st.success("Document deleted!")
                     st.cache_data.clear()
                     st.rerun()
@@ -434,47 +414,56 @@ with tab3:
             # View mode selector
             view_mode = st.radio(
                 "View Mode",
-                options=["PDF Viewer", "Page by Number"],
+                options=["PDF Viewer", "Page by Number", "Gallery"],
                 horizontal=True,
                 key="browse_view_mode",
             )
 
             if view_mode == "PDF Viewer":
                 # PDF Viewer
-                if doc_info["file_path"]:
+                pdf_pending = doc_info["file_path"] in {job["pdf_path"] for job in get_jobs(service)}
+                if pdf_pending and not Path(doc_info["file_path"]).exists():
+                    st.info("The PDF is still being generated. Use 'Page by Number' to view the pages meanwhile.")
+                elif doc_info["file_path"]:
                     st.write("**PDF Preview:**")
                     render_pdf_viewer(doc_info["file_path"], height=700)
                 else:
                     st.warning("PDF file path not available")
 
-            else:  # Page by Number
-                st.write("**View Page by Number:**")
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    page_num = st.number_input(
-                        "Page number",
-                        min_value=1,
-                        max_value=doc_info["page_count"],
-                        value=1,
-                        step=1,
-                        key="browse_page_num",
-                    )
+            elif view_mode == "Gallery":
+                render_document_gallery(doc_info["id"])
 
-                # Get and display the page
-                with service._create_uow() as uow:
-                    pages = uow.pages.get_by_document_id(doc_info["id"])
-                    page_info = None
-                    for p in pages:
-                        if p.page_num == page_num:
-                            page_info = {"id": p.id, "page_num": p.page_num}
-                            break
-
-                if page_info:
-                    st.write(f"**Page {page_num}:**")
-                    img_bytes = load_full_image(page_info["id"])
-                    if img_bytes:
-                        st.image(img_bytes, width="stretch")
-                    else:
-                        st.warning("Could not load image")
+            else:  # Page by Number
+                if doc_info["page_count"] == 0:
+                    st.info("This document has no pages yet.")
                 else:
-                    st.error(f"Page {page_num} not found")
+                    st.write("**View Page by Number:**")
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        page_num = st.number_input(
+                            "Page number",
+                            min_value=1,
+                            max_value=doc_info["page_count"],
+                            value=1,
+                            step=1,
+                            key="browse_page_num",
+                        )
+
+                    # Get and display the page
+                    with service._create_uow() as uow:
+                        found = get_page_by_number(uow, doc_info["id"], page_num)
+                        page_info = {"id": found[0].id, "page_num": found[0].page_num} if found else None
+
+                    if page_info:
+                        st.write(f"**Page {page_num}:**")
+                        if page_num in duplicate_pages:
+                            st.warning(
+                                f"Duplicate page: also appears in {duplicate_pages[page_num]['count']} other page(s)"
+                            )
+                        image = image_source(page_info["id"])
+                        if image:
+                            st.image(image, width="stretch")
+                        else:
+                            st.warning("Could not load image")
+                    else:
+                        st.error(f"Page {page_num} not found")
@@ -2,9 +2,11 @@
 
 import streamlit as st
 
-from komm_vqa.app.components.image_viewer import load_thumbnail
+from komm_vqa.app.components.image_viewer import image_sources
 from komm_vqa.app.config import render_settings_sidebar
 from komm_vqa.app.db import check_db_connection, get_service
+from komm_vqa.ingest.lookups import get_chunk_pages, get_statistics
+from komm_vqa.ingest.renditions import THUMBNAIL
 
 st.set_page_config(page_title="Data Browser", page_icon="📊", layout="wide")
 st.title("📊 Data Browser")
@@ -37,22 +39,22 @@ def delete_query(query_id: str) -> None:
         uow.commit()
 
 
-def get_image_chunk_thumbnail(image_chunk_id: str) -> bytes | None:
-    """Get thumbnail for an image chunk.
+def get_image_chunk_thumbnails(image_chunk_ids: list[str]) -> dict[str, str | bytes]:
+    """Get thumbnails for image chunks, via their parent pages, with batched queries.
 
     Args:
-        image_chunk_id: ImageChunk ID
+        image_chunk_ids: ImageChunk IDs
 
     Returns:
-        Thumbnail bytes or None
+        Thumbnail URL or bytes (see ``image_sources``) by ImageChunk ID; chunks without a thumbnail are left out
     """
+    if not image_chunk_ids:
+        return {}
     service = get_service()
     with service._create_uow() as uow:
-        image_chunk = uow.image_chunks.get_by_id(image_chunk_id)
-        if image_chunk and image_chunk.parent_page:
-            # parent_page is FK ID (not object), use directly
-            return load_thumbnail(image_chunk.parent_page)
-    return None
+        parent_pages = get_chunk_pages(uow, image_chunk_ids)
+    thumbnails = image_sources(list(dict.fromkeys(parent_pages.values())), THUMBNAIL)
+    return {chunk_id: thumbnails[page_id] for chunk_id, page_id in parent_pages.items() if page_id in thumbnails}
 
 
 # Main content
@@ -120,6 +122,15 @@ with tab1:
                 st.session_state.browser_page += 1
                 st.rerun()
 
+        # Fetch the thumbnails of all ground truth images on this page at once
+        chunk_thumbnails = get_image_chunk_thumbnails([
+            rel["image_chunk_id"]
+            for query_info in query_list
+            for group in query_info["relation_groups"].values()
+            for rel in group
+            if rel["image_chunk_id"]
+        ])
+
         # Display queries
         for query_info in query_list:
             contents = query_info["contents"]
@@ -167,8 +178,7 @@ with tab1:
                         for i, rel in enumerate(group_relations):
                             with cols[i % 6]:
                                 if rel["image_chunk_id"]:
-                                    # Get thumbnail via parent page
-                                    thumb = get_image_chunk_thumbnail(rel["image_chunk_id"])
+                                    thumb = chunk_thumbnails.get(rel["image_chunk_id"])
                                     if thumb:
                                         st.image(thumb, width=100)
                                     st.caption(f"IC: {rel['image_chunk_id'][:8]}...")
@@ -187,7 +197,7 @@ with tab2:
     service = get_service()
 
     try:
-        stats = service.get_statistics()
+        stats = get_statistics(service)
 
         col1, col2 = st.columns(2)
 
@@ -0,0 +1,200 @@
+"""Benchmarks for the ingestion pipeline.
+
+Run with: komm_vqa bench <benchmark> [options]
+"""
+
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path
+
+from PIL import Image
+
+from komm_vqa.ingest.profiles import DEFAULT_JPEG_QUALITY, DEFAULT_PROFILE, RasterProfile
+from komm_vqa.ingest.rasterize import DEFAULT_WINDOW_SIZE, encode_jpeg, iter_rasterized_windows, pdf_page_count
+from komm_vqa.ingest.renditions import RENDITION_SIZES, THUMBNAIL, make_thumbnail
+
+
+@dataclass
+class BenchResult:
+    """Aggregated measurements for one benchmark variant."""
+
+    name: str
+    items: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    total_bytes: int = 0
+    peak_rss_mb: float | None = None  # peak resident memory of the process that ran the variant
+
+    @property
+    def wall_ms_per_item(self) -> float:
+        return self.wall_seconds * 1000 / self.items if self.items else 0.0
+
+    @property
+    def cpu_ms_per_item(self) -> float:
+        return self.cpu_seconds * 1000 / self.items if self.items else 0.0
+
+    @property
+    def bytes_per_item(self) -> float:
+        return self.total_bytes / self.items if self.items else 0.0
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process plus its waited-for children (e.g. poppler)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name: str, run: Callable[[], Iterable[bytes]]) -> BenchResult:
+    """Measure wall time, CPU time and output size of a benchmark run.
+
+    Args:
+        name: Variant name shown in the report
+        run: Callable returning the produced byte strings (consumed lazily)
+
+    Returns:
+        BenchResult for the run
+    """
+    result = BenchResult(name)
+    wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+    for data in run():
+        result.items += 1
+        result.total_bytes += len(data)
+    result.wall_seconds = time.perf_counter() - wall_start
+    result.cpu_seconds = cpu_seconds() - cpu_start
+    return result
+
+
+def rasterized_pages(
+    pdf_paths: list[Path], profile: RasterProfile, window_size: int, passthrough: bool = True
+) -> Iterable[bytes]:
+    """Rasterize sample PDFs and yield every page image."""
+    for pdf_path in pdf_paths:
+        page_count = pdf_page_count(pdf_path)
+        for window in iter_rasterized_windows(pdf_path, page_count, profile, window_size, passthrough):
+            yield from window
+
+
+def bench_rasterize(
+    pdf_paths: list[Path],
+    profile: RasterProfile = DEFAULT_PROFILE,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+) -> list[BenchResult]:
+    """Compare poppler JPEG passthrough against decoding and re-encoding with PIL.
+
+    Args:
+        pdf_paths: Sample PDF files
+        profile: JPEG raster profile to compare with
+        window_size: Pages rasterized per poppler call
+
+    Returns:
+        One BenchResult per mode
+    """
+    return [
+        measure("passthrough", lambda: rasterized_pages(pdf_paths, profile, window_size, passthrough=True)),
+        measure("re-encode", lambda: rasterized_pages(pdf_paths, profile, window_size, passthrough=False)),
+    ]
+
+
+def bench_profiles(
+    pdf_paths: list[Path], profiles: list[RasterProfile], window_size: int = DEFAULT_WINDOW_SIZE
+) -> list[BenchResult]:
+    """Measure page size and rasterization latency of raster profiles.
+
+    Args:
+        pdf_paths: Sample PDF files
+        profiles: Raster profiles to compare
+        window_size: Pages rasterized per poppler call
+
+    Returns:
+        One BenchResult per profile
+    """
+    return [
+        measure(profile.name, lambda p=profile: rasterized_pages(pdf_paths, p, window_size)) for profile in profiles
+    ]
+
+
+def load_sample_images(paths: list[Path]) -> list[bytes]:
+    """Read sample page images; PDFs are rasterized with the default profile."""
+    images = []
+    for path in paths:
+        if path.suffix.lower() == ".pdf":
+            images.extend(rasterized_pages([path], DEFAULT_PROFILE, DEFAULT_WINDOW_SIZE))
+        else:
+            images.append(path.read_bytes())
+    return images
+
+
+def pillow_thumbnail(image_bytes: bytes, box: tuple[int, int]) -> bytes:
+    """Thumbnail as load_thumbnail made it before reduced-scale decoding (Pillow's default 2x draft)."""
+    img = Image.open(BytesIO(image_bytes))
+    img.thumbnail(box, Image.Resampling.LANCZOS)
+    return encode_jpeg(img.convert("RGB"), DEFAULT_JPEG_QUALITY)
+
+
+THUMBNAIL_VARIANTS: dict[str, Callable[[bytes, tuple[int, int]], bytes]] = {
+    "full decode": lambda data, box: make_thumbnail(data, box, draft=False).contents,
+    "pillow default": pillow_thumbnail,
+    "draft": lambda data, box: make_thumbnail(data, box, draft=True).contents,
+}
+
+
+def _measure_thumbnail_variant(variant: str, images: list[bytes], box: tuple[int, int], repeat: int) -> BenchResult:
+    make = THUMBNAIL_VARIANTS[variant]
+    result = measure(variant, lambda: (make(data, box) for _ in range(repeat) for data in images))
+    result.peak_rss_mb = peak_rss_mb()
+    return result
+
+
+def bench_thumbnails(paths: list[Path], size: int = RENDITION_SIZES[THUMBNAIL], repeat: int = 3) -> list[BenchResult]:
+    """Compare thumbnail decoding strategies on sample page images.
+
+    Each variant runs in a fresh process, so its peak RSS is not inflated by
+    the variants before it.
+
+    Args:
+        paths: Sample page images or PDFs
+        size: Longest side of the thumbnails
+        repeat: Number of passes over the samples
+
+    Returns:
+        One BenchResult per variant
+    """
+    images = load_sample_images(paths)
+    results = []
+    for variant in THUMBNAIL_VARIANTS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(_measure_thumbnail_variant, variant, images, (size, size), repeat).result())
+    return results
+
+
+def format_results(results: list[BenchResult], unit: str = "page") -> str:
+    """Format benchmark results as a plain text table."""
+    show_rss = any(r.peak_rss_mb is not None for r in results)
+    header = f"{'variant':<16} {unit + 's':>8} {'wall ms/' + unit:>14} {'cpu ms/' + unit:>14} {'KB/' + unit:>10}"
+    if show_rss:
+        header += f" {'peak RSS MB':>12}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        line = (
+            f"{r.name:<16} {r.items:>8} {r.wall_ms_per_item:>14.1f} {r.cpu_ms_per_item:>14.1f} "
+            f"{r.bytes_per_item / 1024:>10.1f}"
+        )
+        if show_rss:
+            line += f" {r.peak_rss_mb or 0:>12.1f}"
+        lines.append(line)
+    return "\n".join(lines)
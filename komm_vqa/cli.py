@@ -0,0 +1,471 @@
+"""Command line interface for headless KoMM-VQA operations.
+
+Run with: komm_vqa <command> [options]  (or python -m komm_vqa)
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy.exc import IntegrityError
+
+from komm_vqa.bench import bench_profiles, bench_rasterize, bench_thumbnails, format_results
+from komm_vqa.db import build_db_url, create_service, get_env_db_config
+from komm_vqa.ingest.backfill import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BLOB_BATCH_SIZE,
+    DEFAULT_SWEEP_MIN_AGE,
+    backfill_image_metadata,
+    backfill_page_hashes,
+    backfill_thumbnails,
+    migrate_blobs,
+    precompute_thumbnails,
+    sweep_blobs,
+)
+from komm_vqa.ingest.blobs import BLOB_STORE_ENV, get_blob_store
+from komm_vqa.ingest.dedup import file_sha256
+from komm_vqa.ingest.jobs import DEFAULT_POLL_INTERVAL, DEFAULT_STALE_AFTER, run_worker
+from komm_vqa.ingest.pipeline import (
+    DEFAULT_PDF_STORAGE_PATH,
+    IngestResult,
+    copy_to_storage,
+    default_title,
+    find_duplicate,
+    find_incomplete_documents,
+    ingest_pdf,
+    resume_document,
+)
+from komm_vqa.ingest.profiles import (
+    DEFAULT_DPI,
+    DEFAULT_JPEG_QUALITY,
+    DEFAULT_PROFILE,
+    PROFILES,
+    RasterProfile,
+    get_profile,
+)
+from komm_vqa.ingest.rasterize import DEFAULT_WINDOW_SIZE
+from komm_vqa.ingest.renditions import RENDITION_SIZES, THUMBNAIL
+
+
+def find_pdfs(directory: Path) -> list[Path]:
+    """Find all PDF files below a directory, sorted by path."""
+    return sorted(p for p in directory.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+
+
+@lru_cache(maxsize=1)
+def _worker_service(db_url: str) -> MultiModalIngestionService:
+    """Get the ingestion service of the current worker process (one engine per process)."""
+    # run_ingest set up the schema before starting the workers
+    return create_service(db_url, setup_schema=False)
+
+
+def ingest_file(db_url: str, pdf_path: Path, storage_path: Path, force: bool = False, **options) -> IngestResult:
+    """Copy one PDF into storage and ingest it. Runs inside a worker process.
+
+    Files whose content was already ingested are skipped before copying or
+    rasterizing, unless ``force`` is set. If an earlier run was interrupted
+    on the same content, that document is resumed instead.
+
+    Args:
+        db_url: SQLAlchemy database URL
+        pdf_path: Source PDF file
+        storage_path: PDF storage directory
+        force: Replace an existing document with identical content
+        **options: Keyword arguments forwarded to ``ingest_pdf``
+
+    Returns:
+        IngestResult; ``duplicate`` is set if the file was skipped
+    """
+    service = _worker_service(db_url)
+    sha256 = file_sha256(pdf_path)
+    existing = find_duplicate(service, sha256, force=force)
+    if existing and not existing.complete:
+        # An earlier run stopped part-way through this file: continue from its checkpoint
+        result = resume_document(service, existing.document_id)
+    elif existing:
+        return existing
+    else:
+        save_path = copy_to_storage(pdf_path, storage_path)
+        try:
+            result = ingest_pdf(
+                service, save_path, pdf_path.name, default_title(pdf_path.name), sha256=sha256, **options
+            )
+        except IntegrityError:
+            # Another worker stored the same content first (the File ID is the hash)
+            existing = find_duplicate(service, sha256)
+            if existing is None:
+                raise
+            return existing
+
+    # Build the gallery's thumbnail atlas now rather than on the first view
+    precompute_thumbnails(service, result.document_id)
+    return result
+
+
+def run_ingest(args: argparse.Namespace) -> int:
+    """Ingest every PDF below a directory, one document per worker process."""
+    pdfs = find_pdfs(Path(args.directory))
+    if not pdfs:
+        print(f"No PDF files found in {args.directory}")
+        return 1
+
+    storage_path = Path(args.storage)
+    storage_path.mkdir(parents=True, exist_ok=True)
+    # Create missing tables once, before workers start connecting
+    create_service(args.db_url)
+
+    print(f"Ingesting {len(pdfs)} PDF files with {args.workers} worker(s)...")
+    start = time.perf_counter()
+    total_pages = 0
+    failed = 0
+    skipped = 0
+
+    options: dict[str, Any] = {
+        "profile": get_profile(args.profile),
+        "window_size": args.window_size,
+        "passthrough": not args.reencode,
+        "force": args.force,
+    }
+
+    # Each worker rasterizes and writes its document window by window, so
+    # memory per worker is bounded by --window-size rather than by page count.
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) as pool:
+        futures = {
+            pool.submit(ingest_file, args.db_url, pdf_path, storage_path, **options): pdf_path for pdf_path in pdfs
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[FAIL] {pdf_path}: {e}")
+                continue
+            if result.duplicate:
+                skipped += 1
+                print(f"[SKIP] {pdf_path.name}: duplicate of doc {result.document_id[:8]}")
+                continue
+            total_pages += result.page_count
+            elapsed = time.perf_counter() - start
+            print(
+                f"[OK] {pdf_path.name}: {result.page_count} pages (doc {result.document_id[:8]}) | "
+                f"{total_pages / elapsed:.2f} pages/sec"
+            )
+
+    elapsed = time.perf_counter() - start
+    rate = total_pages / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Done: {len(pdfs) - failed - skipped}/{len(pdfs)} files ingested, {skipped} duplicates skipped, "
+        f"{total_pages} pages in {elapsed:.1f}s ({rate:.2f} pages/sec)"
+    )
+    return 1 if failed else 0
+
+
+def run_resume(args: argparse.Namespace) -> int:
+    """Resume interrupted ingestions from their last committed page window."""
+    service = create_service(args.db_url)
+    document_ids = args.document_ids or [doc.document_id for doc in find_incomplete_documents(service)]
+    if not document_ids:
+        print("No incomplete documents found")
+        return 0
+
+    failed = 0
+    for document_id in document_ids:
+
+        def on_progress(pages_done: int, page_count: int, document_id: str = document_id) -> None:
+            print(f"  {document_id[:8]}: {pages_done}/{page_count} pages", end="\r", flush=True)
+
+        try:
+            result = resume_document(service, document_id, progress=on_progress)
+        except Exception as e:
+            failed += 1
+            print(f"[FAIL] {document_id}: {e}")
+            continue
+        print(f"[OK] {document_id}: {result.page_count} pages")
+    return 1 if failed else 0
+
+
+def run_ingest_worker(args: argparse.Namespace) -> int:
+    """Process ingestion jobs enqueued by the Streamlit app."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    service = create_service(args.db_url)
+    try:
+        processed = run_worker(service, args.poll_interval, args.stale_after, once=args.once)
+    except KeyboardInterrupt:
+        print("Worker stopped")
+        return 0
+    print(f"Done: {processed} jobs processed")
+    return 0
+
+
+def run_backfill_page_hashes(args: argparse.Namespace) -> int:
+    """Compute perceptual hashes for pages ingested without one."""
+    service = create_service(args.db_url)
+
+    def on_progress(hashed: int, skipped: int) -> None:
+        print(f"{hashed} pages hashed, {skipped} skipped")
+
+    hashed, skipped = backfill_page_hashes(service, batch_size=args.batch_size, progress=on_progress)
+    print(f"Done: {hashed} pages hashed, {skipped} skipped")
+    return 0
+
+
+def run_backfill_image_metadata(args: argparse.Namespace) -> int:
+    """Record image size, codec and DPI for pages ingested without them."""
+    service = create_service(args.db_url)
+
+    def on_progress(updated: int, skipped: int) -> None:
+        print(f"{updated} pages updated, {skipped} skipped")
+
+    updated, skipped = backfill_image_metadata(service, batch_size=args.batch_size, progress=on_progress)
+    print(f"Done: {updated} pages updated, {skipped} skipped")
+    return 0
+
+
+def run_backfill_thumbnails(args: argparse.Namespace) -> int:
+    """Create missing renditions and thumbnail atlases of already ingested documents."""
+    service = create_service(args.db_url)
+
+    def on_progress(done: int, skipped: int) -> None:
+        print(f"{done} pages given renditions, {skipped} skipped")
+
+    done, skipped, atlases = backfill_thumbnails(service, batch_size=args.batch_size, progress=on_progress)
+    print(f"Done: {done} pages given renditions, {skipped} skipped, {atlases} atlases built")
+    return 0
+
+
+def run_bench_thumbnails(args: argparse.Namespace) -> int:
+    """Benchmark thumbnail decoding strategies on sample page images."""
+    results = bench_thumbnails(args.samples, size=args.size, repeat=args.repeat)
+    print(format_results(results, unit="thumb"))
+    return 0
+
+
+def run_migrate_blobs(args: argparse.Namespace) -> int:
+    """Move page images stored inline in Postgres into the blob store, or back with --inline."""
+    if get_blob_store() is None:
+        print(f"No blob store configured; set {BLOB_STORE_ENV} (e.g. {BLOB_STORE_ENV}=./data/blobs)")
+        return 1
+    service = create_service(args.db_url)
+
+    def on_progress(chunks: int, renditions: int) -> None:
+        print(f"{chunks} image chunks, {renditions} renditions moved")
+
+    chunks, renditions = migrate_blobs(service, batch_size=args.batch_size, progress=on_progress, inline=args.inline)
+    print(f"Done: {chunks} image chunks, {renditions} renditions moved")
+    return 0
+
+
+def run_sweep_blobs(args: argparse.Namespace) -> int:
+    """Delete blobs that no page image refers to anymore."""
+    if get_blob_store() is None:
+        print(f"No blob store configured; set {BLOB_STORE_ENV}")
+        return 1
+    service = create_service(args.db_url)
+    referenced, deleted = sweep_blobs(service, min_age=args.min_age, dry_run=args.dry_run)
+    action = "would be deleted" if args.dry_run else "deleted"
+    print(f"Done: {referenced} blobs referenced, {deleted} unreferenced blobs {action}")
+    return 0
+
+
+def run_bench_rasterize(args: argparse.Namespace) -> int:
+    """Benchmark rasterization modes on sample PDFs."""
+    profile = RasterProfile("bench", dpi=args.dpi, quality=args.quality)
+    results = bench_rasterize(args.pdfs, profile)
+    print(format_results(results))
+    return 0
+
+
+def run_bench_profiles(args: argparse.Namespace) -> int:
+    """Benchmark page size and rasterization latency of raster profiles."""
+    profiles = [get_profile(name) for name in args.profiles]
+    results = bench_profiles(args.pdfs, profiles)
+    print(format_results(results))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(prog="komm_vqa", description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--db-url",
+        default=build_db_url(get_env_db_config()),
+        help="SQLAlchemy database URL (default: built from POSTGRES_* environment variables)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Ingest all PDF files in a directory")
+    ingest.add_argument("directory", help="Directory to search for PDF files (recursive)")
+    ingest.add_argument("--workers", type=int, default=4, help="Number of ingestion processes (default: 4)")
+    ingest.add_argument(
+        "--storage",
+        default=DEFAULT_PDF_STORAGE_PATH,
+        help=f"PDF storage directory (default: {DEFAULT_PDF_STORAGE_PATH})",
+    )
+    ingest.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE.name,
+        help=f"Raster profile: DPI, codec and quality of page images (default: {DEFAULT_PROFILE.name})",
+    )
+    ingest.add_argument(
+        "--window-size",
+        type=int,
+        default=DEFAULT_WINDOW_SIZE,
+        help=f"Pages rasterized per poppler call; bounds memory per worker (default: {DEFAULT_WINDOW_SIZE})",
+    )
+    ingest.add_argument(
+        "--reencode",
+        action="store_true",
+        help="Decode poppler output and re-encode it with PIL instead of storing poppler's JPEG as-is",
+    )
+    ingest.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-ingest files whose content was already ingested (the existing document is deleted)",
+    )
+    ingest.set_defaults(func=run_ingest)
+
+    resume = subparsers.add_parser("resume", help="Resume interrupted ingestions from their last checkpoint")
+    resume.add_argument(
+        "document_ids", nargs="*", help="Documents to resume (default: all documents with incomplete ingestion)"
+    )
+    resume.set_defaults(func=run_resume)
+
+    worker = subparsers.add_parser("worker", help="Process ingestion jobs enqueued by the Streamlit app")
+    worker.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Seconds to wait when the queue is empty (default: {DEFAULT_POLL_INTERVAL})",
+    )
+    worker.add_argument(
+        "--stale-after",
+        type=float,
+        default=DEFAULT_STALE_AFTER,
+        help=f"Seconds without progress after which another worker takes over a job (default: {DEFAULT_STALE_AFTER})",
+    )
+    worker.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    worker.set_defaults(func=run_ingest_worker)
+
+    backfill = subparsers.add_parser("backfill", help="Compute derived data for already ingested pages")
+    backfill_commands = backfill.add_subparsers(dest="target", required=True)
+
+    backfill_hashes = backfill_commands.add_parser(
+        "page-hashes", help="Compute perceptual hashes used to flag duplicate pages"
+    )
+    backfill_hashes.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Pages loaded and updated per transaction (default: {DEFAULT_BATCH_SIZE})",
+    )
+    backfill_hashes.set_defaults(func=run_backfill_page_hashes)
+
+    backfill_metadata = backfill_commands.add_parser(
+        "image-metadata", help="Record width, height, byte size, codec and DPI of page images"
+    )
+    backfill_metadata.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Pages loaded and updated per transaction (default: {DEFAULT_BATCH_SIZE})",
+    )
+    backfill_metadata.set_defaults(func=run_backfill_image_metadata)
+
+    backfill_thumbs = backfill_commands.add_parser(
+        "thumbnails", help="Create missing page renditions and gallery thumbnail atlases (KOMM_VQA_ATLAS_DIR)"
+    )
+    backfill_thumbs.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BLOB_BATCH_SIZE,
+        help=f"Pages loaded and updated per transaction (default: {DEFAULT_BLOB_BATCH_SIZE})",
+    )
+    backfill_thumbs.set_defaults(func=run_backfill_thumbnails)
+
+    migrate = subparsers.add_parser(
+        "migrate-blobs", help="Move page images stored in Postgres into the blob store (KOMM_VQA_BLOB_STORE)"
+    )
+    migrate.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BLOB_BATCH_SIZE,
+        help=f"Images moved per transaction (default: {DEFAULT_BLOB_BATCH_SIZE})",
+    )
+    migrate.add_argument(
+        "--inline",
+        action="store_true",
+        help="Move the images from the blob store back into Postgres (e.g. before sharing the database)",
+    )
+    migrate.set_defaults(func=run_migrate_blobs)
+
+    sweep = subparsers.add_parser(
+        "sweep-blobs", help="Delete blobs no page image refers to anymore (after deleting or re-ingesting documents)"
+    )
+    sweep.add_argument(
+        "--min-age",
+        type=float,
+        default=DEFAULT_SWEEP_MIN_AGE,
+        help=f"Keep blobs written less than this many seconds ago (default: {DEFAULT_SWEEP_MIN_AGE})",
+    )
+    sweep.add_argument("--dry-run", action="store_true", help="Only count the blobs that would be deleted")
+    sweep.set_defaults(func=run_sweep_blobs)
+
+    bench = subparsers.add_parser("bench", help="Run ingestion benchmarks")
+    bench_commands = bench.add_subparsers(dest="benchmark", required=True)
+
+    bench_raster = bench_commands.add_parser(
+        "rasterize", help="Compare JPEG passthrough against PIL re-encoding (ms/page, CPU ms/page, KB/page)"
+    )
+    bench_raster.add_argument("pdfs", nargs="+", type=Path, help="Sample PDF files")
+    bench_raster.add_argument("--dpi", type=int, default=DEFAULT_DPI, help=f"Rendering DPI (default: {DEFAULT_DPI})")
+    bench_raster.add_argument(
+        "--quality",
+        type=int,
+        default=DEFAULT_JPEG_QUALITY,
+        help=f"JPEG quality (default: {DEFAULT_JPEG_QUALITY})",
+    )
+    bench_raster.set_defaults(func=run_bench_rasterize)
+
+    bench_prof = bench_commands.add_parser("profiles", help="Compare raster profiles (ms/page, CPU ms/page, KB/page)")
+    bench_prof.add_argument("pdfs", nargs="+", type=Path, help="Sample PDF files")
+    bench_prof.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=list(PROFILES),
+        default=list(PROFILES),
+        help="Profiles to compare (default: all)",
+    )
+    bench_prof.set_defaults(func=run_bench_profiles)
+
+    bench_thumbs = bench_commands.add_parser(
+        "thumbnails", help="Compare full-size and reduced-scale JPEG decoding for thumbnails (ms, peak RSS)"
+    )
+    bench_thumbs.add_argument("samples", nargs="+", type=Path, help="Sample page images (JPEG) or PDFs")
+    bench_thumbs.add_argument(
+        "--size",
+        type=int,
+        default=RENDITION_SIZES[THUMBNAIL],
+        help=f"Longest side of the thumbnails (default: {RENDITION_SIZES[THUMBNAIL]})",
+    )
+    bench_thumbs.add_argument("--repeat", type=int, default=3, help="Passes over the samples (default: 3)")
+    bench_thumbs.set_defaults(func=run_bench_thumbnails)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+"""Database helpers that do not depend on Streamlit.
+
+Shared by the Streamlit app (``komm_vqa.app.db``) and the command line tools.
+"""
+
+import os
+
+from autorag_research.orm.schema_factory import create_schema
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from komm_vqa.ingest import catalog, jobs, renditions
+from komm_vqa.ingest.phash import HASH_CHUNK_LENGTH, HASH_CHUNKS
+
+# Default values
+DEFAULT_DB_HOST = "localhost"
+DEFAULT_DB_PORT = "5432"
+DEFAULT_DB_NAME = "testdb"
+DEFAULT_DB_USER = "postgres"
+
+EMBEDDING_DIM = 768
+
+
+def _if_missing(missing: str, ddl: str) -> str:
+    """Wrap DDL in a block that only runs it when ``missing`` is true.
+
+    ``IF NOT EXISTS`` clauses lock the table before checking, and this DDL
+    runs on every app start and rerun, so each statement would wait for and
+    then block the ingest workers' writes. The catalog check takes no table
+    lock. A start that loses a race to create the same object skips it.
+    """
+    return f"""DO $$ BEGIN
+        IF {missing} THEN
+            {ddl};
+        END IF;
+    EXCEPTION WHEN duplicate_object OR duplicate_table OR duplicate_column OR unique_violation THEN NULL;
+    END $$"""
+
+
+# Indexes and columns added after tables were first created (idempotent)
+EXTRA_DDL = [
+    # Perceptual hash of page images, used to find duplicate pages
+    _if_missing(
+        "to_regclass('ix_page_dhash') IS NULL",
+        "CREATE INDEX ix_page_dhash ON page ((page_metadata ->> 'dhash'))",
+    ),
+    # Hash chunks, to look up near-duplicate candidates (see komm_vqa.ingest.pipeline.find_duplicate_pages)
+    *(
+        _if_missing(
+            f"to_regclass('ix_page_dhash_{i}') IS NULL",
+            f"CREATE INDEX ix_page_dhash_{i} ON page "
+            f"(substr(page_metadata ->> 'dhash', {i * HASH_CHUNK_LENGTH + 1}, {HASH_CHUNK_LENGTH}))",
+        )
+        for i in range(HASH_CHUNKS)
+    ),
+    _if_missing(
+        "NOT EXISTS (SELECT FROM information_schema.columns WHERE table_name = 'ingest_job' AND column_name = 'kind')",
+        "ALTER TABLE ingest_job ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'ingest'",
+    ),
+    # Renditions are deleted with their page
+    _if_missing(
+        "NOT EXISTS (SELECT FROM pg_constraint WHERE conname = 'fk_page_rendition_page_id')",
+        "ALTER TABLE page_rendition ADD CONSTRAINT fk_page_rendition_page_id "
+        "FOREIGN KEY (page_id) REFERENCES page (id) ON DELETE CASCADE",
+    ),
+    # Document catalog version (see komm_vqa.ingest.catalog), bumped once per transaction that changes
+    # documents or pages. The triggers are deferred to commit, so the row lock is only held while committing.
+    "INSERT INTO document_catalog_version (id, version) VALUES (1, 0) ON CONFLICT DO NOTHING",
+    # Checked first like the triggers below: replacing the function on every start made concurrent starts
+    # (app reruns, workers) fail with "tuple concurrently updated"; a start that loses the race skips it
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT FROM pg_proc WHERE proname = 'bump_document_catalog_version') THEN
+            CREATE FUNCTION bump_document_catalog_version() RETURNS trigger AS $fn$
+            BEGIN
+                UPDATE document_catalog_version SET version = version + 1, txid = txid_current()
+                    WHERE txid IS DISTINCT FROM txid_current();
+                RETURN NULL;
+            END $fn$ LANGUAGE plpgsql;
+        END IF;
+    EXCEPTION WHEN duplicate_function OR unique_violation THEN NULL;
+    END $$""",
+    # Checked first: creating a trigger locks its table against writes, and this DDL runs on every app start.
+    # Document updates only count when they change what the catalog shows: the title, filename, file, raster
+    # profile or checkpoint status (the PROFILE_KEY and CHECKPOINT_KEY entries of komm_vqa.ingest.pipeline).
+    # Checkpoint progress is saved together with the pages it counts, which bump the version themselves.
+    # Replaces the trigger that fired on every document update.
+    """DO $$ BEGIN
+        IF EXISTS (SELECT FROM pg_trigger WHERE tgname = 'document_catalog_version_document') THEN
+            DROP TRIGGER document_catalog_version_document ON document;
+        END IF;
+        IF NOT EXISTS (SELECT FROM pg_trigger WHERE tgname = 'document_catalog_version_document_insert_delete') THEN
+            CREATE CONSTRAINT TRIGGER document_catalog_version_document_insert_delete
+                AFTER INSERT OR DELETE ON document DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW EXECUTE FUNCTION bump_document_catalog_version();
+        END IF;
+        IF NOT EXISTS (SELECT FROM pg_trigger WHERE tgname = 'document_catalog_version_document_update') THEN
+            CREATE CONSTRAINT TRIGGER document_catalog_version_document_update
+                AFTER UPDATE ON document DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW WHEN (
+                    OLD.title IS DISTINCT FROM NEW.title
+                    OR OLD.filename IS DISTINCT FROM NEW.filename
+                    OR OLD.path IS DISTINCT FROM NEW.path
+                    OR OLD.doc_metadata -> 'raster_profile' IS DISTINCT FROM NEW.doc_metadata -> 'raster_profile'
+                    OR OLD.doc_metadata -> 'ingest' ->> 'status'
+                        IS DISTINCT FROM NEW.doc_metadata -> 'ingest' ->> 'status'
+                )
+                EXECUTE FUNCTION bump_document_catalog_version();
+        END IF;
+        IF NOT EXISTS (SELECT FROM pg_trigger WHERE tgname = 'document_catalog_version_page') THEN
+            CREATE CONSTRAINT TRIGGER document_catalog_version_page
+                AFTER INSERT OR DELETE ON page DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW EXECUTE FUNCTION bump_document_catalog_version();
+        END IF;
+    END $$""",
+]
+
+
+def get_env_db_config() -> dict[str, str]:
+    """Get database configuration from environment variables or defaults."""
+    return {
+        "host": os.environ.get("POSTGRES_HOST", DEFAULT_DB_HOST),
+        "port": os.environ.get("POSTGRES_PORT", DEFAULT_DB_PORT),
+        "database": os.environ.get("POSTGRES_DB", os.environ.get("TEST_DB_NAME", DEFAULT_DB_NAME)),
+        "user": os.environ.get("POSTGRES_USER", DEFAULT_DB_USER),
+        "password": os.environ.get("POSTGRES_PASSWORD", ""),
+    }
+
+
+def build_db_url(config: dict[str, str]) -> str:
+    """Construct database URL from a configuration dict."""
+    return f"postgresql+psycopg://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
+
+
+def get_schema():
+    """Get schema with string primary keys for UUID support."""
+    return create_schema(EMBEDDING_DIM, primary_key_type="string")
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Create all tables and indexes that do not exist yet."""
+    get_schema().Base.metadata.create_all(engine)
+    jobs.metadata.create_all(engine)
+    catalog.metadata.create_all(engine)
+    renditions.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for ddl in EXTRA_DDL:
+            conn.execute(text(ddl))
+
+
+def create_service(db_url: str, setup_schema: bool = True) -> MultiModalIngestionService:
+    """Create a MultiModalIngestionService outside of Streamlit.
+
+    Args:
+        db_url: SQLAlchemy database URL
+        setup_schema: Create missing tables and indexes first; off for processes started after that was done
+
+    Returns:
+        Service bound to a fresh engine
+    """
+    engine = create_engine(db_url, pool_pre_ping=True)
+    if setup_schema:
+        ensure_schema(engine)
+    return MultiModalIngestionService(sessionmaker(bind=engine), get_schema())
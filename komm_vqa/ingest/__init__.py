@@ -0,0 +1 @@
+"""Streamlit-free ingestion pipeline shared by the app and the command line."""
@@ -0,0 +1,205 @@
+"""Per-document thumbnail atlas: all thumbnails of a document packed into one memory-mapped file.
+
+A gallery slices thumbnails out of the atlas instead of querying and decoding
+one page at a time. Atlases are derived data kept in a local directory
+(``KOMM_VQA_ATLAS_DIR``, default ``./data/atlas``) and rebuilt from the
+thumbnail renditions when missing or when the document's page count changed.
+
+File layout: 8-byte magic, little-endian uint32 index length, JSON index,
+then the concatenated JPEG thumbnails.
+"""
+
+import json
+import mmap
+import os
+import struct
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import and_, select
+
+from komm_vqa.ingest.blobs import get_blob_store, resolve_blob
+from komm_vqa.ingest.renditions import RENDITION_SIZES, THUMBNAIL, make_thumbnail, page_rendition
+
+ATLAS_DIR_ENV = "KOMM_VQA_ATLAS_DIR"
+DEFAULT_ATLAS_DIR = "./data/atlas"
+ATLAS_MAGIC = b"KMVATL01"
+HEADER = struct.Struct("<8sI")
+# Full images fetched per round trip when building the atlas of pages without thumbnail renditions
+FULL_IMAGE_BATCH_SIZE = 50
+
+
+@dataclass
+class AtlasEntry:
+    """Location and size of one page thumbnail inside an atlas."""
+
+    page_num: int
+    offset: int
+    length: int
+    width: int
+    height: int
+
+
+def atlas_path(document_id: str, directory: Path | None = None) -> Path:
+    """Get the atlas file path of a document."""
+    directory = directory or Path(os.environ.get(ATLAS_DIR_ENV, DEFAULT_ATLAS_DIR))
+    return directory / f"{document_id}.atlas"
+
+
+def write_atlas(path: Path, thumbnails: list[tuple[str, int, bytes, int, int]], page_count: int | None = None) -> None:
+    """Write an atlas file, replacing any existing one atomically.
+
+    Args:
+        path: Atlas file path
+        thumbnails: (page_id, page_num, JPEG bytes, width, height) of the pages of the document
+        page_count: Page count of the document the atlas was built for (default: number of thumbnails)
+    """
+    pages = {}
+    offset = 0
+    for page_id, page_num, contents, width, height in thumbnails:
+        pages[page_id] = [page_num, offset, len(contents), width, height]
+        offset += len(contents)
+    index = json.dumps({"page_count": len(thumbnails) if page_count is None else page_count, "pages": pages}).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(ATLAS_MAGIC, len(index)))
+        f.write(index)
+        for _, _, contents, _, _ in thumbnails:
+            f.write(contents)
+    tmp_path.replace(path)
+
+
+class ThumbnailAtlas:
+    """Read-only atlas; thumbnails are sliced from a memory map of the file."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = HEADER.unpack_from(self._map)
+        if magic != ATLAS_MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a thumbnail atlas: {path}")
+        index = json.loads(self._map[HEADER.size : HEADER.size + index_length])
+        self._data_start = HEADER.size + index_length
+        self.page_count: int = index["page_count"]
+        self.entries = {page_id: AtlasEntry(*entry) for page_id, entry in index["pages"].items()}
+
+    def __contains__(self, page_id: str) -> bool:
+        return page_id in self.entries
+
+    def get(self, page_id: str) -> bytes | None:
+        """Get the JPEG thumbnail of a page, or None if the page is not in the atlas."""
+        entry = self.entries.get(page_id)
+        if entry is None:
+            return None
+        start = self._data_start + entry.offset
+        return self._map[start : start + entry.length]
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def build_atlas(service: MultiModalIngestionService, document_id: str, path: Path) -> int:
+    """Pack the thumbnails of all pages of a document into an atlas file.
+
+    Stored thumbnail renditions are used as-is; pages ingested before
+    renditions existed get a thumbnail made from their full image.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        path: Atlas file path
+
+    Returns:
+        Number of pages in the atlas
+    """
+    store = get_blob_store()
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model, chunk_model = uow.pages.model_cls, uow.image_chunks.model_cls
+        rows = uow.session.execute(
+            select(
+                page_model.id,
+                page_model.page_num,
+                page_rendition.c.contents,
+                page_rendition.c.width,
+                page_rendition.c.height,
+            )
+            .outerjoin(
+                page_rendition,
+                and_(page_rendition.c.page_id == page_model.id, page_rendition.c.rendition == THUMBNAIL),
+            )
+            .where(page_model.document_id == document_id)
+            .order_by(page_model.page_num)
+        ).all()
+
+        thumbnails = {}
+        page_nums = {}
+        for page_id, page_num, contents, width, height in rows:
+            if contents is None:
+                page_nums[page_id] = page_num
+            else:
+                thumbnails[page_id] = (page_id, page_num, resolve_blob(contents, store), width, height)
+
+        if page_nums:
+            # Pages ingested before renditions existed: their full images come from one query, streamed
+            # so that only a batch of them is held at a time
+            size = RENDITION_SIZES[THUMBNAIL]
+            full_images = uow.session.execute(
+                select(chunk_model.parent_page, chunk_model.contents)
+                .where(chunk_model.parent_page.in_(list(page_nums)))
+                .execution_options(yield_per=FULL_IMAGE_BATCH_SIZE)
+            )
+            for page_id, full in full_images:
+                # A page has one image chunk; should there be more, keep the first like get_page_images
+                if full is None or page_id in thumbnails:
+                    continue
+                thumbnail = make_thumbnail(resolve_blob(full, store), (size, size))
+                thumbnails[page_id] = (
+                    page_id,
+                    page_nums[page_id],
+                    thumbnail.contents,
+                    thumbnail.width,
+                    thumbnail.height,
+                )
+
+    # Pages without an image are left out but counted, so the atlas is not considered stale
+    write_atlas(path, sorted(thumbnails.values(), key=lambda thumbnail: thumbnail[1]), page_count=len(rows))
+    return len(thumbnails)
+
+
+def open_atlas(
+    service: MultiModalIngestionService, document_id: str, page_count: int, directory: Path | None = None
+) -> ThumbnailAtlas:
+    """Open the thumbnail atlas of a document, building it first if it is missing or stale.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        page_count: Current number of pages of the document; an atlas with another count is rebuilt
+        directory: Atlas directory (default: ``KOMM_VQA_ATLAS_DIR``)
+
+    Returns:
+        The opened atlas
+    """
+    path = atlas_path(document_id, directory)
+    if not is_current(path, page_count):
+        build_atlas(service, document_id, path)
+    return ThumbnailAtlas(path)
+
+
+def is_current(path: Path, page_count: int) -> bool:
+    """Check whether an atlas file exists and was built for a document with ``page_count`` pages."""
+    if not path.exists():
+        return False
+    atlas = ThumbnailAtlas(path)
+    try:
+        return atlas.page_count == page_count
+    finally:
+        atlas.close()
@@ -0,0 +1,431 @@
+"""Backfill derived page data and migrate stored data of documents ingested before it was introduced."""
+
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import ColumnElement, and_, bindparam, exists, func, literal_column, select, tuple_, update
+
+from komm_vqa.ingest.atlas import atlas_path, build_atlas, is_current
+from komm_vqa.ingest.blobs import BLOB_REF_PREFIX, BLOB_STORE_ENV, BlobStore, get_blob_store, resolve_blob, store_blob
+from komm_vqa.ingest.images import image_metadata
+from komm_vqa.ingest.lookups import blob_ref_key, is_blob_ref
+from komm_vqa.ingest.phash import dhash
+from komm_vqa.ingest.pipeline import CHECKPOINT_KEY, PROFILE_KEY, document_profile, page_dhash
+from komm_vqa.ingest.renditions import THUMBNAIL, insert_renditions, make_renditions, page_rendition
+
+DEFAULT_BATCH_SIZE = 200
+# Image rows hold whole images, so blob migration and rendition batches are smaller
+DEFAULT_BLOB_BATCH_SIZE = 50
+# Blobs younger than this are never swept: their rows may not be committed yet
+DEFAULT_SWEEP_MIN_AGE = 3600
+
+BackfillProgress = Callable[[int, int], None]
+
+
+def _page_image(contents: bytes | None, store: BlobStore | None) -> bytes:
+    # Pages without an image chunk are skipped like pages whose image cannot be decoded
+    if contents is None:
+        raise ValueError("Page has no image")
+    return resolve_blob(contents, store)
+
+
+def backfill_page_hashes(
+    service: MultiModalIngestionService,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: BackfillProgress | None = None,
+) -> tuple[int, int]:
+    """Compute the perceptual hash of every page that does not have one yet.
+
+    Pages are processed in batches ordered by ID, one transaction per batch,
+    so an interrupted run keeps its progress and can simply be restarted.
+
+    Args:
+        service: Ingestion service
+        batch_size: Number of pages loaded and updated per transaction
+        progress: Optional callback called with (hashed, skipped) after each batch
+
+    Returns:
+        Tuple of (hashed, skipped) page counts. Pages are skipped if their
+        image is missing or cannot be decoded.
+    """
+    store = get_blob_store()
+    hashed = skipped = 0
+    last_id = ""
+    while True:
+        with service._create_uow() as uow:
+            if uow.session is None:
+                raise SessionNotSetError
+            page_model = uow.pages.model_cls
+            chunk_model = uow.image_chunks.model_cls
+            rows = uow.session.execute(
+                select(page_model.id, page_model.page_metadata, chunk_model.contents)
+                .outerjoin(chunk_model, chunk_model.parent_page == page_model.id)
+                .where(page_dhash(page_model).is_(None), page_model.id > last_id)
+                .order_by(page_model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            updates = []
+            for page_id, page_metadata, contents in rows:
+                try:
+                    page_hash = dhash(_page_image(contents, store))
+                except (OSError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                updates.append({"id": page_id, "page_metadata": {**(page_metadata or {}), "dhash": page_hash}})
+            if updates:
+                uow.session.execute(update(page_model), updates)
+            uow.commit()
+
+        hashed += len(updates)
+        last_id = rows[-1].id
+        if progress:
+            progress(hashed, skipped)
+    return hashed, skipped
+
+
+def backfill_image_metadata(
+    service: MultiModalIngestionService,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: BackfillProgress | None = None,
+) -> tuple[int, int]:
+    """Record the image metadata (see ``image_metadata``) of every page ingested without it.
+
+    The DPI is taken from the raster profile recorded on the page's document,
+    or from the image file itself for documents without one (uploaded images).
+    Batches are processed like in ``backfill_page_hashes``.
+
+    Args:
+        service: Ingestion service
+        batch_size: Number of pages loaded and updated per transaction
+        progress: Optional callback called with (updated, skipped) after each batch
+
+    Returns:
+        Tuple of (updated, skipped) page counts. Pages are skipped if their
+        image is missing or cannot be read.
+    """
+    store = get_blob_store()
+    updated = skipped = 0
+    last_id = ""
+    while True:
+        with service._create_uow() as uow:
+            if uow.session is None:
+                raise SessionNotSetError
+            page_model = uow.pages.model_cls
+            chunk_model = uow.image_chunks.model_cls
+            document_model = uow.documents.model_cls
+            rows = uow.session.execute(
+                select(page_model.id, page_model.page_metadata, document_model.doc_metadata, chunk_model.contents)
+                .join(document_model, document_model.id == page_model.document_id)
+                .outerjoin(chunk_model, chunk_model.parent_page == page_model.id)
+                .where(
+                    page_model.page_metadata.op("->>")(literal_column("'codec'")).is_(None),
+                    page_model.id > last_id,
+                )
+                .order_by(page_model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            updates = []
+            for page_id, page_metadata, doc_metadata, contents in rows:
+                try:
+                    metadata = image_metadata(_page_image(contents, store), _recorded_dpi(doc_metadata))
+                except (OSError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                updates.append({"id": page_id, "page_metadata": {**(page_metadata or {}), **metadata}})
+            if updates:
+                uow.session.execute(update(page_model), updates)
+            uow.commit()
+
+        updated += len(updates)
+        last_id = rows[-1].id
+        if progress:
+            progress(updated, skipped)
+    return updated, skipped
+
+
+def _recorded_dpi(doc_metadata: dict | None) -> int | None:
+    # Only rasterized PDFs record a profile or checkpoint; uploaded images keep their own DPI, if any
+    if doc_metadata and (PROFILE_KEY in doc_metadata or CHECKPOINT_KEY in doc_metadata):
+        return document_profile(doc_metadata).dpi
+    return None
+
+
+def backfill_renditions(
+    service: MultiModalIngestionService,
+    batch_size: int = DEFAULT_BLOB_BATCH_SIZE,
+    progress: BackfillProgress | None = None,
+    document_id: str | None = None,
+) -> tuple[int, int]:
+    """Create the thumbnail and preview renditions of pages that have none.
+
+    Pages ingested before renditions existed get them made from their full
+    image, like at ingest (see ``make_renditions``). Batches are processed
+    like in ``backfill_page_hashes``.
+
+    Args:
+        service: Ingestion service
+        batch_size: Number of pages loaded and updated per transaction
+        progress: Optional callback called with (pages done, skipped) after each batch
+        document_id: Only the pages of this document (default: all pages)
+
+    Returns:
+        Tuple of (pages done, skipped) page counts. Pages are skipped if their
+        image is missing or cannot be decoded.
+    """
+    store = get_blob_store()
+    done = skipped = 0
+    last_id = ""
+    while True:
+        with service._create_uow() as uow:
+            if uow.session is None:
+                raise SessionNotSetError
+            page_model = uow.pages.model_cls
+            chunk_model = uow.image_chunks.model_cls
+            has_thumbnail = exists().where(
+                and_(page_rendition.c.page_id == page_model.id, page_rendition.c.rendition == THUMBNAIL)
+            )
+            query = (
+                select(page_model.id, chunk_model.contents)
+                .outerjoin(chunk_model, chunk_model.parent_page == page_model.id)
+                .where(~has_thumbnail, page_model.id > last_id)
+                .order_by(page_model.id)
+                .limit(batch_size)
+            )
+            if document_id is not None:
+                query = query.where(page_model.document_id == document_id)
+            rows = uow.session.execute(query).all()
+            if not rows:
+                break
+
+            renditions = {}
+            for page_id, contents in rows:
+                try:
+                    _, renditions[page_id] = make_renditions(_page_image(contents, store))
+                except (OSError, TypeError, ValueError):
+                    skipped += 1
+            insert_renditions(uow, renditions, store)
+            uow.commit()
+
+        done += len(renditions)
+        last_id = rows[-1].id
+        if progress:
+            progress(done, skipped)
+    return done, skipped
+
+
+def precompute_thumbnails(
+    service: MultiModalIngestionService, document_id: str, progress: BackfillProgress | None = None
+) -> int:
+    """Make everything a document's gallery needs before anyone opens it.
+
+    Creates missing renditions (see ``backfill_renditions``) and builds the
+    document's thumbnail atlas, so the first gallery view is as fast as a
+    warm one.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        progress: Optional callback called with (pages done, skipped) while renditions are created
+
+    Returns:
+        Number of pages in the atlas
+    """
+    backfill_renditions(service, progress=progress, document_id=document_id)
+    return build_atlas(service, document_id, atlas_path(document_id))
+
+
+def backfill_thumbnails(
+    service: MultiModalIngestionService,
+    batch_size: int = DEFAULT_BLOB_BATCH_SIZE,
+    progress: BackfillProgress | None = None,
+) -> tuple[int, int, int]:
+    """Precompute thumbnails of all existing documents: missing renditions, then missing or stale atlases.
+
+    Args:
+        service: Ingestion service
+        batch_size: Number of pages loaded and updated per transaction
+        progress: Optional callback called with (pages done, skipped) after each rendition batch
+
+    Returns:
+        Tuple of (pages given renditions, pages skipped, atlases built)
+    """
+    done, skipped = backfill_renditions(service, batch_size, progress)
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model = uow.pages.model_cls
+        page_counts = uow.session.execute(
+            select(page_model.document_id, func.count(page_model.id)).group_by(page_model.document_id)
+        ).all()
+
+    built = 0
+    for document_id, page_count in page_counts:
+        path = atlas_path(document_id)
+        if not is_current(path, page_count):
+            build_atlas(service, document_id, path)
+            built += 1
+    return done, skipped, built
+
+
+def is_inline(contents) -> ColumnElement:
+    """SQL condition for image columns that still hold the image bytes instead of a blob reference."""
+    return func.substring(contents, 1, len(BLOB_REF_PREFIX)) != BLOB_REF_PREFIX
+
+
+def migrate_blobs(
+    service: MultiModalIngestionService,
+    store: BlobStore | None = None,
+    batch_size: int = DEFAULT_BLOB_BATCH_SIZE,
+    progress: BackfillProgress | None = None,
+    inline: bool = False,
+) -> tuple[int, int]:
+    """Move image bytes stored inline in Postgres into the blob store, or back into Postgres.
+
+    Image chunks and then page renditions are processed in batches ordered by
+    primary key, one transaction per batch. Each batch is written to the store
+    before its rows are switched to blob references, so an interrupted run
+    loses nothing and can simply be restarted. Moving images back leaves the
+    blobs in the store; ``sweep_blobs`` deletes them.
+
+    Args:
+        service: Ingestion service
+        store: Blob store (default: ``get_blob_store()``)
+        batch_size: Number of rows moved per transaction
+        progress: Optional callback called with (image chunks, renditions) moved so far
+        inline: Replace blob references with the image bytes instead, e.g. before
+            handing the database to tools that read the image columns directly
+
+    Returns:
+        Tuple of (image chunks, renditions) moved
+    """
+    blob_store = store or get_blob_store()
+    if blob_store is None:
+        raise ValueError(f"No blob store configured; set {BLOB_STORE_ENV}")
+    condition = is_blob_ref if inline else is_inline
+
+    def convert(contents: bytes) -> bytes:
+        return resolve_blob(contents, blob_store) if inline else store_blob(contents, blob_store)
+
+    chunks = renditions = 0
+
+    last_id = ""
+    while True:
+        with service._create_uow() as uow:
+            if uow.session is None:
+                raise SessionNotSetError
+            chunk_model = uow.image_chunks.model_cls
+            rows = uow.session.execute(
+                select(chunk_model.id, chunk_model.contents)
+                .where(condition(chunk_model.contents), chunk_model.id > last_id)
+                .order_by(chunk_model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            uow.session.execute(
+                update(chunk_model),
+                [{"id": chunk_id, "contents": convert(contents)} for chunk_id, contents in rows],
+            )
+            uow.commit()
+        chunks += len(rows)
+        last_id = rows[-1].id
+        if progress:
+            progress(chunks, renditions)
+
+    last_key = ("", "")
+    key = tuple_(page_rendition.c.page_id, page_rendition.c.rendition)
+    while True:
+        with service._create_uow() as uow:
+            if uow.session is None:
+                raise SessionNotSetError
+            rows = uow.session.execute(
+                select(page_rendition.c.page_id, page_rendition.c.rendition, page_rendition.c.contents)
+                .where(condition(page_rendition.c.contents), key > tuple_(*last_key))
+                .order_by(page_rendition.c.page_id, page_rendition.c.rendition)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            uow.session.execute(
+                update(page_rendition)
+                .where(
+                    page_rendition.c.page_id == bindparam("b_page_id"),
+                    page_rendition.c.rendition == bindparam("b_rendition"),
+                )
+                .values(contents=bindparam("b_contents")),
+                [
+                    {"b_page_id": page_id, "b_rendition": name, "b_contents": convert(contents)}
+                    for page_id, name, contents in rows
+                ],
+            )
+            uow.commit()
+        renditions += len(rows)
+        last_key = (rows[-1].page_id, rows[-1].rendition)
+        if progress:
+            progress(chunks, renditions)
+    return chunks, renditions
+
+
+def referenced_blob_keys(service: MultiModalIngestionService) -> set[str]:
+    """Get the keys of all blobs referenced by image chunks and page renditions."""
+    keys = set()
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        for contents in (uow.image_chunks.model_cls.contents, page_rendition.c.contents):
+            rows = uow.session.execute(select(blob_ref_key(contents)).where(is_blob_ref(contents)))
+            keys.update(key.decode() for (key,) in rows)
+    return keys
+
+
+def sweep_blobs(
+    service: MultiModalIngestionService,
+    store: BlobStore | None = None,
+    min_age: float = DEFAULT_SWEEP_MIN_AGE,
+    dry_run: bool = False,
+) -> tuple[int, int]:
+    """Delete blobs that no image chunk or page rendition refers to anymore.
+
+    Blobs are left behind by ``delete_document``, re-ingestion with ``force``
+    and ``migrate_blobs(inline=True)``. Blobs written less than ``min_age``
+    seconds ago are kept, because an ingestion may have stored them without
+    having committed the rows that refer to them yet. Storing a blob again
+    refreshes its write time, and each one is checked again right before it
+    is deleted, so blobs stored again during the sweep are kept too.
+
+    Args:
+        service: Ingestion service
+        store: Blob store (default: ``get_blob_store()``)
+        min_age: Minimum age in seconds of the blobs to delete
+        dry_run: Only count the blobs that would be deleted
+
+    Returns:
+        Tuple of (referenced blobs, unreferenced blobs deleted)
+    """
+    blob_store = store or get_blob_store()
+    if blob_store is None:
+        raise ValueError(f"No blob store configured; set {BLOB_STORE_ENV}")
+    # List the store before reading the references: a blob stored in between is young, so it is kept
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age)
+    candidates = [key for key, modified in blob_store.iter_keys() if modified < cutoff]
+    referenced = referenced_blob_keys(service)
+
+    deleted = 0
+    for key in candidates:
+        if key in referenced:
+            continue
+        modified = blob_store.modified(key)
+        if modified is None or modified >= cutoff:
+            continue
+        if not dry_run:
+            blob_store.delete(key)
+        deleted += 1
+    return len(referenced), deleted
@@ -0,0 +1,242 @@
+"""Optional content-addressed storage of page image bytes outside of Postgres.
+
+By default image columns (``ImageChunk.contents`` and ``page_rendition.contents``)
+hold the image bytes, which is what downstream consumers of the database
+(e.g. autorag_research pipelines) expect. When the ``KOMM_VQA_BLOB_STORE``
+environment variable is set, they hold a short reference ``blob:<sha256>``
+instead; the bytes live in the blob store under their SHA-256, so identical
+images are stored once. ``resolve_blob`` returns the image bytes either way.
+``komm_vqa migrate-blobs`` moves existing images into the store (or back into
+Postgres with ``--inline``), and ``komm_vqa sweep-blobs`` deletes blobs no
+row refers to anymore.
+
+``KOMM_VQA_BLOB_STORE`` is a directory path (e.g. ``./data/blobs``) or
+``s3://bucket/prefix`` for an S3-compatible object store (AWS, or a local
+MinIO via ``AWS_ENDPOINT_URL``).
+"""
+
+import hashlib
+import importlib
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+BLOB_STORE_ENV = "KOMM_VQA_BLOB_STORE"
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+# Image data never starts with this (JPEG, PNG, WebP and AVIF all have binary magic numbers)
+BLOB_REF_PREFIX = b"blob:"
+
+
+class BlobStore(ABC):
+    """Immutable byte blobs keyed by the SHA-256 hex digest of their content."""
+
+    def put(self, data: bytes) -> str:
+        """Store bytes unless identical content is already stored.
+
+        Storing content again refreshes the write time of the existing blob,
+        so ``sweep_blobs`` treats it as new while the rows that refer to it are
+        not committed yet.
+
+        Args:
+            data: Blob content
+
+        Returns:
+            Key of the blob
+        """
+        key = hashlib.sha256(data).hexdigest()
+        if not self._touch(key):
+            self._write(key, data)
+        return key
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Read a blob. Raises FileNotFoundError if it does not exist."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether a blob is stored."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a blob if it exists."""
+
+    @abstractmethod
+    def iter_keys(self) -> Iterator[tuple[str, datetime]]:
+        """List every stored blob with the time it was last written."""
+
+    @abstractmethod
+    def modified(self, key: str) -> datetime | None:
+        """Get the time a blob was last written, or None if it does not exist."""
+
+    @abstractmethod
+    def _write(self, key: str, data: bytes) -> None:
+        """Write a blob under its key."""
+
+    @abstractmethod
+    def _touch(self, key: str) -> bool:
+        """Set the write time of a blob to now; returns False if it does not exist."""
+
+
+class FileSystemBlobStore(BlobStore):
+    """Blobs as files in a directory tree sharded by the first two bytes of the key (``ab/cd/abcd...``)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def get(self, key: str) -> bytes:
+        return self.path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def iter_keys(self) -> Iterator[tuple[str, datetime]]:
+        for path in self.root.glob("*/*/*"):
+            if KEY_PATTERN.fullmatch(path.name):
+                yield path.name, datetime.fromtimestamp(path.stat().st_mtime).astimezone()
+
+    def modified(self, key: str) -> datetime | None:
+        try:
+            return datetime.fromtimestamp(self.path(key).stat().st_mtime).astimezone()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write under a unique name and rename, so readers and concurrent writers never see a partial blob
+        tmp_path = path.with_name(f".{key}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+    def _touch(self, key: str) -> bool:
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3-compatible bucket, sharded like ``FileSystemBlobStore``.
+
+    The endpoint and credentials come from the usual AWS environment variables,
+    e.g. ``AWS_ENDPOINT_URL=http://localhost:9000`` for a local MinIO.
+    """
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        try:
+            # Imported by name because boto3 is an optional dependency (the s3 extra)
+            boto3 = importlib.import_module("boto3")
+        except ImportError as e:
+            raise ImportError("The S3 blob store needs boto3: pip install 'KoMM-VQA[s3]'") from e
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = boto3.client("s3")
+
+    def object_key(self, key: str) -> str:
+        return "/".join(part for part in (self.prefix, key[:2], key[2:4], key) if part)
+
+    def get(self, key: str) -> bytes:
+        try:
+            response = self._client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except self._client.exceptions.NoSuchKey as e:
+            raise FileNotFoundError(f"Blob not found: {key}") from e
+        return response["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        return self.modified(key) is not None
+
+    def modified(self, key: str) -> datetime | None:
+        try:
+            response = self._client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except self._client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["LastModified"]
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def iter_keys(self) -> Iterator[tuple[str, datetime]]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"].rsplit("/", 1)[-1]
+                if KEY_PATTERN.fullmatch(key):
+                    yield key, item["LastModified"]
+
+    def _write(self, key: str, data: bytes) -> None:
+        self._client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=data)
+
+    def _touch(self, key: str) -> bool:
+        # Objects cannot be touched; copying one onto itself (which needs new metadata) rewrites its LastModified
+        object_key = self.object_key(key)
+        try:
+            self._client.copy_object(
+                Bucket=self.bucket,
+                Key=object_key,
+                CopySource={"Bucket": self.bucket, "Key": object_key},
+                MetadataDirective="REPLACE",
+            )
+        except self._client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+
+def open_blob_store(url: str) -> BlobStore:
+    """Create a blob store from ``s3://bucket/prefix``, ``file:///path`` or a directory path."""
+    if url.startswith("s3://"):
+        bucket, _, prefix = url.removeprefix("s3://").partition("/")
+        return S3BlobStore(bucket, prefix)
+    return FileSystemBlobStore(Path(url.removeprefix("file://")))
+
+
+@lru_cache(maxsize=1)
+def get_blob_store() -> BlobStore | None:
+    """Get the blob store configured by ``KOMM_VQA_BLOB_STORE`` (one per process), or None to store images inline."""
+    url = os.environ.get(BLOB_STORE_ENV)
+    return open_blob_store(url) if url else None
+
+
+def blob_ref(key: str) -> bytes:
+    """Column value that refers to a stored blob."""
+    return BLOB_REF_PREFIX + key.encode()
+
+
+def blob_key(value: bytes) -> str | None:
+    """Get the blob key of a column value, or None if it holds inline image bytes."""
+    if value.startswith(BLOB_REF_PREFIX):
+        return value[len(BLOB_REF_PREFIX) :].decode()
+    return None
+
+
+def store_blob(data: bytes, store: BlobStore | None = None) -> bytes:
+    """Get the value to store in an image column: a reference to the blob, or the bytes without a blob store."""
+    store = store or get_blob_store()
+    return blob_ref(store.put(data)) if store else data
+
+
+def resolve_blob(value: bytes, store: BlobStore | None = None) -> bytes:
+    """Get the image bytes of a column value, reading from the blob store if it is a reference."""
+    key = blob_key(value)
+    if key is None:
+        return value
+    store = store or get_blob_store()
+    if store is None:
+        raise FileNotFoundError(f"Image {key} is in a blob store, but {BLOB_STORE_ENV} is not set")
+    return store.get(key)
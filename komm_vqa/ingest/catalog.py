@@ -0,0 +1,71 @@
+"""Document catalog: one row per document with its page count, read with a single query.
+
+Document lists used to load every document and then all pages of each one
+to count them. The catalog counts pages with one ``GROUP BY`` over the page
+table (served from the ``(document_id, page_num)`` unique index) joined to
+the documents and their files.
+
+Callers cache the catalog under ``get_catalog_version``. The version is
+bumped by triggers on ``document`` and ``page`` (see ``komm_vqa.db.EXTRA_DDL``)
+once per transaction, at commit, so a change by any process (the worker, the
+command line tools, another app session) invalidates the cached catalog and
+the new version is never visible before the change itself. Document updates
+only bump it when they change a field the catalog shows.
+"""
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import BigInteger, CheckConstraint, Column, Integer, MetaData, Table, func, select
+
+metadata = MetaData()
+
+# Single row; seeded and bumped by the DDL in komm_vqa.db.EXTRA_DDL
+document_catalog_version = Table(
+    "document_catalog_version",
+    metadata,
+    Column("id", Integer, CheckConstraint("id = 1"), primary_key=True, default=1),
+    Column("version", BigInteger, nullable=False, default=0),
+    # Transaction that last bumped the version, so a transaction bumps it only once
+    Column("txid", BigInteger),
+)
+
+
+def get_catalog_version(service: MultiModalIngestionService) -> int:
+    """Get the current version of the document catalog; it changes whenever documents or pages do."""
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        return uow.session.scalar(select(document_catalog_version.c.version)) or 0
+
+
+def get_document_catalog(service: MultiModalIngestionService) -> list[dict]:
+    """Get all documents with their page counts in one query.
+
+    Args:
+        service: Ingestion service
+
+    Returns:
+        List of document dicts with id, title, filename, file_path, page_count
+        and doc_metadata, ordered by title and filename
+    """
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        doc_model, file_model, page_model = uow.documents.model_cls, uow.files.model_cls, uow.pages.model_cls
+        page_counts = (
+            select(page_model.document_id, func.count().label("page_count")).group_by(page_model.document_id).subquery()
+        )
+        rows = uow.session.execute(
+            select(
+                doc_model.id,
+                doc_model.title,
+                doc_model.filename,
+                file_model.path.label("file_path"),
+                func.coalesce(page_counts.c.page_count, 0).label("page_count"),
+                doc_model.doc_metadata,
+            )
+            .outerjoin(file_model, file_model.id == doc_model.path)
+            .outerjoin(page_counts, page_counts.c.document_id == doc_model.id)
+            .order_by(doc_model.title, doc_model.filename, doc_model.id)
+        ).mappings()
+        return [dict(row) for row in rows]
@@ -0,0 +1,40 @@
+"""Content hashing used to detect files that were already ingested."""
+
+import hashlib
+from pathlib import Path
+from typing import BinaryIO
+
+HASH_CHUNK_SIZE = 1024 * 1024
+FILE_ID_PREFIX = "sha256:"
+
+
+def content_sha256(fileobj: BinaryIO) -> str:
+    """Compute the SHA-256 hex digest of a binary file object from its start.
+
+    Args:
+        fileobj: Readable, seekable binary file object
+
+    Returns:
+        Hex digest
+    """
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while chunk := fileobj.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    """Compute the SHA-256 hex digest of a file on disk."""
+    with open(path, "rb") as f:
+        return content_sha256(f)
+
+
+def content_file_id(sha256: str) -> str:
+    """Get the File row ID for a content hash.
+
+    File rows are content-addressed: their primary key is the SHA-256 of the
+    stored PDF, so the primary key index also guarantees one row per content.
+    """
+    return f"{FILE_ID_PREFIX}{sha256}"
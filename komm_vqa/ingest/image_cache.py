@@ -0,0 +1,270 @@
+"""Persistent, size-bounded LRU cache of page images on local disk.
+
+Sits below Streamlit's in-process caches so that thumbnails and full images
+survive restarts and are shared by every app process on the machine. Entries
+are keyed by (page_id, rendition) and kept in one SQLite database in WAL mode,
+which serializes writers across processes while readers proceed concurrently.
+
+Lookups only read. The hit/miss counters and the access times used for LRU
+eviction are buffered in memory and written in one transaction at most every
+``FLUSH_INTERVAL`` seconds (and whenever entries are stored), and an entry's
+access time is only rewritten once it is ``TOUCH_INTERVAL`` seconds old.
+
+Configured with ``KOMM_VQA_IMAGE_CACHE_DIR`` (default ``./data/cache``) and
+``KOMM_VQA_IMAGE_CACHE_MB`` (default 1024).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+CACHE_DIR_ENV = "KOMM_VQA_IMAGE_CACHE_DIR"
+CACHE_SIZE_ENV = "KOMM_VQA_IMAGE_CACHE_MB"
+DEFAULT_CACHE_DIR = "./data/cache"
+DEFAULT_CACHE_MB = 1024
+# Seconds between writes of the buffered counters and access times
+FLUSH_INTERVAL = 5.0
+# Seconds before a lookup rewrites an entry's access time; LRU order is only this precise
+TOUCH_INTERVAL = 60.0
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS entry (
+        page_id TEXT NOT NULL,
+        rendition TEXT NOT NULL,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (page_id, rendition)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_entry_last_access ON entry (last_access)",
+    "CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO counter VALUES ('hits', 0), ('misses', 0), ('bytes', 0)",
+]
+
+
+@dataclass
+class CacheStats:
+    """Counters of an image cache, shared by all processes using it."""
+
+    hits: int
+    misses: int
+    entries: int
+    total_bytes: int
+    max_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ImageCache:
+    """Disk-backed LRU cache of image bytes keyed by (page_id, rendition)."""
+
+    def __init__(self, directory: Path, max_bytes: int, touch_interval: float = TOUCH_INTERVAL):
+        self.path = Path(directory) / "images.sqlite3"
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        # Buffered by lookups and written by flush: hits, misses and access times by (page_id, rendition)
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+        self._touched: dict[tuple[str, str], float] = {}
+        self._flushed_at = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection]:
+        # One short-lived connection per operation: safe across Streamlit's script threads and processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, page_id: str, rendition: str) -> bytes | None:
+        """Get cached bytes and mark the entry as recently used; counts a hit or a miss."""
+        return self.get_many([page_id], rendition).get(page_id)
+
+    def get_many(self, page_ids: list[str], rendition: str) -> dict[str, bytes]:
+        """Get the cached bytes of several pages with one read; counts a hit or a miss per page.
+
+        Args:
+            page_ids: Page IDs
+            rendition: Rendition key shared by the pages
+
+        Returns:
+            Cached bytes by page ID; pages that are not cached are left out
+        """
+        found: dict[str, bytes] = {}
+        if not page_ids:
+            return found
+        with self._connect() as conn:
+            # The IDs are passed as one JSON array, so any number of them fits in a single statement
+            rows = conn.execute(
+                "SELECT page_id, data, last_access FROM entry "
+                "WHERE rendition = ? AND page_id IN (SELECT value FROM json_each(?))",
+                (rendition, json.dumps(page_ids)),
+            ).fetchall()
+        now = time.time()
+        found.update((page_id, data) for page_id, data, _ in rows)
+        hits = sum(page_id in found for page_id in page_ids)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(page_ids) - hits
+            for page_id, _, last_access in rows:
+                if now - last_access >= self.touch_interval:
+                    self._touched[(page_id, rendition)] = now
+            due = time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+        return found
+
+    def flush(self) -> None:
+        """Write the buffered counters and access times of this process to the cache."""
+        pending = self._take_pending()
+        if pending is None:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_pending(conn, pending)
+            conn.execute("COMMIT")
+
+    def put(self, page_id: str, rendition: str, data: bytes) -> None:
+        """Store bytes, evicting least recently used entries to stay within ``max_bytes``."""
+        self.put_many({page_id: data}, rendition)
+
+    def put_many(self, items: dict[str, bytes], rendition: str) -> None:
+        """Store the bytes of several pages in one transaction, evicting as in ``put``.
+
+        Args:
+            items: Bytes by page ID; entries larger than the whole cache are skipped
+            rendition: Rendition key shared by the pages
+        """
+        items = {page_id: data for page_id, data in items.items() if len(data) <= self.max_bytes}
+        if not items:
+            return
+        pending = self._take_pending()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if pending:
+                # Access times first, so eviction below sees them
+                self._write_pending(conn, pending)
+            delta = 0
+            now = time.time()
+            for page_id, data in items.items():
+                old = conn.execute(
+                    "SELECT size FROM entry WHERE page_id = ? AND rendition = ?", (page_id, rendition)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?)",
+                    (page_id, rendition, data, len(data), now),
+                )
+                delta += len(data) - (old[0] if old else 0)
+            total = self._add_bytes(conn, delta)
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+            conn.execute("COMMIT")
+
+    def get_or_load(self, page_id: str, rendition: str, load: Callable[[], bytes | None]) -> bytes | None:
+        """Get cached bytes, or load, store and return them on a miss."""
+        data = self.get(page_id, rendition)
+        if data is None:
+            data = load()
+            if data is not None:
+                self.put(page_id, rendition, data)
+        return data
+
+    def get_or_load_many(
+        self, page_ids: list[str], rendition: str, load: Callable[[list[str]], dict[str, bytes]]
+    ) -> dict[str, bytes]:
+        """Get the cached bytes of several pages, loading all misses with one call to ``load``.
+
+        Args:
+            page_ids: Page IDs
+            rendition: Rendition key shared by the pages
+            load: Loads the bytes of the given (missing) page IDs; pages without an image may be left out
+
+        Returns:
+            Bytes by page ID; pages that could not be loaded are left out
+        """
+        found = self.get_many(page_ids, rendition)
+        missing = [page_id for page_id in dict.fromkeys(page_ids) if page_id not in found]
+        if missing:
+            loaded = load(missing)
+            self.put_many(loaded, rendition)
+            found.update(loaded)
+        return found
+
+    def stats(self) -> CacheStats:
+        """Get the hit/miss counters and the current size of the cache."""
+        self.flush()
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counter").fetchall())
+            entries = conn.execute("SELECT count(*) FROM entry").fetchone()[0]
+        return CacheStats(counters["hits"], counters["misses"], entries, counters["bytes"], self.max_bytes)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        self._take_pending()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entry")
+            conn.execute("UPDATE counter SET value = 0")
+            conn.execute("COMMIT")
+            conn.execute("VACUUM")
+
+    def _take_pending(self) -> tuple[int, int, dict[tuple[str, str], float]] | None:
+        with self._lock:
+            pending = (self._hits, self._misses, self._touched)
+            self._hits = self._misses = 0
+            self._touched = {}
+            self._flushed_at = time.monotonic()
+        return pending if any(pending) else None
+
+    @staticmethod
+    def _write_pending(conn: sqlite3.Connection, pending: tuple[int, int, dict[tuple[str, str], float]]) -> None:
+        hits, misses, touched = pending
+        conn.execute("UPDATE counter SET value = value + ? WHERE name = 'hits'", (hits,))
+        conn.execute("UPDATE counter SET value = value + ? WHERE name = 'misses'", (misses,))
+        conn.executemany(
+            "UPDATE entry SET last_access = max(last_access, ?) WHERE page_id = ? AND rendition = ?",
+            [(now, page_id, rendition) for (page_id, rendition), now in touched.items()],
+        )
+
+    @staticmethod
+    def _add_bytes(conn: sqlite3.Connection, delta: int) -> int:
+        return conn.execute(
+            "UPDATE counter SET value = value + ? WHERE name = 'bytes' RETURNING value", (delta,)
+        ).fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, excess: int) -> None:
+        freed = 0
+        victims = []
+        cursor = conn.execute("SELECT page_id, rendition, size FROM entry ORDER BY last_access")
+        for page_id, rendition, size in cursor:
+            victims.append((page_id, rendition))
+            freed += size
+            if freed >= excess:
+                break
+        cursor.close()
+        conn.executemany("DELETE FROM entry WHERE page_id = ? AND rendition = ?", victims)
+        self._add_bytes(conn, -freed)
+
+
+@lru_cache(maxsize=1)
+def get_image_cache() -> ImageCache:
+    """Get the image cache configured by ``KOMM_VQA_IMAGE_CACHE_DIR`` and ``KOMM_VQA_IMAGE_CACHE_MB``."""
+    directory = Path(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR))
+    max_mb = int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_MB))
+    return ImageCache(directory, max_mb * 1024 * 1024)
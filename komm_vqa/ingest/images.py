@@ -0,0 +1,181 @@
+"""Page images: normalization of uploads, header metadata and PDF assembly."""
+
+from collections.abc import Iterable
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO
+
+from PIL import ExifTags, Image, ImageOps
+
+from komm_vqa.ingest.profiles import DEFAULT_DPI, DEFAULT_JPEG_QUALITY
+from komm_vqa.ingest.rasterize import encode_jpeg
+
+# Longest side of a stored page image. Roughly an A4 page at 250 DPI, well
+# above what a 150 DPI rasterized PDF page has.
+MAX_IMAGE_DIMENSION = 2048
+
+
+def normalize_image(
+    upload: BinaryIO, max_dimension: int = MAX_IMAGE_DIMENSION, quality: int = DEFAULT_JPEG_QUALITY
+) -> bytes:
+    """Turn an uploaded image into a page image: upright, RGB, size-capped JPEG.
+
+    JPEG files that are already upright, RGB and within the size cap are
+    returned unchanged, so they are not degraded by a second lossy encode.
+
+    Args:
+        upload: Readable binary file object of the image
+        max_dimension: Maximum width and height in pixels
+        quality: JPEG quality used when the image has to be re-encoded
+
+    Returns:
+        JPEG bytes
+    """
+    upload.seek(0)
+    data = upload.read()
+    with Image.open(BytesIO(data)) as img:
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+        if img.format == "JPEG" and img.mode == "RGB" and orientation == 1 and max(img.size) <= max_dimension:
+            return data
+
+        # Large camera JPEGs are decoded at reduced scale straight away
+        img.draft("RGB", (max_dimension, max_dimension))
+        page = ImageOps.exif_transpose(img)
+        if page.mode in ("RGBA", "LA", "PA") or (page.mode == "P" and "transparency" in page.info):
+            # Flatten transparency onto white paper instead of JPEG's black
+            rgba = page.convert("RGBA")
+            page = Image.new("RGB", rgba.size, "white")
+            page.paste(rgba, mask=rgba.getchannel("A"))
+        elif page.mode != "RGB":
+            page = page.convert("RGB")
+        page.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        return encode_jpeg(page, quality)
+
+
+def image_metadata(image_bytes: bytes, dpi: int | None = None) -> dict:
+    """Describe an encoded image from its header, without decoding the pixels.
+
+    Args:
+        image_bytes: Encoded image
+        dpi: Resolution the image was rasterized at; defaults to the DPI recorded in the file, if any
+
+    Returns:
+        Dict with ``width``, ``height``, ``bytes``, ``codec`` (e.g. ``jpeg``) and ``dpi`` (None if unknown)
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        if dpi is None and "dpi" in img.info:
+            dpi = round(img.info["dpi"][0])
+        return {
+            "width": img.width,
+            "height": img.height,
+            "bytes": len(image_bytes),
+            "codec": (img.format or "").lower(),
+            "dpi": dpi,
+        }
+
+
+class StreamingPdfWriter:
+    """Write a PDF with one full-page JPEG image per page, one page at a time.
+
+    JPEG data is embedded as-is with the ``DCTDecode`` filter, so pages are
+    neither decoded nor recompressed and only the current page is in memory.
+    """
+
+    def __init__(self, fileobj: BinaryIO, dpi: int = DEFAULT_DPI):
+        self._file = fileobj
+        self._dpi = dpi
+        self._offsets: dict[int, int] = {}
+        self._page_ids: list[int] = []
+        # Object 1 is the catalog and object 2 the page tree, both written on close
+        self._next_id = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def _write_object(self, obj_id: int, body: bytes, stream: bytes | None = None) -> None:
+        self._offsets[obj_id] = self._file.tell()
+        self._write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def _reserve(self, count: int) -> list[int]:
+        ids = list(range(self._next_id, self._next_id + count))
+        self._next_id += count
+        return ids
+
+    def add_jpeg(self, jpeg: bytes) -> None:
+        """Add a page showing a baseline or progressive RGB/grayscale JPEG image."""
+        with Image.open(BytesIO(jpeg)) as img:
+            width, height = img.size
+            color_space = "DeviceGray" if img.mode == "L" else "DeviceRGB"
+        image_id, content_id, page_id = self._reserve(3)
+        page_width, page_height = width * 72 / self._dpi, height * 72 / self._dpi
+
+        self._write_object(
+            image_id,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /{color_space} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>"
+            ).encode(),
+            jpeg,
+        )
+        content = f"q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._write_object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+            ).encode(),
+        )
+        self._page_ids.append(page_id)
+
+    def add_image(self, data: bytes, quality: int = DEFAULT_JPEG_QUALITY) -> None:
+        """Add a page from any encoded image, encoding it to JPEG only if it is not an RGB/grayscale JPEG."""
+        with Image.open(BytesIO(data)) as img:
+            passthrough = img.format == "JPEG" and img.mode in ("RGB", "L")
+            if not passthrough:
+                data = encode_jpeg(img.convert("RGB"), quality)
+        self.add_jpeg(data)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def close(self) -> None:
+        """Write the page tree, catalog and cross-reference table."""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        self._write(f"xref\n0 {self._next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, self._next_id):
+            self._write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode())
+        self._write(f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def build_pdf(page_images: Iterable[bytes], output_path: Path, dpi: int = DEFAULT_DPI) -> int:
+    """Stream page images into a PDF file, one image per page.
+
+    JPEG pages are embedded without recompression; other formats are encoded
+    to JPEG one page at a time. Memory use does not grow with the page count.
+
+    Args:
+        page_images: Encoded page images in page order
+        output_path: Path the PDF is written to
+        dpi: Resolution used to derive the physical page size from the pixel size
+
+    Returns:
+        Number of pages written
+    """
+    with open(output_path, "wb") as f:
+        writer = StreamingPdfWriter(f, dpi)
+        for data in page_images:
+            writer.add_image(data)
+        if writer.page_count == 0:
+            raise ValueError("No page images provided")
+        writer.close()
+    return writer.page_count
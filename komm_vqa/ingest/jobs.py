@@ -0,0 +1,462 @@
+"""Persistent ingestion job queue.
+
+The Streamlit app only saves the uploaded PDF and enqueues a job. Worker
+processes (``komm_vqa worker``) claim jobs with ``SELECT ... FOR UPDATE SKIP
+LOCKED``, so any number of workers can run against the same database, and a
+job keeps running when the browser tab is closed or the websocket drops.
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    and_,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
+
+from komm_vqa.ingest.backfill import precompute_thumbnails
+from komm_vqa.ingest.pipeline import (
+    IngestResult,
+    build_document_pdf,
+    find_document_by_path,
+    find_duplicate,
+    ingest_pdf,
+    resume_document,
+)
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE, get_profile
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_DUPLICATE = "duplicate"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_DONE, JOB_DUPLICATE, JOB_FAILED)
+
+# Job kinds
+JOB_KIND_INGEST = "ingest"  # rasterize a PDF into pages
+JOB_KIND_BUILD_PDF = "build_pdf"  # assemble stored page images into the document's PDF
+JOB_KIND_THUMBNAILS = "thumbnails"  # precompute a new document's renditions and thumbnail atlas
+
+DEFAULT_POLL_INTERVAL = 2.0
+# A running job whose progress was not updated for this long is considered
+# abandoned (worker killed) and is handed to another worker.
+DEFAULT_STALE_AFTER = 600
+MAX_ATTEMPTS = 3
+
+metadata = MetaData()
+
+ingest_job = Table(
+    "ingest_job",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("kind", String, nullable=False, default=JOB_KIND_INGEST, server_default=JOB_KIND_INGEST),
+    Column("status", String, nullable=False, default=JOB_QUEUED),
+    Column("pdf_path", String, nullable=False),
+    Column("filename", String, nullable=False),
+    Column("title", String, nullable=False),
+    Column("sha256", String),
+    Column("options", JSONB, nullable=False, default=dict),  # ingest_pdf keyword arguments, "force" and "profile"
+    Column("pages_done", Integer, nullable=False, default=0),
+    Column("page_count", Integer),
+    Column("document_id", String),
+    Column("error", Text),
+    Column("worker", String),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("finished_at", DateTime(timezone=True)),
+    Index("ix_ingest_job_status_created_at", "status", "created_at"),
+)
+
+
+def enqueue_job(
+    service: MultiModalIngestionService,
+    pdf_path: Path,
+    filename: str,
+    title: str,
+    sha256: str | None = None,
+    options: dict | None = None,
+    document_id: str | None = None,
+    kind: str = JOB_KIND_INGEST,
+) -> str:
+    """Add a stored PDF file to the ingestion queue.
+
+    Args:
+        service: Ingestion service
+        pdf_path: Path of the PDF inside the storage directory
+        filename: Original filename
+        title: Document title
+        sha256: Content hash of the PDF (enables duplicate detection)
+        options: Keyword arguments for ``ingest_pdf``, ``force`` for ``find_duplicate`` and ``profile``
+            (raster profile name)
+        document_id: Existing document the job works on (e.g. an incomplete document to resume)
+        kind: Job kind (``JOB_KIND_INGEST``, ``JOB_KIND_BUILD_PDF`` or ``JOB_KIND_THUMBNAILS``)
+
+    Returns:
+        Job ID
+    """
+    job_id = str(uuid.uuid4())
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        uow.session.execute(
+            insert(ingest_job).values(
+                id=job_id,
+                pdf_path=str(pdf_path),
+                filename=filename,
+                title=title,
+                sha256=sha256,
+                options=options or {},
+                document_id=document_id,
+                kind=kind,
+            )
+        )
+        uow.commit()
+    return job_id
+
+
+def update_job(service: MultiModalIngestionService, job_id: str, **values) -> None:
+    """Update columns of a job in its own transaction and refresh its heartbeat."""
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        uow.session.execute(update(ingest_job).where(ingest_job.c.id == job_id).values(updated_at=func.now(), **values))
+        uow.commit()
+
+
+def finish_job(service: MultiModalIngestionService, job_id: str, status: str, **values) -> None:
+    """Mark a job as finished with the given status."""
+    update_job(service, job_id, status=status, finished_at=func.now(), **values)
+
+
+def claim_job(
+    service: MultiModalIngestionService, worker: str, stale_after: float = DEFAULT_STALE_AFTER
+) -> dict | None:
+    """Claim the oldest queued (or abandoned) job for a worker.
+
+    Args:
+        service: Ingestion service
+        worker: Worker identifier stored on the job
+        stale_after: Seconds without progress after which a running job is reclaimed
+
+    Returns:
+        The claimed job row as a dict, or None if the queue is empty
+    """
+    stale = and_(
+        ingest_job.c.status == JOB_RUNNING, ingest_job.c.updated_at < func.now() - timedelta(seconds=stale_after)
+    )
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        # Jobs that keep killing their worker are not retried forever
+        uow.session.execute(
+            update(ingest_job)
+            .where(stale, ingest_job.c.attempts >= MAX_ATTEMPTS)
+            .values(status=JOB_FAILED, error="Worker stopped responding", finished_at=func.now())
+        )
+        row = (
+            uow.session
+            .execute(
+                select(ingest_job)
+                .where(or_(ingest_job.c.status == JOB_QUEUED, stale))
+                .order_by(ingest_job.c.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            .mappings()
+            .first()
+        )
+        if row is None:
+            uow.commit()
+            return None
+
+        claimed = (
+            uow.session
+            .execute(
+                update(ingest_job)
+                .where(ingest_job.c.id == row["id"])
+                .values(
+                    status=JOB_RUNNING,
+                    worker=worker,
+                    attempts=ingest_job.c.attempts + 1,
+                    pages_done=0,
+                    updated_at=func.now(),
+                )
+                .returning(ingest_job)
+            )
+            .mappings()
+            .one()
+        )
+        uow.commit()
+    return dict(claimed)
+
+
+def get_jobs(service: MultiModalIngestionService, job_ids: list[str] | None = None, limit: int = 20) -> list[dict]:
+    """Get unfinished jobs and the given jobs, newest first.
+
+    Args:
+        service: Ingestion service
+        job_ids: IDs of jobs to include even if they are finished
+        limit: Maximum number of jobs
+
+    Returns:
+        List of job rows as dicts
+    """
+    condition = ingest_job.c.status.in_([JOB_QUEUED, JOB_RUNNING])
+    if job_ids:
+        condition = or_(condition, ingest_job.c.id.in_(job_ids))
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        rows = uow.session.execute(
+            select(ingest_job).where(condition).order_by(ingest_job.c.created_at.desc()).limit(limit)
+        ).mappings()
+        return [dict(row) for row in rows]
+
+
+def run_build_pdf_job(service: MultiModalIngestionService, job: dict) -> str:
+    """Write the PDF file of a document from its stored page images.
+
+    Args:
+        service: Ingestion service
+        job: Claimed job of kind ``JOB_KIND_BUILD_PDF``
+
+    Returns:
+        Final job status
+    """
+    job_id = job["id"]
+
+    def on_progress(pages_done: int, page_count: int) -> None:
+        update_job(service, job_id, pages_done=pages_done, page_count=page_count)
+
+    try:
+        page_count = build_document_pdf(service, job["document_id"], Path(job["pdf_path"]), on_progress)
+    except Exception as e:
+        logger.exception("PDF build job %s failed", job_id)
+        finish_job(service, job_id, JOB_FAILED, error=str(e))
+        return JOB_FAILED
+    except BaseException:
+        update_job(service, job_id, status=JOB_QUEUED, worker=None)
+        raise
+    finish_job(service, job_id, JOB_DONE, pages_done=page_count, page_count=page_count)
+    enqueue_thumbnails_job(service, job, job["document_id"])
+    return JOB_DONE
+
+
+def enqueue_thumbnails_job(service: MultiModalIngestionService, job: dict, document_id: str) -> str:
+    """Queue the thumbnail precomputation of a document whose pages a finished job created.
+
+    Args:
+        service: Ingestion service
+        job: The finished job
+        document_id: Document ID
+
+    Returns:
+        Job ID
+    """
+    return enqueue_job(
+        service,
+        Path(job["pdf_path"]),
+        job["filename"],
+        job["title"],
+        document_id=document_id,
+        kind=JOB_KIND_THUMBNAILS,
+    )
+
+
+def run_thumbnails_job(service: MultiModalIngestionService, job: dict) -> str:
+    """Precompute the renditions and thumbnail atlas of a document (see ``precompute_thumbnails``).
+
+    Args:
+        service: Ingestion service
+        job: Claimed job of kind ``JOB_KIND_THUMBNAILS``
+
+    Returns:
+        Final job status
+    """
+    job_id = job["id"]
+
+    def on_progress(done: int, skipped: int) -> None:
+        update_job(service, job_id, pages_done=done + skipped)
+
+    try:
+        page_count = precompute_thumbnails(service, job["document_id"], on_progress)
+    except Exception as e:
+        logger.exception("Thumbnail job %s failed", job_id)
+        finish_job(service, job_id, JOB_FAILED, error=str(e))
+        return JOB_FAILED
+    except BaseException:
+        update_job(service, job_id, status=JOB_QUEUED, worker=None)
+        raise
+    finish_job(service, job_id, JOB_DONE, pages_done=page_count, page_count=page_count)
+    return JOB_DONE
+
+
+def run_job(service: MultiModalIngestionService, job: dict) -> str:
+    """Ingest the PDF of a claimed job and record the outcome on the job.
+
+    Progress is written after every rasterized window. A job whose document
+    already exists (a resume request, or a retry after its worker died)
+    continues from the document's checkpoint instead of starting over. The
+    stored PDF is removed if the job fails before creating a document or
+    turns out to be a duplicate. A finished ingestion queues a thumbnails
+    job for its document, so a worker prepares the gallery right away.
+
+    Args:
+        service: Ingestion service
+        job: Job row returned by ``claim_job``
+
+    Returns:
+        Final job status
+    """
+    if job["kind"] == JOB_KIND_BUILD_PDF:
+        return run_build_pdf_job(service, job)
+    if job["kind"] == JOB_KIND_THUMBNAILS:
+        return run_thumbnails_job(service, job)
+
+    job_id, save_path, sha256 = job["id"], Path(job["pdf_path"]), job["sha256"]
+
+    def on_progress(pages_done: int, page_count: int) -> None:
+        update_job(service, job_id, pages_done=pages_done, page_count=page_count)
+
+    def discard_upload() -> None:
+        # Keep the PDF if a (possibly incomplete) document refers to it
+        if find_document_by_path(service, save_path) is None:
+            save_path.unlink(missing_ok=True)
+
+    def ingest() -> IngestResult:
+        options = dict(job["options"])
+        force = options.pop("force", False)
+        # Options are JSON, so the raster profile is stored by name
+        profile = get_profile(options.pop("profile", DEFAULT_PROFILE.name))
+
+        document_id = job["document_id"]
+        if document_id is None:
+            own = find_document_by_path(service, save_path)
+            document_id = own.document_id if own else None
+        if document_id:
+            return resume_document(service, document_id, on_progress)
+
+        existing = find_duplicate(service, sha256, force=force) if sha256 else None
+        if existing and not existing.complete:
+            # Same content whose ingestion was interrupted earlier: continue it
+            discard_upload()
+            return resume_document(service, existing.document_id, on_progress)
+        if existing:
+            return existing
+        return ingest_pdf(
+            service,
+            save_path,
+            job["filename"],
+            job["title"],
+            sha256=sha256,
+            profile=profile,
+            progress=on_progress,
+            **options,
+        )
+
+    try:
+        try:
+            result = ingest()
+        except IntegrityError:
+            # Another job stored the same content first (the File ID is the hash)
+            result = find_duplicate(service, sha256) if sha256 else None
+            if result is None:
+                raise
+            result.duplicate = True
+    except Exception as e:
+        logger.exception("Ingestion job %s failed", job_id)
+        discard_upload()
+        finish_job(service, job_id, JOB_FAILED, error=str(e))
+        return JOB_FAILED
+    except BaseException:
+        # Interrupted worker: hand the job back, the PDF is still needed
+        update_job(service, job_id, status=JOB_QUEUED, worker=None)
+        raise
+
+    if result.duplicate:
+        discard_upload()
+        finish_job(service, job_id, JOB_DUPLICATE, document_id=result.document_id, page_count=result.page_count)
+        return JOB_DUPLICATE
+    finish_job(
+        service,
+        job_id,
+        JOB_DONE,
+        document_id=result.document_id,
+        pages_done=result.page_count,
+        page_count=result.page_count,
+    )
+    enqueue_thumbnails_job(service, job, result.document_id)
+    return JOB_DONE
+
+
+def default_worker_name() -> str:
+    """Identify the current worker process as ``<hostname>:<pid>``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(
+    service: MultiModalIngestionService,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    stale_after: float = DEFAULT_STALE_AFTER,
+    once: bool = False,
+) -> int:
+    """Process queued jobs until interrupted.
+
+    Args:
+        service: Ingestion service
+        poll_interval: Seconds to wait when the queue is empty
+        stale_after: Seconds without progress after which a running job is reclaimed
+        once: Stop as soon as the queue is empty
+
+    Returns:
+        Number of processed jobs
+    """
+    worker = default_worker_name()
+    processed = 0
+    while True:
+        try:
+            job = claim_job(service, worker, stale_after)
+        except Exception:
+            # E.g. the database restarting; keep the worker alive and try again
+            logger.exception("Failed to claim a job")
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("Processing job %s (%s)", job["id"], job["filename"])
+        try:
+            status = run_job(service, job)
+        except Exception:
+            # The outcome could not be recorded; the job is reclaimed once it is stale
+            logger.exception("Job %s crashed", job["id"])
+            status = JOB_FAILED
+        logger.info("Job %s finished: %s", job["id"], status)
+        processed += 1
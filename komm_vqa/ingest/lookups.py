@@ -0,0 +1,214 @@
+"""Page and ImageChunk lookups that never load image payloads.
+
+The ORM maps ``Page.image_contents`` and the ``ImageChunk`` image and
+embedding columns like any other column, so repository methods such as
+``pages.get_by_document_id`` or ``image_chunks.get_by_page_id`` transfer every
+image (and its multi-vector embedding) just to read an ID. The lookups here
+defer those columns with ``raiseload``: they are left out of the SELECT, and
+code that touches them by mistake raises instead of quietly loading them one
+row at a time. Images are read with ``get_page_images`` and the rendition and
+atlas helpers, which select exactly the bytes they return; ``get_image_refs``
+reads only the blob references of images kept in the blob store.
+
+``get_statistics`` replaces the service's statistics, which load every chunk
+to count the ones with and without embeddings.
+"""
+
+from typing import Any
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from autorag_research.orm.uow.multi_modal_uow import MultiModalUnitOfWork
+from sqlalchemy import ColumnElement, func, select
+from sqlalchemy.orm import defer, selectinload
+
+from komm_vqa.ingest.blobs import BLOB_REF_PREFIX
+from komm_vqa.ingest.renditions import FULL, page_rendition
+
+# Columns holding image bytes or embeddings, by table
+PAYLOAD_COLUMNS = {"page": ("image_contents",), "image_chunk": ("contents", "embedding", "embeddings")}
+
+
+def metadata_only(model: type[Any]) -> list:
+    """Loader options that leave the payload columns of ``model`` unloaded and raise if they are accessed.
+
+    Args:
+        model: Page or ImageChunk model class
+
+    Returns:
+        Options for ``Select.options``
+    """
+    return [defer(getattr(model, name), raiseload=True) for name in PAYLOAD_COLUMNS.get(model.__tablename__, ())]
+
+
+def get_page(uow: MultiModalUnitOfWork, page_id: str) -> Any | None:
+    """Get a page without its image.
+
+    Args:
+        uow: Open unit of work
+        page_id: Page ID
+
+    Returns:
+        The page, or None if it does not exist
+    """
+    if uow.session is None:
+        raise SessionNotSetError
+    page_model = uow.pages.model_cls
+    return uow.session.get(page_model, page_id, options=metadata_only(page_model))
+
+
+def get_document_pages(uow: MultiModalUnitOfWork, document_id: str, with_image_chunks: bool = False) -> list[Any]:
+    """Get the pages of a document in page order, without images.
+
+    Args:
+        uow: Open unit of work
+        document_id: Document ID
+        with_image_chunks: Also load ``Page.image_chunks`` (without images or embeddings) in one more query
+
+    Returns:
+        Pages ordered by page number
+    """
+    if uow.session is None:
+        raise SessionNotSetError
+    page_model, chunk_model = uow.pages.model_cls, uow.image_chunks.model_cls
+    query = (
+        select(page_model)
+        .where(page_model.document_id == document_id)
+        .order_by(page_model.page_num)
+        .options(*metadata_only(page_model))
+    )
+    if with_image_chunks:
+        query = query.options(selectinload(page_model.image_chunks).options(*metadata_only(chunk_model)))
+    return list(uow.session.scalars(query))
+
+
+def get_page_by_number(uow: MultiModalUnitOfWork, document_id: str, page_num: int) -> tuple[Any, str | None] | None:
+    """Get a page by its number together with the ID of its image chunk, in one query.
+
+    Args:
+        uow: Open unit of work
+        document_id: Document ID
+        page_num: Page number (1-based)
+
+    Returns:
+        Tuple of (page, image chunk ID or None), or None if the page does not exist
+    """
+    if uow.session is None:
+        raise SessionNotSetError
+    page_model, chunk_model = uow.pages.model_cls, uow.image_chunks.model_cls
+    row = uow.session.execute(
+        select(page_model, chunk_model.id)
+        .outerjoin(chunk_model, chunk_model.parent_page == page_model.id)
+        .where(page_model.document_id == document_id, page_model.page_num == page_num)
+        .order_by(chunk_model.id)
+        .limit(1)
+        .options(*metadata_only(page_model))
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
+def get_chunk_pages(uow: MultiModalUnitOfWork, image_chunk_ids: list[str]) -> dict[str, str]:
+    """Get the parent page ID of image chunks.
+
+    Args:
+        uow: Open unit of work
+        image_chunk_ids: ImageChunk IDs
+
+    Returns:
+        Page ID by ImageChunk ID; chunks without a parent page are left out
+    """
+    if not image_chunk_ids:
+        return {}
+    if uow.session is None:
+        raise SessionNotSetError
+    chunk_model = uow.image_chunks.model_cls
+    rows = uow.session.execute(
+        select(chunk_model.id, chunk_model.parent_page).where(
+            chunk_model.id.in_(image_chunk_ids), chunk_model.parent_page.is_not(None)
+        )
+    ).all()
+    return dict(rows)
+
+
+def is_blob_ref(contents) -> ColumnElement:
+    """SQL condition for image columns that hold a blob reference (see ``komm_vqa.ingest.blobs.blob_ref``)."""
+    return func.substring(contents, 1, len(BLOB_REF_PREFIX)) == BLOB_REF_PREFIX
+
+
+def blob_ref_key(contents) -> ColumnElement:
+    """SQL expression for the blob key of an image column that holds a blob reference."""
+    return func.substring(contents, len(BLOB_REF_PREFIX) + 1)
+
+
+def get_image_refs(uow: MultiModalUnitOfWork, page_ids: list[str], rendition: str = FULL) -> dict[str, tuple[str, str]]:
+    """Get the blob keys of page images, reading only the short references and never the images.
+
+    Args:
+        uow: Open unit of work
+        page_ids: Page IDs
+        rendition: ``FULL`` for the ImageChunk image, or the name of a stored rendition
+
+    Returns:
+        Tuple of (blob key, mimetype) by page ID; pages whose image is stored
+        inline in Postgres (or that have none) are left out
+    """
+    if not page_ids:
+        return {}
+    if uow.session is None:
+        raise SessionNotSetError
+    if rendition == FULL:
+        chunk_model = uow.image_chunks.model_cls
+        query = select(chunk_model.parent_page, blob_ref_key(chunk_model.contents), chunk_model.mimetype).where(
+            chunk_model.parent_page.in_(page_ids), is_blob_ref(chunk_model.contents)
+        )
+    else:
+        query = select(
+            page_rendition.c.page_id, blob_ref_key(page_rendition.c.contents), page_rendition.c.mimetype
+        ).where(
+            page_rendition.c.page_id.in_(page_ids),
+            page_rendition.c.rendition == rendition,
+            is_blob_ref(page_rendition.c.contents),
+        )
+    refs: dict[str, tuple[str, str]] = {}
+    for page_id, key, mimetype in uow.session.execute(query):
+        # A page has one image chunk; should there be more, keep the first like get_page_images does
+        refs.setdefault(page_id, (key.decode(), mimetype))
+    return refs
+
+
+def get_statistics(service: MultiModalIngestionService) -> dict:
+    """Count the ingested data, like ``MultiModalIngestionService.get_statistics``, with COUNT queries only.
+
+    The service counts chunks with and without embeddings by loading them,
+    which transfers every page image and embedding in the database.
+
+    Args:
+        service: Ingestion service
+
+    Returns:
+        Dictionary with the same keys as ``MultiModalIngestionService.get_statistics``
+    """
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        session = uow.session
+
+        def count(model: type[Any], *conditions) -> int:
+            return session.scalar(select(func.count()).select_from(model).where(*conditions)) or 0
+
+        def embedding_counts(model: type[Any]) -> dict[str, int]:
+            return {
+                "total": count(model),
+                "with_embeddings": count(model, model.embedding.is_not(None)),
+                "without_embeddings": count(model, model.embedding.is_(None)),
+            }
+
+        return {
+            "files": count(uow.files.model_cls),
+            "documents": count(uow.documents.model_cls),
+            "pages": count(uow.pages.model_cls),
+            "chunks": embedding_counts(uow.chunks.model_cls),
+            "image_chunks": embedding_counts(uow.image_chunks.model_cls),
+            "queries": count(uow.queries.model_cls),
+            "retrieval_relations": count(uow.retrieval_relations.model_cls),
+        }
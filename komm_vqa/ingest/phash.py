@@ -0,0 +1,46 @@
+"""Perceptual hashing of page images.
+
+A difference hash (dHash) compares the brightness of neighbouring pixels of a
+tiny grayscale copy of the image. It does not change when a page is
+re-encoded, slightly rescaled or lightly compressed, so identical and
+near-identical pages (covers, blank pages, boilerplate notices) share a hash.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 comparisons -> 64-bit hash
+# Pages whose hashes differ in at most this many bits are near-identical
+DUPLICATE_MAX_DISTANCE = 3
+# Hashes within DUPLICATE_MAX_DISTANCE bits share at least one of this many equal-sized hex chunks
+# (pigeonhole), so duplicate candidates can be found with equality lookups on the chunks
+HASH_CHUNKS = DUPLICATE_MAX_DISTANCE + 1
+HASH_CHUNK_LENGTH = HASH_SIZE * HASH_SIZE // 4 // HASH_CHUNKS
+# Decode at least this many times the hash size before the final resize.
+# Downscaling in two steps keeps the hash stable across page resolutions.
+DRAFT_FACTOR = 16
+
+
+def dhash(image_bytes: bytes, hash_size: int = HASH_SIZE) -> str:
+    """Compute the difference hash of an encoded image.
+
+    Args:
+        image_bytes: Encoded image bytes (JPEG, PNG, ...)
+        hash_size: Number of comparisons per row and rows per hash
+
+    Returns:
+        Hash as a zero-padded hex string (16 characters for the default size)
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        # Let the JPEG decoder downscale via DCT instead of decoding full resolution
+        img.draft("L", ((hash_size + 1) * DRAFT_FACTOR, hash_size * DRAFT_FACTOR))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return f"{value:0{hash_size * hash_size // 4}x}"
@@ -0,0 +1,753 @@
+"""Document ingestion: store PDF files, documents, pages and image chunks."""
+
+import shutil
+import uuid
+from collections.abc import Callable, Generator, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import BinaryIO
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from autorag_research.orm.uow.multi_modal_uow import MultiModalUnitOfWork
+from sqlalchemy import ColumnElement, and_, cast, func, insert, literal, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import BIT, JSONB
+from sqlalchemy.orm import aliased
+
+from komm_vqa.ingest.atlas import atlas_path
+from komm_vqa.ingest.blobs import BlobStore, get_blob_store, resolve_blob, store_blob
+from komm_vqa.ingest.dedup import content_file_id
+from komm_vqa.ingest.images import build_pdf, image_metadata, normalize_image
+from komm_vqa.ingest.lookups import get_document_pages
+from komm_vqa.ingest.phash import DUPLICATE_MAX_DISTANCE, HASH_CHUNK_LENGTH, HASH_CHUNKS, HASH_SIZE, dhash
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE, RasterProfile, profile_from_dict
+from komm_vqa.ingest.rasterize import (
+    DEFAULT_WINDOW_SIZE,
+    iter_rasterized_windows,
+    pdf_page_count,
+)
+from komm_vqa.ingest.renditions import insert_renditions, make_renditions
+
+DEFAULT_PDF_STORAGE_PATH = "./data/pdfs"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Ingestion progress is checkpointed in Document.doc_metadata under this key
+CHECKPOINT_KEY = "ingest"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETE = "complete"
+# The raster profile of a document is recorded in Document.doc_metadata under this key
+PROFILE_KEY = "raster_profile"
+# Matching pages returned per page by find_duplicate_pages; the rest are only counted
+DUPLICATE_MAX_MATCHES = 5
+
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting one PDF file."""
+
+    document_id: str
+    page_count: int
+    duplicate: bool = False  # True if the content was already ingested and nothing was stored
+    complete: bool = True  # False if the ingestion stopped before the last page (see resume_document)
+
+
+def default_title(filename: str) -> str:
+    """Derive a document title from a filename."""
+    return filename.split(".")[0].strip()
+
+
+def new_storage_path(storage_path: Path, filename: str) -> Path:
+    """Get a unique path for a file in the PDF storage directory.
+
+    Args:
+        storage_path: PDF storage directory
+        filename: Original filename
+
+    Returns:
+        Path of the form ``<storage_path>/<uuid>_<filename>``
+    """
+    return storage_path / f"{uuid.uuid4()}_{filename}"
+
+
+def copy_to_storage(src_path: Path, storage_path: Path) -> Path:
+    """Copy a PDF file into the storage directory under a unique name.
+
+    Args:
+        src_path: Source PDF path
+        storage_path: PDF storage directory
+
+    Returns:
+        Path of the stored copy
+    """
+    save_path = new_storage_path(storage_path, src_path.name)
+    shutil.copyfile(src_path, save_path)
+    return save_path
+
+
+def save_upload(upload: BinaryIO, save_path: Path) -> None:
+    """Stream an uploaded file object to its final path in fixed-size chunks.
+
+    Args:
+        upload: Readable binary file object (e.g. a Streamlit UploadedFile)
+        save_path: Destination path
+    """
+    upload.seek(0)
+    with open(save_path, "wb") as f:
+        shutil.copyfileobj(upload, f, UPLOAD_CHUNK_SIZE)
+
+
+@contextmanager
+def remove_on_error(save_path: Path) -> Generator[None]:
+    """Delete a stored PDF if the ingestion block raises, so failures leave no orphan files."""
+    try:
+        yield
+    except BaseException:
+        save_path.unlink(missing_ok=True)
+        raise
+
+
+def insert_pages(
+    uow: MultiModalUnitOfWork,
+    doc_id: str,
+    pages: list[bytes],
+    start_page: int = 1,
+    mimetype: str = "image/jpeg",
+    store: BlobStore | None = None,
+    dpi: int | None = None,
+) -> list[str]:
+    """Insert pages, their image chunks and renditions with one executemany per table.
+
+    Page IDs are generated client-side so that image chunks can reference them
+    without a round trip. Image bytes are written to the blob store and the
+    rows hold references to them. Each page's ``page_metadata`` records its
+    perceptual hash and the header metadata of its image (see
+    ``image_metadata``), so the app never decodes an image just to size it.
+    Nothing is committed here.
+
+    Args:
+        uow: Open unit of work
+        doc_id: Parent document ID
+        pages: Encoded image bytes for each page, in page order
+        start_page: Page number of the first entry in ``pages``
+        mimetype: MIME type of the page images
+        store: Blob store for the image bytes (default: ``get_blob_store()``)
+        dpi: Resolution the pages were rasterized at (default: the DPI recorded in each image, if any)
+
+    Returns:
+        List of created Page IDs
+    """
+    if not pages:
+        return []
+    if uow.session is None:
+        raise SessionNotSetError
+
+    store = store or get_blob_store()
+    page_ids = [str(uuid.uuid4()) for _ in pages]
+    # Thumbnail and medium preview are derived from one decode of each page
+    pyramids = [make_renditions(img_bytes) for img_bytes in pages]
+    # Pages are stored without image_contents - the image lives only in ImageChunk
+    uow.session.execute(
+        insert(uow.pages.model_cls),
+        [
+            {
+                "id": page_id,
+                "document_id": doc_id,
+                "page_num": page_num,
+                "mimetype": mimetype,
+                "page_metadata": {"dhash": dhash(img_bytes), **image_metadata(img_bytes, dpi)},
+            }
+            for page_num, (page_id, img_bytes) in enumerate(zip(page_ids, pages), start=start_page)
+        ],
+    )
+    # ImageChunk is 1:1 with Page - this stores the actual image
+    uow.session.execute(
+        insert(uow.image_chunks.model_cls),
+        [
+            {"contents": store_blob(img_bytes, store), "mimetype": mimetype, "parent_page": page_id}
+            for page_id, img_bytes in zip(page_ids, pages)
+        ],
+    )
+    insert_renditions(uow, {page_id: renditions for page_id, (_, renditions) in zip(page_ids, pyramids)}, store)
+    return page_ids
+
+
+def create_document(
+    service: MultiModalIngestionService,
+    save_path: Path,
+    filename: str,
+    title: str,
+    page_count: int,
+    profile: RasterProfile,
+    options: dict,
+    sha256: str | None = None,
+) -> str:
+    """Create the File and Document rows of a PDF with an empty ingestion checkpoint.
+
+    The raster profile is recorded in ``doc_metadata`` next to the checkpoint.
+
+    Args:
+        service: Ingestion service
+        save_path: Path of the PDF inside the storage directory
+        filename: Original filename
+        title: Document title
+        page_count: Total number of pages
+        profile: Raster profile the pages are rendered with
+        options: Rasterization options (window_size, passthrough), kept for resuming
+        sha256: Content hash of the PDF; used as the File ID when given
+
+    Returns:
+        Document ID
+    """
+    checkpoint = {"status": STATUS_IN_PROGRESS, "pages_done": 0, "page_count": page_count, **options}
+    with service._create_uow() as uow:
+        # Add File and Document (1:1 with File)
+        file = uow.files.model_cls(path=str(save_path), type="raw")
+        if sha256:
+            file.id = content_file_id(sha256)
+        uow.files.add(file)
+        uow.flush()
+        document = uow.documents.add(
+            uow.documents.model_cls(
+                path=file.id,
+                filename=filename,
+                title=title,
+                doc_metadata={CHECKPOINT_KEY: checkpoint, PROFILE_KEY: profile.to_dict()},
+            )
+        )
+        uow.commit()
+        return str(document.id)
+
+
+def save_checkpoint(uow: MultiModalUnitOfWork, document_id: str, checkpoint: dict) -> None:
+    """Replace the ingestion checkpoint of a document, keeping its other metadata keys."""
+    if uow.session is None:
+        raise SessionNotSetError
+    document_model = uow.documents.model_cls
+    doc_metadata = func.coalesce(document_model.doc_metadata, literal({}, JSONB))
+    uow.session.execute(
+        update(document_model)
+        .where(document_model.id == document_id)
+        .values(doc_metadata=doc_metadata.op("||")(literal({CHECKPOINT_KEY: checkpoint}, JSONB)))
+    )
+
+
+def store_windows(
+    service: MultiModalIngestionService,
+    document_id: str,
+    windows: Iterable[list[bytes]],
+    checkpoint: dict,
+    progress: ProgressCallback | None = None,
+    mimetype: str = "image/jpeg",
+    dpi: int | None = None,
+) -> int:
+    """Store page windows, committing each window together with the advanced checkpoint.
+
+    Page windows are consumed lazily and written as they arrive, so only one
+    window of image bytes is held in memory. A crash loses at most the window
+    being written; everything before it stays committed and can be resumed.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        windows: Lists of encoded page images per window, in page order, starting after ``checkpoint["pages_done"]``
+        checkpoint: Current ingestion checkpoint of the document
+        progress: Optional callback called with (pages_done, page_count)
+        mimetype: MIME type of the page images
+        dpi: Resolution the pages were rasterized at
+
+    Returns:
+        Number of stored pages of the document
+    """
+    pages_done = checkpoint["pages_done"]
+    for window in windows:
+        with service._create_uow() as uow:
+            insert_pages(uow, document_id, window, start_page=pages_done + 1, mimetype=mimetype, dpi=dpi)
+            pages_done += len(window)
+            save_checkpoint(uow, document_id, {**checkpoint, "pages_done": pages_done})
+            uow.commit()
+        if progress:
+            progress(pages_done, checkpoint["page_count"] or pages_done)
+
+    with service._create_uow() as uow:
+        save_checkpoint(uow, document_id, {**checkpoint, "pages_done": pages_done, "status": STATUS_COMPLETE})
+        uow.commit()
+    return pages_done
+
+
+def resume_document(
+    service: MultiModalIngestionService, document_id: str, progress: ProgressCallback | None = None
+) -> IngestResult:
+    """Continue the ingestion of a document from its last checkpoint.
+
+    Only the pages after the checkpoint are rasterized, with the options the
+    ingestion was started with. Complete documents are returned unchanged.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        progress: Optional callback called with (pages_done, page_count)
+
+    Returns:
+        IngestResult of the document
+    """
+    with service._create_uow() as uow:
+        document = uow.documents.get_by_id(document_id)
+        if document is None:
+            raise ValueError(f"Document not found: {document_id}")
+        doc_metadata = document.doc_metadata or {}
+        checkpoint = doc_metadata.get(CHECKPOINT_KEY)
+        save_path = document.file.path if document.file else None
+        if checkpoint is None or checkpoint["status"] == STATUS_COMPLETE:
+            return IngestResult(document_id, uow.pages.count_by_document(document_id))
+    if save_path is None or not Path(save_path).exists():
+        raise FileNotFoundError(f"PDF file of document {document_id} not found: {save_path}")
+
+    profile = document_profile(doc_metadata)
+    windows = iter_rasterized_windows(
+        save_path,
+        checkpoint["page_count"],
+        profile,
+        checkpoint["window_size"],
+        checkpoint["passthrough"],
+        first_page=checkpoint["pages_done"] + 1,
+    )
+    pages_done = store_windows(service, document_id, windows, checkpoint, progress, profile.mimetype, profile.dpi)
+    return IngestResult(document_id, pages_done)
+
+
+def ingest_pdf(
+    service: MultiModalIngestionService,
+    save_path: Path,
+    filename: str,
+    title: str,
+    profile: RasterProfile = DEFAULT_PROFILE,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    passthrough: bool = True,
+    progress: ProgressCallback | None = None,
+    sha256: str | None = None,
+) -> IngestResult:
+    """Rasterize a stored PDF file window by window and store it.
+
+    If the document rows cannot be created, the stored PDF is removed. Once
+    they exist, the PDF is kept so that a failed ingestion can be continued
+    with ``resume_document``.
+
+    Args:
+        service: Ingestion service
+        save_path: Path of the PDF inside the storage directory
+        filename: Original filename
+        title: Document title
+        profile: Raster profile (DPI, codec, quality, size cap), recorded on the document
+        window_size: Number of pages rasterized and written at a time
+        passthrough: Store poppler-encoded JPEGs without decoding and re-encoding them
+        progress: Optional callback called with (pages_done, page_count)
+        sha256: Content hash of the PDF (see ``find_duplicate``)
+
+    Returns:
+        IngestResult of the new document
+    """
+    options = {"window_size": window_size, "passthrough": passthrough}
+    with remove_on_error(save_path):
+        page_count = pdf_page_count(save_path)
+        document_id = create_document(service, save_path, filename, title, page_count, profile, options, sha256)
+    return resume_document(service, document_id, progress)
+
+
+def store_image_document(
+    service: MultiModalIngestionService,
+    pdf_path: Path,
+    filename: str,
+    title: str,
+    images: list[BinaryIO],
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    progress: ProgressCallback | None = None,
+) -> IngestResult:
+    """Store uploaded images directly as the pages of a new document.
+
+    Images are normalized (see ``normalize_image``) window by window and
+    written in one transaction, without going through a PDF. The document's
+    File row points at ``pdf_path``, where the combined PDF for the viewer is
+    written later (see ``build_document_pdf``).
+
+    Args:
+        service: Ingestion service
+        pdf_path: Path the combined PDF will be written to
+        filename: Filename of the combined PDF
+        title: Document title
+        images: Readable binary file objects of the images, in page order
+        window_size: Number of images normalized and written at a time
+        progress: Optional callback called with (pages_done, page_count)
+
+    Returns:
+        IngestResult of the new document
+    """
+    with service._create_uow() as uow:
+        file = uow.files.add(uow.files.model_cls(path=str(pdf_path), type="raw"))
+        uow.flush()
+        document = uow.documents.add(uow.documents.model_cls(path=file.id, filename=filename, title=title))
+        uow.flush()
+        document_id = str(document.id)
+
+        for start in range(0, len(images), window_size):
+            window = [normalize_image(image) for image in images[start : start + window_size]]
+            insert_pages(uow, document_id, window, start_page=start + 1)
+            if progress:
+                progress(start + len(window), len(images))
+        uow.commit()
+    return IngestResult(document_id, len(images))
+
+
+def iter_page_images(service: MultiModalIngestionService, document_id: str, batch_size: int = 16) -> Iterator[bytes]:
+    """Stream the page images of a document in page order, ``batch_size`` rows at a time."""
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model, chunk_model = uow.pages.model_cls, uow.image_chunks.model_cls
+        rows = uow.session.execute(
+            select(chunk_model.contents)
+            .join(page_model, page_model.id == chunk_model.parent_page)
+            .where(page_model.document_id == document_id)
+            .order_by(page_model.page_num)
+            .execution_options(yield_per=batch_size)
+        )
+        store = get_blob_store()
+        for (contents,) in rows:
+            yield resolve_blob(contents, store)
+
+
+def get_page_image(service: MultiModalIngestionService, page_id: str) -> bytes | None:
+    """Get the full-size image of a page from its ImageChunk.
+
+    Args:
+        service: Ingestion service
+        page_id: Page ID
+
+    Returns:
+        Image bytes, or None if the page has no image
+    """
+    return get_page_images(service, [page_id]).get(page_id)
+
+
+def get_page_images(service: MultiModalIngestionService, page_ids: list[str]) -> dict[str, bytes]:
+    """Get the full-size images of several pages with one query.
+
+    Args:
+        service: Ingestion service
+        page_ids: Page IDs
+
+    Returns:
+        Image bytes by page ID; pages without an image are left out
+    """
+    if not page_ids:
+        return {}
+    store = get_blob_store()
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        chunk_model = uow.image_chunks.model_cls
+        rows = uow.session.execute(
+            select(chunk_model.parent_page, chunk_model.contents).where(chunk_model.parent_page.in_(page_ids))
+        ).all()
+    # A page has one image chunk; should there be more, keep the first like get_by_page_id did
+    images: dict[str, bytes] = {}
+    for page_id, contents in rows:
+        if contents and page_id not in images:
+            images[page_id] = resolve_blob(contents, store)
+    return images
+
+
+def build_document_pdf(
+    service: MultiModalIngestionService,
+    document_id: str,
+    pdf_path: Path,
+    progress: ProgressCallback | None = None,
+) -> int:
+    """Assemble the stored page images of a document into its PDF file.
+
+    The file is written under a temporary name and renamed when complete, so
+    the viewer never sees a partial PDF.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        pdf_path: Path of the document's PDF file
+        progress: Optional callback called with (pages_done, page_count) every ``DEFAULT_WINDOW_SIZE`` pages
+
+    Returns:
+        Number of pages written
+    """
+    page_images = iter_page_images(service, document_id)
+    if progress:
+        page_images = report_progress(page_images, count_document_pages(service, document_id), progress)
+    tmp_path = pdf_path.with_name(pdf_path.name + ".tmp")
+    with remove_on_error(tmp_path):
+        page_count = build_pdf(page_images, tmp_path)
+        tmp_path.replace(pdf_path)
+    return page_count
+
+
+def count_document_pages(service: MultiModalIngestionService, document_id: str) -> int:
+    """Count the pages of a document."""
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model = uow.pages.model_cls
+        return uow.session.scalar(select(func.count()).where(page_model.document_id == document_id)) or 0
+
+
+def report_progress(
+    page_images: Iterable[bytes], page_count: int, progress: ProgressCallback, every: int = DEFAULT_WINDOW_SIZE
+) -> Iterator[bytes]:
+    """Pass page images through, calling ``progress`` after every ``every`` pages."""
+    for pages_done, data in enumerate(page_images, start=1):
+        yield data
+        if pages_done % every == 0:
+            progress(pages_done, page_count)
+
+
+def document_profile(doc_metadata: dict | None) -> RasterProfile:
+    """Get the raster profile recorded on a document, given its ``doc_metadata``."""
+    doc_metadata = doc_metadata or {}
+    if PROFILE_KEY in doc_metadata:
+        return profile_from_dict(doc_metadata[PROFILE_KEY])
+    # Checkpoints written before profiles were recorded carry the DPI and quality themselves
+    checkpoint = doc_metadata.get(CHECKPOINT_KEY, {})
+    return replace(
+        DEFAULT_PROFILE,
+        name="custom",
+        dpi=checkpoint.get("dpi", DEFAULT_PROFILE.dpi),
+        quality=checkpoint.get("quality", DEFAULT_PROFILE.quality),
+    )
+
+
+def is_complete(doc_metadata: dict | None) -> bool:
+    """Check whether a document's ingestion finished, given its ``doc_metadata``."""
+    checkpoint = (doc_metadata or {}).get(CHECKPOINT_KEY)
+    # Documents ingested before checkpoints were recorded are complete
+    return checkpoint is None or checkpoint["status"] == STATUS_COMPLETE
+
+
+def find_document_by_path(service: MultiModalIngestionService, save_path: Path) -> IngestResult | None:
+    """Find the document whose PDF is stored at the given path.
+
+    Args:
+        service: Ingestion service
+        save_path: Path of the PDF inside the storage directory
+
+    Returns:
+        IngestResult of the document, or None
+    """
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        file_model, document_model = uow.files.model_cls, uow.documents.model_cls
+        document = uow.session.scalars(
+            select(document_model)
+            .join(file_model, file_model.id == document_model.path)
+            .where(file_model.path == str(save_path))
+        ).first()
+        if document is None:
+            return None
+        return IngestResult(
+            str(document.id),
+            uow.pages.count_by_document(document.id),
+            complete=is_complete(document.doc_metadata),
+        )
+
+
+def find_incomplete_documents(service: MultiModalIngestionService) -> list[IngestResult]:
+    """Find all documents whose ingestion was started but did not finish."""
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        document_model = uow.documents.model_cls
+        status = document_model.doc_metadata[CHECKPOINT_KEY]["status"].astext
+        rows = uow.session.execute(
+            select(document_model.id, document_model.doc_metadata).where(status == STATUS_IN_PROGRESS)
+        ).all()
+    return [
+        IngestResult(str(doc_id), doc_metadata[CHECKPOINT_KEY]["pages_done"], complete=False)
+        for doc_id, doc_metadata in rows
+    ]
+
+
+def page_dhash(page_model) -> ColumnElement:
+    """SQL expression for the perceptual hash of a page, matching the ``ix_page_dhash`` index."""
+    # The key must be a literal (not a bind parameter) for Postgres to use the expression index
+    return page_model.page_metadata.op("->>")(literal_column("'dhash'"))
+
+
+def page_dhash_chunk(page_model, index: int) -> ColumnElement:
+    """SQL expression for one hex chunk of the perceptual hash of a page, matching the ``ix_page_dhash_<index>`` index."""
+    start = index * HASH_CHUNK_LENGTH + 1
+    return func.substr(page_dhash(page_model), literal_column(str(start)), literal_column(str(HASH_CHUNK_LENGTH)))
+
+
+def dhash_distance(a: ColumnElement, b: ColumnElement) -> ColumnElement:
+    """SQL expression for the Hamming distance of two hex perceptual hashes."""
+    bits = BIT(HASH_SIZE * HASH_SIZE)
+    return func.bit_count(
+        cast(literal_column("'x'").concat(a), bits).op("#")(cast(literal_column("'x'").concat(b), bits))
+    )
+
+
+def find_duplicate_pages(
+    service: MultiModalIngestionService,
+    document_id: str,
+    max_distance: int = DUPLICATE_MAX_DISTANCE,
+    max_matches: int = DUPLICATE_MAX_MATCHES,
+) -> dict[int, dict]:
+    """Find pages of a document whose image duplicates or nearly duplicates another page in the corpus.
+
+    Pages match when their perceptual hashes differ in at most ``max_distance``
+    bits. Candidates are looked up through the hash chunk indexes, so only
+    pages sharing a chunk are compared. Blank or boilerplate pages can match
+    thousands of pages; only the number of matches and the closest few are
+    returned.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID
+        max_distance: Maximum number of differing hash bits (at most ``DUPLICATE_MAX_DISTANCE``)
+        max_matches: Maximum number of matching pages returned per page
+
+    Returns:
+        Dict of page_num to a dict with the total ``count`` of matching pages
+        and ``matches``, the closest of them, each a dict with document_id,
+        title, filename, page_num and distance
+    """
+    if max_distance > DUPLICATE_MAX_DISTANCE:
+        raise ValueError(f"max_distance must be at most {DUPLICATE_MAX_DISTANCE}")
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        page_model = uow.pages.model_cls
+        document_model = uow.documents.model_cls
+        page, other = aliased(page_model), aliased(page_model)
+        distance = dhash_distance(page_dhash(page), page_dhash(other))
+        shares_chunk = or_(*(page_dhash_chunk(page, i) == page_dhash_chunk(other, i) for i in range(HASH_CHUNKS)))
+        pairs = (
+            select(
+                page.page_num,
+                other.document_id,
+                other.page_num.label("other_page_num"),
+                distance.label("distance"),
+                func
+                .row_number()
+                .over(partition_by=page.page_num, order_by=(distance, other.document_id, other.page_num))
+                .label("rank"),
+                func.count().over(partition_by=page.page_num).label("count"),
+            )
+            .select_from(page)
+            .join(other, and_(shares_chunk, other.id != page.id))
+            .where(page.document_id == document_id, distance <= max_distance)
+            .subquery()
+        )
+        rows = uow.session.execute(
+            select(
+                pairs.c.page_num,
+                pairs.c.count,
+                pairs.c.document_id,
+                document_model.title,
+                document_model.filename,
+                pairs.c.other_page_num,
+                pairs.c.distance,
+            )
+            .join(document_model, document_model.id == pairs.c.document_id)
+            .where(pairs.c.rank <= max_matches)
+            .order_by(pairs.c.page_num, pairs.c.rank)
+        ).all()
+
+    duplicates: dict[int, dict] = {}
+    for page_num, count, other_doc_id, title, filename, other_page_num, page_distance in rows:
+        entry = duplicates.setdefault(page_num, {"count": count, "matches": []})
+        entry["matches"].append({
+            "document_id": other_doc_id,
+            "title": title,
+            "filename": filename,
+            "page_num": other_page_num,
+            "distance": page_distance,
+        })
+    return duplicates
+
+
+def find_duplicate(service: MultiModalIngestionService, sha256: str, force: bool = False) -> IngestResult | None:
+    """Look up a document whose PDF has the given content hash.
+
+    Call this before rasterizing. With ``force``, an existing document is
+    deleted (rows and stored PDF) so that the content can be ingested again.
+    An existing document may be incomplete; check ``complete`` and resume it.
+
+    Args:
+        service: Ingestion service
+        sha256: Content hash of the PDF
+        force: Delete an existing document instead of returning it
+
+    Returns:
+        IngestResult with ``duplicate=True`` for the existing document, or None
+    """
+    with service._create_uow() as uow:
+        document = uow.documents.get_by_path_id(content_file_id(sha256))
+        if document is None:
+            return None
+        existing = IngestResult(
+            str(document.id),
+            uow.pages.count_by_document(document.id),
+            duplicate=True,
+            complete=is_complete(document.doc_metadata),
+        )
+
+    if not force:
+        return existing
+
+    stored_path = delete_document(service, existing.document_id)
+    if stored_path:
+        Path(stored_path).unlink(missing_ok=True)
+    return None
+
+
+def delete_document(service: MultiModalIngestionService, document_id: str) -> str | None:
+    """Delete a document and all related data.
+
+    Args:
+        service: Ingestion service
+        document_id: Document ID to delete
+
+    Returns:
+        Storage path of the deleted document's PDF, if any
+    """
+    stored_path = None
+    with service._create_uow() as uow:
+        # Get document to find file path
+        doc = uow.documents.get_by_id(document_id)
+        if doc:
+            file_id = doc.path  # File ID referenced by Document
+            stored_path = doc.file.path if doc.file else None
+
+            # Get all pages for this document, with their image chunks but without the images
+            pages = get_document_pages(uow, document_id, with_image_chunks=True)
+
+            # Delete Captions for each page first (FK constraint)
+            if hasattr(uow, "captions"):
+                for page in pages:
+                    captions = uow.captions.get_by_page_id(page.id)
+                    for caption in captions:
+                        uow.captions.delete_by_id(caption.id)
+
+            # Delete Pages; their loaded ImageChunks are deleted first by the ORM cascade (FK constraint)
+            for page in pages:
+                uow.pages.delete(page)
+
+            # Delete Document
+            uow.documents.delete_by_id(document_id)
+
+            # Delete File (orphan after Document deletion)
+            if file_id:
+                uow.files.delete_by_id(file_id)
+
+            uow.commit()
+    atlas_path(document_id).unlink(missing_ok=True)
+    return stored_path
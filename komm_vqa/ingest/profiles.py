@@ -0,0 +1,87 @@
+"""Named rasterization profiles: resolution, codec, quality and size cap of page images."""
+
+from dataclasses import asdict, dataclass
+
+from PIL import features
+
+DEFAULT_DPI = 150
+DEFAULT_JPEG_QUALITY = 85
+
+# codec -> (PIL format, MIME type)
+CODECS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+    "png": ("PNG", "image/png"),
+}
+
+
+@dataclass(frozen=True)
+class RasterProfile:
+    """How PDF pages are turned into stored page images."""
+
+    name: str
+    dpi: int = DEFAULT_DPI
+    codec: str = "jpeg"
+    quality: int = DEFAULT_JPEG_QUALITY  # ignored for PNG
+    max_dimension: int | None = None  # cap on the longest side in pixels, None for no cap
+
+    @property
+    def pil_format(self) -> str:
+        return CODECS[self.codec][0]
+
+    @property
+    def mimetype(self) -> str:
+        return CODECS[self.codec][1]
+
+    def describe(self) -> str:
+        """Short human readable summary, e.g. ``200 DPI, WEBP q85, max 1600px``."""
+        parts = [
+            f"{self.dpi} DPI",
+            self.codec.upper() if self.codec == "png" else f"{self.codec.upper()} q{self.quality}",
+        ]
+        if self.max_dimension:
+            parts.append(f"max {self.max_dimension}px")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        """Serialize for ``Document.doc_metadata``."""
+        return asdict(self)
+
+
+DEFAULT_PROFILE = RasterProfile("default")
+
+PROFILES = {
+    profile.name: profile
+    for profile in [
+        DEFAULT_PROFILE,
+        # Smallest pages that are still comfortable to read on screen
+        RasterProfile("compact", dpi=120, codec="webp", quality=75, max_dimension=1600),
+        # Higher resolution so small Korean text (footnotes, tables) stays legible
+        RasterProfile("text", dpi=200, codec="webp", quality=85),
+        RasterProfile("avif", dpi=150, codec="avif", quality=60),
+        RasterProfile("lossless", dpi=150, codec="png"),
+    ]
+}
+
+
+def get_profile(name: str) -> RasterProfile:
+    """Look up a named profile and check that Pillow can encode its codec.
+
+    Args:
+        name: Profile name (see ``PROFILES``)
+
+    Returns:
+        The profile
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown raster profile '{name}'. Available: {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+    if profile.codec in ("webp", "avif") and not features.check(profile.codec):
+        raise ValueError(f"Raster profile '{name}' needs {profile.codec.upper()} support in Pillow")
+    return profile
+
+
+def profile_from_dict(data: dict) -> RasterProfile:
+    """Rebuild a profile recorded with ``RasterProfile.to_dict``."""
+    return RasterProfile(**data)
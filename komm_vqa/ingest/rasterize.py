@@ -0,0 +1,153 @@
+"""PDF rasterization helpers.
+
+This module must stay importable without Streamlit or a database connection,
+because its functions run inside ingestion worker processes.
+"""
+
+import tempfile
+from collections.abc import Iterator
+from io import BytesIO
+from pathlib import Path
+from typing import cast
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+from komm_vqa.ingest.profiles import DEFAULT_JPEG_QUALITY, DEFAULT_PROFILE, RasterProfile
+
+# Number of pages rasterized per poppler call. Peak memory is proportional to
+# this value, not to the page count of the document.
+DEFAULT_WINDOW_SIZE = 8
+
+
+def encode_jpeg(img: Image.Image, quality: int = DEFAULT_JPEG_QUALITY) -> bytes:
+    """Encode a PIL image as JPEG bytes.
+
+    Args:
+        img: PIL image
+        quality: JPEG quality (1-95)
+
+    Returns:
+        JPEG image bytes
+    """
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def encode_page(img: Image.Image, profile: RasterProfile = DEFAULT_PROFILE) -> bytes:
+    """Encode a rendered page with the codec, quality and size cap of a profile.
+
+    Args:
+        img: PIL image of the page (may be resized in place)
+        profile: Raster profile
+
+    Returns:
+        Encoded image bytes
+    """
+    if profile.max_dimension:
+        img.thumbnail((profile.max_dimension, profile.max_dimension), Image.Resampling.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    options = {} if profile.codec == "png" else {"quality": profile.quality}
+    buffer = BytesIO()
+    img.save(buffer, format=profile.pil_format, **options)
+    return buffer.getvalue()
+
+
+def pdf_page_count(pdf_path: str | Path) -> int:
+    """Get the number of pages of a PDF file without rendering it."""
+    return int(pdfinfo_from_path(str(pdf_path))["Pages"])
+
+
+def page_windows(
+    page_count: int, window_size: int = DEFAULT_WINDOW_SIZE, first_page: int = 1
+) -> Iterator[tuple[int, int]]:
+    """Split ``first_page..page_count`` into inclusive ``(first_page, last_page)`` windows.
+
+    Args:
+        page_count: Total number of pages
+        window_size: Maximum number of pages per window
+        first_page: First page of the first window (1-based)
+
+    Yields:
+        Tuple of (first_page, last_page), 1-based and inclusive
+    """
+    if window_size < 1:
+        raise ValueError("window_size must be at least 1")
+    for start in range(first_page, page_count + 1, window_size):
+        yield start, min(start + window_size - 1, page_count)
+
+
+def rasterize_window(
+    pdf_path: str | Path,
+    first_page: int,
+    last_page: int,
+    profile: RasterProfile = DEFAULT_PROFILE,
+    passthrough: bool = True,
+) -> list[bytes]:
+    """Rasterize an inclusive page range of a PDF file to encoded page images.
+
+    For JPEG profiles without a size cap, poppler writes the final JPEG at the
+    target quality and its bytes are returned as-is (passthrough). Otherwise
+    poppler renders lossless bitmaps that are encoded with ``encode_page``.
+
+    Args:
+        pdf_path: Path to PDF file
+        first_page: First page to render (1-based)
+        last_page: Last page to render (inclusive)
+        profile: Raster profile (DPI, codec, quality, size cap)
+        passthrough: Store poppler-encoded JPEGs without decoding them when the profile allows it
+
+    Returns:
+        List of encoded images, one per page
+    """
+    if passthrough and profile.codec == "jpeg" and profile.max_dimension is None:
+        with tempfile.TemporaryDirectory(prefix="komm_vqa_") as output_folder:
+            paths = convert_from_path(
+                pdf_path,
+                dpi=profile.dpi,
+                fmt="jpeg",
+                jpegopt={"quality": profile.quality},
+                first_page=first_page,
+                last_page=last_page,
+                output_folder=output_folder,
+                paths_only=True,
+            )
+            # With paths_only=True poppler returns the written file paths instead of images
+            return [Path(path).read_bytes() for path in cast(list[str], paths)]
+
+    images = convert_from_path(pdf_path, dpi=profile.dpi, first_page=first_page, last_page=last_page)
+    pages = []
+    for img in images:
+        pages.append(encode_page(img, profile))
+        img.close()
+    return pages
+
+
+def iter_rasterized_windows(
+    pdf_path: str | Path,
+    page_count: int,
+    profile: RasterProfile = DEFAULT_PROFILE,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    passthrough: bool = True,
+    first_page: int = 1,
+) -> Iterator[list[bytes]]:
+    """Lazily rasterize a PDF file one page window at a time.
+
+    Only one window of decoded images is alive at any time, so callers that
+    persist and drop each window run in memory bounded by ``window_size``.
+
+    Args:
+        pdf_path: Path to PDF file
+        page_count: Total number of pages (see ``pdf_page_count``)
+        profile: Raster profile (DPI, codec, quality, size cap)
+        window_size: Number of pages per window
+        passthrough: Store poppler-encoded JPEGs without decoding them when the profile allows it
+        first_page: First page to rasterize (1-based), e.g. to resume after a checkpoint
+
+    Yields:
+        Encoded images of each window's pages, in page order
+    """
+    for start, last_page in page_windows(page_count, window_size, first_page):
+        yield rasterize_window(pdf_path, start, last_page, profile, passthrough)
@@ -0,0 +1,213 @@
+"""Page image renditions: pre-sized thumbnails and previews generated at ingest.
+
+The full-size page image stays in ImageChunk. Smaller renditions are stored
+in the ``page_rendition`` table together with their dimensions, so galleries
+and previews serve pre-sized bytes without decoding the full image.
+"""
+
+from dataclasses import dataclass
+from io import BytesIO
+
+from autorag_research.exceptions import SessionNotSetError
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from autorag_research.orm.uow.multi_modal_uow import MultiModalUnitOfWork
+from PIL import Image
+from sqlalchemy import Column, Integer, LargeBinary, MetaData, String, Table, insert, select
+
+from komm_vqa.ingest.blobs import BlobStore, get_blob_store, resolve_blob, store_blob
+from komm_vqa.ingest.profiles import DEFAULT_JPEG_QUALITY
+from komm_vqa.ingest.rasterize import encode_jpeg
+
+THUMBNAIL = "thumbnail"
+MEDIUM = "medium"
+FULL = "full"  # the ImageChunk image itself; not stored in page_rendition
+# Longest side in pixels of each stored rendition, smallest first
+RENDITION_SIZES = {THUMBNAIL: 200, MEDIUM: 1024}
+RENDITION_MIMETYPE = "image/jpeg"
+
+metadata = MetaData()
+
+page_rendition = Table(
+    "page_rendition",
+    metadata,
+    # References page.id with ON DELETE CASCADE, added in komm_vqa.db.EXTRA_DDL
+    # (the page table belongs to the ORM's metadata)
+    Column("page_id", String, primary_key=True),
+    Column("rendition", String, primary_key=True),
+    Column("contents", LargeBinary, nullable=False),  # blob reference (see komm_vqa.ingest.blobs)
+    Column("mimetype", String, nullable=False),
+    Column("width", Integer, nullable=False),
+    Column("height", Integer, nullable=False),
+)
+
+
+@dataclass
+class Rendition:
+    """One stored size of a page image."""
+
+    name: str
+    contents: bytes
+    width: int
+    height: int
+    mimetype: str = RENDITION_MIMETYPE
+
+
+def fit_size(size: tuple[int, int], box: tuple[int, int]) -> tuple[int, int]:
+    """Size of an image scaled down (never up) to fit in ``box``, keeping its aspect ratio."""
+    width, height = size
+    scale = min(1.0, box[0] / width, box[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def open_scaled(image_bytes: bytes, box: tuple[int, int], draft: bool = True) -> Image.Image:
+    """Decode an image at (close to) the size it is about to be scaled down to.
+
+    JPEG images are decoded with ``Image.draft``, which scales by 1/2, 1/4
+    or 1/8 during the inverse DCT, so a thumbnail never needs the full-size
+    pixels in memory. The result is at least as large as the image fitted
+    into ``box`` and still has to be resized.
+
+    Args:
+        image_bytes: Encoded image
+        box: Maximum (width, height) of the image that will be made from the result
+        draft: Use reduced-scale JPEG decoding; False decodes at full size
+
+    Returns:
+        Decoded image in RGB or L mode
+    """
+    img = Image.open(BytesIO(image_bytes))
+    if draft:
+        img.draft("RGB", fit_size(img.size, box))
+    img = img.convert("RGB") if img.mode not in ("RGB", "L") else img
+    img.load()
+    return img
+
+
+def make_thumbnail(
+    image_bytes: bytes, box: tuple[int, int], quality: int = DEFAULT_JPEG_QUALITY, draft: bool = True
+) -> Rendition:
+    """Downscale an image to a JPEG that fits in ``box``.
+
+    Args:
+        image_bytes: Encoded image
+        box: Maximum (width, height) of the thumbnail
+        quality: JPEG quality
+        draft: Use reduced-scale JPEG decoding (see ``open_scaled``)
+
+    Returns:
+        Rendition named ``THUMBNAIL``
+    """
+    img = open_scaled(image_bytes, box, draft)
+    img.thumbnail(box, Image.Resampling.LANCZOS)
+    return Rendition(THUMBNAIL, encode_jpeg(img, quality), img.width, img.height)
+
+
+def make_renditions(image_bytes: bytes, quality: int = DEFAULT_JPEG_QUALITY) -> tuple[tuple[int, int], list[Rendition]]:
+    """Decode a page image once and derive its smaller renditions from it.
+
+    The image is decoded at reduced scale when the largest rendition allows
+    it (see ``open_scaled``), and each rendition is downscaled from the next
+    larger one. A medium preview is only made when the full image is larger
+    than it; a thumbnail is always made.
+
+    Args:
+        image_bytes: Encoded full-size page image
+        quality: JPEG quality of the renditions
+
+    Returns:
+        Tuple of the full image's (width, height) and its renditions, smallest first
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        full_size = img.size
+    sizes = [(name, size) for name, size in RENDITION_SIZES.items() if name == THUMBNAIL or max(full_size) > size]
+    largest = sizes[-1][1]
+    current = open_scaled(image_bytes, (largest, largest))
+
+    renditions = []
+    for name, size in reversed(sizes):
+        current.thumbnail((size, size), Image.Resampling.LANCZOS)
+        renditions.append(Rendition(name, encode_jpeg(current, quality), current.width, current.height))
+    return full_size, renditions[::-1]
+
+
+def insert_renditions(
+    uow: MultiModalUnitOfWork, renditions: dict[str, list[Rendition]], store: BlobStore | None = None
+) -> None:
+    """Insert the renditions of pages with one executemany. Nothing is committed here.
+
+    Args:
+        uow: Open unit of work
+        renditions: Renditions by page ID
+        store: Blob store for the image bytes (default: ``get_blob_store()``)
+    """
+    store = store or get_blob_store()
+    rows = [
+        {
+            "page_id": page_id,
+            "rendition": r.name,
+            "contents": store_blob(r.contents, store),
+            "mimetype": r.mimetype,
+            "width": r.width,
+            "height": r.height,
+        }
+        for page_id, page_renditions in renditions.items()
+        for r in page_renditions
+    ]
+    if not rows:
+        return
+    if uow.session is None:
+        raise SessionNotSetError
+    uow.session.execute(insert(page_rendition), rows)
+
+
+def get_rendition(service: MultiModalIngestionService, page_id: str, name: str) -> Rendition | None:
+    """Get a stored rendition of a page, or the next larger one if that size was not stored.
+
+    Args:
+        service: Ingestion service
+        page_id: Page ID
+        name: Rendition name (``THUMBNAIL`` or ``MEDIUM``)
+
+    Returns:
+        The rendition, or None if the page has no rendition of at least that size
+        (pages ingested before renditions existed, or pages smaller than ``name``)
+    """
+    return get_renditions(service, [page_id], name).get(page_id)
+
+
+def get_renditions(service: MultiModalIngestionService, page_ids: list[str], name: str) -> dict[str, Rendition]:
+    """Get a stored rendition of several pages with one query, falling back per page like ``get_rendition``.
+
+    Args:
+        service: Ingestion service
+        page_ids: Page IDs
+        name: Rendition name (``THUMBNAIL`` or ``MEDIUM``)
+
+    Returns:
+        Renditions by page ID; pages without a rendition of at least that size are left out
+    """
+    if not page_ids:
+        return {}
+    names = list(RENDITION_SIZES)
+    candidates = names[names.index(name) :]
+    with service._create_uow() as uow:
+        if uow.session is None:
+            raise SessionNotSetError
+        rows = uow.session.execute(
+            select(page_rendition).where(
+                page_rendition.c.page_id.in_(page_ids), page_rendition.c.rendition.in_(candidates)
+            )
+        ).mappings()
+        by_page: dict[str, dict] = {}
+        for row in rows:
+            by_page.setdefault(row["page_id"], {})[row["rendition"]] = row
+
+    store = get_blob_store()
+    renditions = {}
+    for page_id, by_name in by_page.items():
+        # The smallest stored candidate is the requested size, or the next larger one
+        row = by_name[min(by_name, key=candidates.index)]
+        renditions[page_id] = Rendition(
+            row["rendition"], resolve_blob(row["contents"], store), row["width"], row["height"], row["mimetype"]
+        )
+    return renditions
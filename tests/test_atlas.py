@@ -0,0 +1,23 @@
+import pytest
+
+from komm_vqa.ingest.atlas import ThumbnailAtlas, write_atlas
+
+
+def test_atlas_round_trip(tmp_path):
+    path = tmp_path / "doc.atlas"
+    write_atlas(path, [("a", 1, b"first", 10, 20), ("b", 2, b"second page", 30, 40)], page_count=3)
+
+    atlas = ThumbnailAtlas(path)
+    assert atlas.page_count == 3
+    assert atlas.get("a") == b"first"
+    assert atlas.get("b") == b"second page"
+    assert atlas.get("missing") is None
+    assert (atlas.entries["b"].width, atlas.entries["b"].height) == (30, 40)
+    atlas.close()
+
+
+def test_atlas_rejects_other_files(tmp_path):
+    path = tmp_path / "other.atlas"
+    path.write_bytes(b"not an atlas file")
+    with pytest.raises(ValueError):
+        ThumbnailAtlas(path)
@@ -0,0 +1,114 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from sqlalchemy import delete, event, select
+from sqlalchemy.exc import OperationalError
+
+from komm_vqa.db import build_db_url, create_service, get_env_db_config
+from komm_vqa.ingest.atlas import ATLAS_DIR_ENV, ThumbnailAtlas, atlas_path, build_atlas, is_current, write_atlas
+from komm_vqa.ingest.backfill import backfill_renditions, backfill_thumbnails, precompute_thumbnails
+from komm_vqa.ingest.pipeline import create_document, delete_document, insert_pages
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE
+from komm_vqa.ingest.renditions import MEDIUM, RENDITION_SIZES, THUMBNAIL, page_rendition
+
+
+@pytest.fixture
+def service():
+    if "TEST_DB_NAME" not in os.environ:
+        pytest.skip("TEST_DB_NAME is not set")
+    try:
+        return create_service(build_db_url({**get_env_db_config(), "database": os.environ["TEST_DB_NAME"]}))
+    except OperationalError:
+        pytest.skip("PostgreSQL is not available")
+
+
+def _jpeg(shade: int) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (1200, 1600), (shade, 0, 0)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def legacy_document(service, tmp_path, monkeypatch):
+    """A 3-page document ingested before renditions existed; yields (document ID, page IDs)."""
+    monkeypatch.setenv(ATLAS_DIR_ENV, str(tmp_path / "atlas"))
+    document_id = create_document(service, tmp_path / "a.pdf", "a.pdf", "A", 3, DEFAULT_PROFILE, {})
+    with service._create_uow() as uow:
+        page_ids = insert_pages(uow, document_id, [_jpeg(shade) for shade in (0, 100, 200)])
+        uow.session.execute(delete(page_rendition).where(page_rendition.c.page_id.in_(page_ids)))
+        uow.commit()
+    yield document_id, page_ids
+    delete_document(service, document_id)
+
+
+def _renditions(service, page_ids: list[str]) -> set[tuple[str, str]]:
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        rows = uow.session.execute(
+            select(page_rendition.c.page_id, page_rendition.c.rendition).where(page_rendition.c.page_id.in_(page_ids))
+        )
+        return {tuple(row) for row in rows}
+
+
+def test_backfill_renditions_gives_legacy_pages_renditions(service, legacy_document):
+    document_id, page_ids = legacy_document
+    assert _renditions(service, page_ids) == set()
+
+    assert backfill_renditions(service, batch_size=2, document_id=document_id) == (3, 0)
+    assert _renditions(service, page_ids) == {(page_id, name) for page_id in page_ids for name in (THUMBNAIL, MEDIUM)}
+    # Nothing is left to do
+    assert backfill_renditions(service, document_id=document_id) == (0, 0)
+
+
+def test_precompute_thumbnails_builds_the_atlas(service, legacy_document):
+    document_id, page_ids = legacy_document
+    assert precompute_thumbnails(service, document_id) == 3
+
+    assert {name for _, name in _renditions(service, page_ids)} == {THUMBNAIL, MEDIUM}
+    atlas = ThumbnailAtlas(atlas_path(document_id))
+    try:
+        assert atlas.page_count == 3
+        for page_id in page_ids:
+            thumbnail = atlas.get(page_id)
+            assert thumbnail is not None
+            assert max(Image.open(BytesIO(thumbnail)).size) <= RENDITION_SIZES[THUMBNAIL]
+    finally:
+        atlas.close()
+
+
+def test_build_atlas_loads_legacy_pages_with_one_query(service, legacy_document, tmp_path):
+    document_id, page_ids = legacy_document
+    engine = service.session_factory.kw["bind"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert build_atlas(service, document_id, tmp_path / "doc.atlas") == 3
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert sum("FROM image_chunk" in statement for statement in statements) == 1
+    atlas = ThumbnailAtlas(tmp_path / "doc.atlas")
+    try:
+        assert [atlas.entries[page_id].page_num for page_id in page_ids] == [1, 2, 3]
+        assert all(atlas.get(page_id) for page_id in page_ids)
+    finally:
+        atlas.close()
+
+
+def test_backfill_thumbnails_rebuilds_stale_atlases(service, legacy_document):
+    document_id, page_ids = legacy_document
+    # Built when the document had a single page
+    path = atlas_path(document_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atlas(path, [(page_ids[0], 1, b"old", 1, 1)], page_count=1)
+
+    done, skipped, built = backfill_thumbnails(service)
+    assert (done, skipped) == (3, 0)
+    assert built >= 1
+    assert is_current(path, 3)
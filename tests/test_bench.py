@@ -0,0 +1,17 @@
+from komm_vqa.bench import BenchResult, format_results, measure
+
+
+def test_measure_counts_items_and_bytes():
+    result = measure("sample", lambda: iter([b"abc", b"de"]))
+
+    assert result.items == 2
+    assert result.total_bytes == 5
+    assert result.bytes_per_item == 2.5
+    assert result.wall_seconds >= 0
+
+
+def test_format_results_handles_empty_runs():
+    table = format_results([BenchResult("empty")])
+
+    assert "empty" in table
+    assert "KB/page" in table
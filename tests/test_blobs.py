@@ -0,0 +1,91 @@
+import os
+import time
+from unittest.mock import Mock
+
+import pytest
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+
+from komm_vqa.ingest import backfill
+from komm_vqa.ingest.backfill import sweep_blobs
+from komm_vqa.ingest.blobs import (
+    BLOB_STORE_ENV,
+    FileSystemBlobStore,
+    blob_key,
+    blob_ref,
+    get_blob_store,
+    open_blob_store,
+    resolve_blob,
+    store_blob,
+)
+
+
+def test_filesystem_blob_store(tmp_path):
+    store = FileSystemBlobStore(tmp_path)
+    key = store.put(b"page")
+    os.utime(store.path(key), (time.time() - 7200, time.time() - 7200))
+    assert store.put(b"page") == key
+    assert store.get(key) == b"page"
+    # Storing the same content again refreshes its write time
+    modified = store.modified(key)
+    assert modified is not None
+    assert time.time() - modified.timestamp() < 60
+    assert store.modified("0" * 64) is None
+    assert store.path(key) == tmp_path / key[:2] / key[2:4] / key
+    assert not store.exists("0" * 64)
+
+
+def test_blob_references(tmp_path):
+    store = FileSystemBlobStore(tmp_path)
+    ref = store_blob(b"\xff\xd8jpeg", store)
+    assert blob_key(ref) is not None
+    assert resolve_blob(ref, store) == b"\xff\xd8jpeg"
+    # Rows written before the blob store hold the image bytes themselves
+    assert blob_key(b"\xff\xd8jpeg") is None
+    assert resolve_blob(b"\xff\xd8jpeg", store) == b"\xff\xd8jpeg"
+
+
+def test_open_blob_store(tmp_path):
+    store = open_blob_store(f"file://{tmp_path}")
+    assert isinstance(store, FileSystemBlobStore)
+    assert store.root == tmp_path
+
+
+def test_images_are_inline_without_blob_store(monkeypatch):
+    monkeypatch.delenv(BLOB_STORE_ENV, raising=False)
+    get_blob_store.cache_clear()
+    try:
+        assert get_blob_store() is None
+        assert store_blob(b"\xff\xd8jpeg") == b"\xff\xd8jpeg"
+        with pytest.raises(FileNotFoundError):
+            resolve_blob(blob_ref("0" * 64))
+    finally:
+        get_blob_store.cache_clear()
+
+
+def test_sweep_blobs(tmp_path, monkeypatch):
+    store = FileSystemBlobStore(tmp_path)
+    kept, orphan, young = store.put(b"kept"), store.put(b"orphan"), store.put(b"young")
+    for key in (kept, orphan):
+        os.utime(store.path(key), (time.time() - 7200, time.time() - 7200))
+    assert {key for key, _ in store.iter_keys()} == {kept, orphan, young}
+    monkeypatch.setattr(backfill, "referenced_blob_keys", lambda service: {kept})
+
+    assert sweep_blobs(Mock(spec=MultiModalIngestionService), store, min_age=3600, dry_run=True) == (1, 1)
+    assert store.exists(orphan)
+    assert sweep_blobs(Mock(spec=MultiModalIngestionService), store, min_age=3600) == (1, 1)
+    assert {key for key, _ in store.iter_keys()} == {kept, young}
+
+
+def test_sweep_blobs_keeps_blobs_stored_again(tmp_path, monkeypatch):
+    store = FileSystemBlobStore(tmp_path)
+    key = store.put(b"page")
+    os.utime(store.path(key), (time.time() - 7200, time.time() - 7200))
+
+    def store_again(service):
+        # A re-ingestion stores the same page while the sweep reads the references
+        store.put(b"page")
+        return set()
+
+    monkeypatch.setattr(backfill, "referenced_blob_keys", store_again)
+    assert sweep_blobs(Mock(spec=MultiModalIngestionService), store, min_age=3600) == (0, 0)
+    assert store.exists(key)
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.exc import OperationalError
+
+from komm_vqa.db import EXTRA_DDL, build_db_url, create_service, ensure_schema, get_env_db_config
+from komm_vqa.ingest.catalog import get_catalog_version, get_document_catalog
+from komm_vqa.ingest.pipeline import STATUS_COMPLETE, create_document, delete_document, save_checkpoint
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE
+
+
+@pytest.fixture
+def service():
+    if "TEST_DB_NAME" not in os.environ:
+        pytest.skip("TEST_DB_NAME is not set")
+    try:
+        return create_service(build_db_url({**get_env_db_config(), "database": os.environ["TEST_DB_NAME"]}))
+    except OperationalError:
+        pytest.skip("PostgreSQL is not available")
+
+
+@pytest.fixture
+def document_id(service, tmp_path):
+    document_id = create_document(service, tmp_path / "a.pdf", "a.pdf", "A", 4, DEFAULT_PROFILE, {"window_size": 2})
+    yield document_id
+    delete_document(service, document_id)
+
+
+def _update(service, document_id: str, **values) -> None:
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        doc_model = uow.documents.model_cls
+        uow.session.execute(update(doc_model).where(doc_model.id == document_id).values(**values))
+        uow.commit()
+
+
+def _save_checkpoint(service, document_id: str, checkpoint: dict) -> None:
+    with service._create_uow() as uow:
+        save_checkpoint(uow, document_id, checkpoint)
+        uow.commit()
+
+
+def test_catalog_version_follows_catalog_columns(service, document_id):
+    version = get_catalog_version(service)
+    checkpoint = {"status": "in_progress", "pages_done": 0, "page_count": 4, "window_size": 2}
+
+    # Changes the catalog does not show keep the cached catalog
+    _save_checkpoint(service, document_id, {**checkpoint, "pages_done": 2})
+    _update(service, document_id, author="someone")
+    assert get_catalog_version(service) == version
+
+    _save_checkpoint(service, document_id, {**checkpoint, "pages_done": 4, "status": STATUS_COMPLETE})
+    assert get_catalog_version(service) == version + 1
+    _update(service, document_id, title="B")
+    assert get_catalog_version(service) == version + 2
+
+    (doc,) = [doc for doc in get_document_catalog(service) if doc["id"] == document_id]
+    assert (doc["title"], doc["page_count"]) == ("B", 0)
+
+
+def test_ensure_schema_replaces_catch_all_document_trigger(service):
+    engine = service.session_factory.kw["bind"]
+    with engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER document_catalog_version_document_update ON document"))
+        conn.execute(
+            text(
+                "CREATE CONSTRAINT TRIGGER document_catalog_version_document AFTER UPDATE ON document "
+                "DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION bump_document_catalog_version()"
+            )
+        )
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        triggers = conn.scalars(
+            text("SELECT tgname FROM pg_trigger WHERE tgname LIKE 'document_catalog_version_document%'")
+        ).all()
+    assert sorted(triggers) == [
+        "document_catalog_version_document_insert_delete",
+        "document_catalog_version_document_update",
+    ]
+
+
+def test_catalog_ddl_runs_concurrently(service):
+    engine = service.session_factory.kw["bind"]
+    statements = [ddl for ddl in EXTRA_DDL if "bump_document_catalog_version" in ddl]
+
+    def setup(_) -> None:
+        with engine.begin() as conn:
+            for ddl in statements:
+                conn.execute(text(ddl))
+
+    # App reruns and workers starting together each run the schema setup
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(setup, range(64)))
+
+
+def test_ensure_schema_does_not_wait_for_writers(service):
+    engine = service.session_factory.kw["bind"]
+    impatient = create_engine(engine.url, connect_args={"options": "-c lock_timeout=1000"})
+    # Held like workers inserting pages and updating jobs; a schema setup that has nothing to do must not wait
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE ingest_job, page, page_rendition, document IN ROW EXCLUSIVE MODE"))
+        ensure_schema(impatient)
+    impatient.dispose()
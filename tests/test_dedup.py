@@ -0,0 +1,23 @@
+import hashlib
+from io import BytesIO
+
+from komm_vqa.ingest.dedup import HASH_CHUNK_SIZE, content_file_id, content_sha256, file_sha256
+
+
+def test_content_sha256_reads_from_start_and_rewinds():
+    data = b"%PDF-1.4" + b"x" * (HASH_CHUNK_SIZE + 10)
+    buffer = BytesIO(data)
+    buffer.seek(100)
+    assert content_sha256(buffer) == hashlib.sha256(data).hexdigest()
+    assert buffer.tell() == 0
+
+
+def test_file_sha256_matches_content_sha256(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4 same bytes")
+    assert file_sha256(path) == content_sha256(BytesIO(b"%PDF-1.4 same bytes"))
+
+
+def test_content_file_id():
+    digest = hashlib.sha256(b"").hexdigest()
+    assert content_file_id(digest) == f"sha256:{digest}"
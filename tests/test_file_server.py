@@ -0,0 +1,88 @@
+import http.client
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import pytest
+import streamlit as st
+from PIL import Image
+
+from komm_vqa.app.file_server import IMMUTABLE_MAX_AGE, FileServer, get_file_server, parse_range
+from komm_vqa.ingest.blobs import FileSystemBlobStore
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-200", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+@pytest.fixture
+def server(tmp_path):
+    file_server = FileServer(port=0, store=FileSystemBlobStore(tmp_path / "blobs"))
+    yield file_server
+    file_server.shutdown()
+
+
+def _get(url: str, **headers) -> tuple[int, dict, bytes]:
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.netloc)
+    try:
+        conn.request("GET", parts.path, headers=headers)
+        response = conn.getresponse()
+        return response.status, dict(response.headers), response.read()
+    finally:
+        conn.close()
+
+
+def test_serves_byte_ranges_and_revalidates(server, tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(bytes(range(256)) * 4)
+    url = server.url_for(path)
+    assert server.url_for(path) == url
+
+    status, headers, body = _get(url)
+    assert (status, len(body), headers["Accept-Ranges"], headers["Content-Type"]) == (
+        200,
+        1024,
+        "bytes",
+        "application/pdf",
+    )
+
+    status, headers, body = _get(url, Range="bytes=256-259")
+    assert (status, headers["Content-Range"], body) == (206, "bytes 256-259/1024", bytes([0, 1, 2, 3]))
+
+    assert _get(url, **{"If-None-Match": headers["ETag"]})[0] == 304
+    assert _get(url, Range="bytes=2000-")[0] == 416
+    assert _get(url.replace("/files/", "/files/x"))[0] == 404
+
+
+def test_serves_images_by_content_hash(server):
+    buffer = BytesIO()
+    Image.new("RGB", (20, 10), "red").save(buffer, format="PNG")
+    data = buffer.getvalue()
+    assert server.store is not None
+    url = server.url_for_blob(server.store.put(data), "image/png")
+    assert url.endswith(".png")
+
+    status, headers, body = _get(url)
+    assert (status, body, headers["Content-Type"]) == (200, data, "image/png")
+    assert headers["Cache-Control"] == f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    assert _get(url, **{"If-None-Match": headers["ETag"]})[0] == 304
+    assert _get(url.replace(".png", ".exe"))[0] == 404
+
+
+def test_get_file_server_survives_cache_clear():
+    get_file_server.cache_clear()
+    file_server = get_file_server()
+    try:
+        # "Update DB Config" clears Streamlit's resource cache; the running server must not be dropped
+        st.cache_resource.clear()
+        assert get_file_server() is file_server
+    finally:
+        file_server.shutdown()
+        get_file_server.cache_clear()
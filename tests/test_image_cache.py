@@ -0,0 +1,78 @@
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from komm_vqa.ingest.image_cache import ImageCache
+
+
+def test_hits_and_misses(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1000)
+    assert cache.get_or_load("p1", "full", lambda: b"image") == b"image"
+    assert cache.get_or_load("p1", "full", lambda: b"other") == b"image"
+    assert cache.get("p1", "thumbnail") is None
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries, stats.total_bytes) == (1, 2, 1, 5)
+
+
+def test_get_or_load_many_loads_misses_in_one_call(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1000)
+    cache.put_many({"p1": b"one", "p2": b"two"}, "thumbnail")
+    calls = []
+
+    def load(page_ids):
+        calls.append(page_ids)
+        return {page_id: page_id.encode() for page_id in page_ids if page_id != "p4"}
+
+    found = cache.get_or_load_many(["p1", "p2", "p3", "p4"], "thumbnail", load)
+    assert found == {"p1": b"one", "p2": b"two", "p3": b"p3"}
+    assert calls == [["p3", "p4"]]
+    assert cache.get_many(["p1", "p3", "p4"], "thumbnail") == {"p1": b"one", "p3": b"p3"}
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (4, 3, 3)
+
+
+def test_lookups_do_not_wait_for_writers(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1000)
+    cache.put("p1", "full", b"image")
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.get_many(["p1", "p2"], "full") == {"p1": b"image"}
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert (cache.stats().hits, cache.stats().misses) == (1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Rewrite access times on every lookup, so the order below is exact
+    cache = ImageCache(tmp_path, max_bytes=30, touch_interval=0)
+    cache.put("a", "full", b"a" * 10)
+    cache.put("b", "full", b"b" * 10)
+    cache.put("c", "full", b"c" * 10)
+    cache.get("a", "full")
+    cache.put("d", "full", b"d" * 10)
+
+    assert cache.get("b", "full") is None
+    assert cache.get("a", "full") is not None
+    assert cache.stats().total_bytes == 30
+
+
+def _fill(directory, worker: int) -> None:
+    cache = ImageCache(directory, max_bytes=2000)
+    for i in range(40):
+        cache.put(f"{worker}-{i}", "full", bytes(100))
+        cache.get(f"{worker}-{i // 2}", "full")
+    cache.flush()
+
+
+def test_concurrent_processes_keep_size_consistent(tmp_path):
+    ImageCache(tmp_path, max_bytes=2000)
+    with ProcessPoolExecutor(max_workers=4, mp_context=get_context("spawn")) as pool:
+        list(pool.map(_fill, [tmp_path] * 4, range(4)))
+
+    stats = ImageCache(tmp_path, max_bytes=2000).stats()
+    assert stats.total_bytes == stats.entries * 100 <= 2000
+    assert stats.hits + stats.misses == 160
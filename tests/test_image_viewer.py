@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from komm_vqa.app.components import image_viewer
+from komm_vqa.app.components.image_viewer import _prefetch, _window_thumbnails, gallery_window
+from komm_vqa.ingest.atlas import ThumbnailAtlas, write_atlas
+
+
+def test_gallery_window():
+    assert gallery_window(0, 24, 0) == (0, 1, 0)
+    assert gallery_window(50, 24, 1) == (1, 3, 24)
+    # Windows past the end (e.g. after pages were deleted) show the last one
+    assert gallery_window(50, 24, 5) == (2, 3, 48)
+    assert gallery_window(48, 24, 2) == (1, 2, 24)
+    assert gallery_window(50, 24, -1) == (0, 3, 0)
+
+
+def test_window_thumbnails_prefers_urls_then_atlas(monkeypatch, tmp_path):
+    pages = [SimpleNamespace(id=page_id) for page_id in ("p1", "p2", "p3", "p4")]
+    write_atlas(tmp_path / "doc.atlas", [("p1", 1, b"atlas-1", 10, 10), ("p2", 2, b"atlas-2", 10, 10)], page_count=4)
+    atlas = ThumbnailAtlas(tmp_path / "doc.atlas")
+    loaded = []
+
+    def load_thumbnails(page_ids):
+        loaded.append(page_ids)
+        return {page_id: b"loaded" for page_id in page_ids if page_id != "p4"}
+
+    monkeypatch.setattr(image_viewer, "serves_images", lambda: True)
+    monkeypatch.setattr(image_viewer, "load_image_urls", lambda page_ids, rendition: {"p1": "https://files/p1.jpg"})
+    monkeypatch.setattr(image_viewer, "load_thumbnails", load_thumbnails)
+
+    thumbnails = _window_thumbnails(pages, atlas)
+    assert thumbnails == {"p1": "https://files/p1.jpg", "p2": b"atlas-2", "p3": b"loaded"}
+    assert loaded == [("p3", "p4")]
+
+    # Without served images nothing is looked up by URL
+    monkeypatch.setattr(image_viewer, "serves_images", lambda: False)
+    assert _window_thumbnails(pages[:2], atlas) == {"p1": b"atlas-1", "p2": b"atlas-2"}
+
+
+def test_prefetch_preloads_urls_only(monkeypatch):
+    html = []
+    monkeypatch.setattr(image_viewer.st, "html", html.append)
+
+    _prefetch({"p1": "https://files/p1.jpg", "p2": b"bytes"})
+    assert len(html) == 1
+    assert '<img src="https://files/p1.jpg" alt="">' in html[0]
+    assert "display: none" in html[0]
+
+    _prefetch({"p2": b"bytes"})
+    assert len(html) == 1
@@ -0,0 +1,60 @@
+from io import BytesIO
+
+from PIL import Image
+
+from komm_vqa.ingest.images import build_pdf, image_metadata, normalize_image
+
+
+def _upload(img: Image.Image, fmt: str, **save_options) -> BytesIO:
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, **save_options)
+    buffer.seek(0)
+    return buffer
+
+
+def test_normalize_image_keeps_upright_rgb_jpeg():
+    upload = _upload(Image.new("RGB", (600, 800), "red"), "JPEG")
+    assert normalize_image(upload) == upload.getvalue()
+
+
+def test_normalize_image_flattens_transparency_and_caps_size():
+    upload = _upload(Image.new("RGBA", (3000, 1000), (0, 0, 255, 0)), "PNG")
+    with Image.open(BytesIO(normalize_image(upload, max_dimension=1500))) as page:
+        assert page.format == "JPEG"
+        assert page.mode == "RGB"
+        assert page.size == (1500, 500)
+        assert page.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_normalize_image_applies_exif_orientation():
+    img = Image.new("RGB", (400, 200), "green")
+    exif = img.getexif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise
+    with Image.open(BytesIO(normalize_image(_upload(img, "JPEG", exif=exif)))) as page:
+        assert page.size == (200, 400)
+
+
+def test_image_metadata_reads_header():
+    data = _upload(Image.new("RGB", (600, 800), "red"), "PNG", dpi=(300, 300)).getvalue()
+    assert image_metadata(data) == {"width": 600, "height": 800, "bytes": len(data), "codec": "png", "dpi": 300}
+    assert image_metadata(data, dpi=150)["dpi"] == 150
+
+    jpeg = _upload(Image.new("RGB", (600, 800), "red"), "JPEG").getvalue()
+    assert image_metadata(jpeg)["codec"] == "jpeg"
+
+
+def test_build_pdf_embeds_jpeg_without_recompression(tmp_path):
+    jpeg = _upload(Image.new("RGB", (300, 400), "red"), "JPEG").getvalue()
+    png = _upload(Image.new("RGBA", (200, 200), (0, 255, 0, 128)), "PNG").getvalue()
+    output_path = tmp_path / "combined.pdf"
+
+    assert build_pdf(iter([jpeg, png, jpeg]), output_path, dpi=72) == 3
+
+    data = output_path.read_bytes()
+    assert data.startswith(b"%PDF-1.4")
+    assert data.count(jpeg) == 2
+    assert data.count(b"/Type /Page ") == 3
+    assert b"/MediaBox [0 0 300.0000 400.0000]" in data
+    # startxref points at the cross-reference table
+    xref_offset = int(data.rsplit(b"startxref", 1)[1].split()[0])
+    assert data[xref_offset : xref_offset + 4] == b"xref"
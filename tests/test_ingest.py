@@ -0,0 +1,90 @@
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from komm_vqa import db
+from komm_vqa.cli import _worker_service, find_pdfs
+from komm_vqa.ingest.pipeline import (
+    CHECKPOINT_KEY,
+    STATUS_COMPLETE,
+    STATUS_IN_PROGRESS,
+    copy_to_storage,
+    default_title,
+    is_complete,
+    new_storage_path,
+    remove_on_error,
+    save_upload,
+)
+
+
+def test_default_title():
+    assert default_title("보고서 2024.pdf") == "보고서 2024"
+    assert default_title(" report.v2.pdf") == "report"
+
+
+def test_new_storage_path_is_unique(tmp_path: Path):
+    first = new_storage_path(tmp_path, "doc.pdf")
+    second = new_storage_path(tmp_path, "doc.pdf")
+    assert first != second
+    assert first.parent == tmp_path
+    assert first.name.endswith("_doc.pdf")
+
+
+def test_copy_to_storage(tmp_path: Path):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(b"%PDF-1.4")
+    storage = tmp_path / "storage"
+    storage.mkdir()
+
+    saved = copy_to_storage(src, storage)
+
+    assert saved.parent == storage
+    assert saved.read_bytes() == b"%PDF-1.4"
+
+
+def test_find_pdfs(tmp_path: Path):
+    (tmp_path / "b.pdf").touch()
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "a.PDF").touch()
+    (tmp_path / "notes.txt").touch()
+
+    assert find_pdfs(tmp_path) == [tmp_path / "b.pdf", tmp_path / "nested" / "a.PDF"]
+
+
+def test_remove_on_error_deletes_file(tmp_path: Path):
+    saved = tmp_path / "saved.pdf"
+    saved.write_bytes(b"%PDF-1.4")
+
+    with pytest.raises(RuntimeError), remove_on_error(saved):
+        raise RuntimeError
+
+    assert not saved.exists()
+
+
+def test_save_upload_streams_from_start(tmp_path: Path):
+    upload = BytesIO(b"%PDF-1.4 body")
+    upload.read()  # Streamlit may have consumed the buffer already
+
+    save_upload(upload, tmp_path / "saved.pdf")
+
+    assert (tmp_path / "saved.pdf").read_bytes() == b"%PDF-1.4 body"
+
+
+def test_is_complete():
+    assert is_complete(None)
+    assert is_complete({"other": 1})
+    assert is_complete({CHECKPOINT_KEY: {"status": STATUS_COMPLETE, "pages_done": 3}})
+    assert not is_complete({CHECKPOINT_KEY: {"status": STATUS_IN_PROGRESS, "pages_done": 1}})
+
+
+def test_worker_service_skips_schema_setup(monkeypatch):
+    def setup(engine):
+        raise AssertionError("workers must not set up the schema")
+
+    monkeypatch.setattr(db, "ensure_schema", setup)
+    _worker_service.cache_clear()
+    try:
+        assert _worker_service("postgresql+psycopg://postgres:@localhost:1/none") is not None
+    finally:
+        _worker_service.cache_clear()
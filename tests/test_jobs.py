@@ -0,0 +1,217 @@
+import os
+from unittest.mock import Mock
+
+import pytest
+from autorag_research.orm.service.multi_modal_ingestion import MultiModalIngestionService
+from sqlalchemy import delete, update
+from sqlalchemy.exc import OperationalError
+
+from komm_vqa.db import build_db_url, create_service, get_env_db_config
+from komm_vqa.ingest import jobs
+from komm_vqa.ingest.jobs import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_KIND_BUILD_PDF,
+    JOB_KIND_INGEST,
+    JOB_KIND_THUMBNAILS,
+    JOB_RUNNING,
+    MAX_ATTEMPTS,
+    claim_job,
+    enqueue_job,
+    ingest_job,
+    run_job,
+    run_worker,
+)
+from komm_vqa.ingest.pipeline import IngestResult, report_progress
+
+# Service for tests whose database calls are all patched out
+NO_SERVICE = Mock(spec=MultiModalIngestionService)
+
+
+def _job(**values) -> dict:
+    return {
+        "id": "job-1",
+        "kind": JOB_KIND_INGEST,
+        "pdf_path": "/nonexistent/upload.pdf",
+        "filename": "upload.pdf",
+        "title": "upload",
+        "sha256": None,
+        "options": {},
+        "document_id": None,
+        **values,
+    }
+
+
+@pytest.fixture
+def finished(monkeypatch) -> list[tuple]:
+    calls = []
+    monkeypatch.setattr(jobs, "finish_job", lambda service, job_id, status, **values: calls.append((job_id, status)))
+    monkeypatch.setattr(jobs, "find_document_by_path", lambda service, path: None)
+    return calls
+
+
+def test_run_job_fails_job_with_unknown_profile(finished):
+    assert run_job(NO_SERVICE, _job(options={"profile": "no-such-profile"})) == JOB_FAILED
+    assert finished == [("job-1", JOB_FAILED)]
+
+
+def test_run_build_pdf_job_sends_heartbeats(monkeypatch, finished):
+    heartbeats = []
+    monkeypatch.setattr(jobs, "update_job", lambda service, job_id, **values: heartbeats.append(values))
+    monkeypatch.setattr(jobs, "enqueue_thumbnails_job", lambda service, job, document_id: "job-2")
+
+    def build(service, document_id, pdf_path, progress):
+        for pages_done in (8, 16):
+            progress(pages_done, 20)
+        return 20
+
+    monkeypatch.setattr(jobs, "build_document_pdf", build)
+    run_job(NO_SERVICE, _job(kind=JOB_KIND_BUILD_PDF, document_id="doc-1"))
+    assert heartbeats == [{"pages_done": 8, "page_count": 20}, {"pages_done": 16, "page_count": 20}]
+
+
+def test_finished_ingestion_queues_thumbnails_job(monkeypatch, finished):
+    queued = []
+    monkeypatch.setattr(jobs, "update_job", lambda service, job_id, **values: None)
+    monkeypatch.setattr(jobs, "ingest_pdf", lambda *args, **kwargs: IngestResult("doc-1", 3))
+    monkeypatch.setattr(jobs, "enqueue_thumbnails_job", lambda service, job, document_id: queued.append(document_id))
+
+    assert run_job(NO_SERVICE, _job()) == JOB_DONE
+    assert finished == [("job-1", JOB_DONE)]
+    assert queued == ["doc-1"]
+
+
+def test_thumbnails_job_precomputes_thumbnails(monkeypatch, finished):
+    calls = []
+
+    def precompute(service, document_id, progress):
+        calls.append(document_id)
+        progress(2, 1)
+        return 3
+
+    monkeypatch.setattr(jobs, "update_job", lambda service, job_id, **values: calls.append(values))
+    monkeypatch.setattr(jobs, "precompute_thumbnails", precompute)
+    assert run_job(NO_SERVICE, _job(kind=JOB_KIND_THUMBNAILS, document_id="doc-1")) == JOB_DONE
+    assert calls == ["doc-1", {"pages_done": 3}]
+    assert finished == [("job-1", JOB_DONE)]
+
+
+def test_report_progress():
+    calls = []
+    pages = list(report_progress(iter([b"a", b"b", b"c", b"d", b"e"]), 5, lambda *args: calls.append(args), every=2))
+    assert pages == [b"a", b"b", b"c", b"d", b"e"]
+    assert calls == [(2, 5), (4, 5)]
+
+
+def test_run_worker_survives_errors(monkeypatch):
+    claims = iter([OperationalError("SELECT", {}, Exception("connection lost")), _job(), None])
+
+    def claim(service, worker, stale_after):
+        result = next(claims)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def crash(service, job):
+        raise OperationalError("UPDATE", {}, Exception("connection lost"))
+
+    monkeypatch.setattr(jobs, "claim_job", claim)
+    monkeypatch.setattr(jobs, "run_job", crash)
+    assert run_worker(NO_SERVICE, poll_interval=0, once=True) == 1
+
+
+@pytest.fixture
+def service():
+    # The tests empty the job queue, so they only run against a dedicated test database
+    if "TEST_DB_NAME" not in os.environ:
+        pytest.skip("TEST_DB_NAME is not set")
+    try:
+        service = create_service(build_db_url({**get_env_db_config(), "database": os.environ["TEST_DB_NAME"]}))
+    except OperationalError:
+        pytest.skip("PostgreSQL is not available")
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        uow.session.execute(delete(ingest_job))
+        uow.commit()
+    yield service
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        uow.session.execute(delete(ingest_job))
+        uow.commit()
+
+
+def _set(service, job_id: str, **values) -> None:
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        uow.session.execute(update(ingest_job).where(ingest_job.c.id == job_id).values(**values))
+        uow.commit()
+
+
+def test_claim_job(service, tmp_path):
+    first = enqueue_job(service, tmp_path / "a.pdf", "a.pdf", "a")
+    second = enqueue_job(service, tmp_path / "b.pdf", "b.pdf", "b")
+
+    job = claim_job(service, "worker-1")
+    assert job is not None
+    assert (job["id"], job["status"], job["worker"], job["attempts"]) == (first, JOB_RUNNING, "worker-1", 1)
+    job = claim_job(service, "worker-2")
+    assert job is not None
+    assert job["id"] == second
+    assert claim_job(service, "worker-3") is None
+
+
+def test_claim_job_reclaims_stale_jobs(service, tmp_path):
+    job_id = enqueue_job(service, tmp_path / "a.pdf", "a.pdf", "a")
+    assert claim_job(service, "worker-1") is not None
+    assert claim_job(service, "worker-2", stale_after=3600) is None
+
+    # The first worker stopped sending heartbeats
+    job = claim_job(service, "worker-2", stale_after=0)
+    assert job is not None
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "worker-2", 2)
+
+
+def test_claim_job_fails_jobs_that_keep_killing_workers(service, tmp_path):
+    job_id = enqueue_job(service, tmp_path / "a.pdf", "a.pdf", "a")
+    _set(service, job_id, status=JOB_RUNNING, attempts=MAX_ATTEMPTS)
+
+    assert claim_job(service, "worker-1", stale_after=0) is None
+    with service._create_uow() as uow:
+        assert uow.session is not None
+        status, error = uow.session.execute(
+            ingest_job.select().with_only_columns(ingest_job.c.status, ingest_job.c.error)
+        ).one()
+    assert status == JOB_FAILED
+    assert error == "Worker stopped responding"
+
+
+def test_claimed_job_is_requeued_when_interrupted(service, tmp_path, monkeypatch):
+    job_id = enqueue_job(service, tmp_path / "a.pdf", "a.pdf", "a", options={"profile": "default"})
+    job = claim_job(service, "worker-1")
+    assert job is not None
+
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(jobs, "find_document_by_path", lambda service, path: None)
+    monkeypatch.setattr(jobs, "ingest_pdf", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        run_job(service, job)
+    requeued = claim_job(service, "worker-2")
+    assert requeued is not None
+    assert (requeued["id"], requeued["attempts"]) == (job_id, 2)
+
+
+def test_finished_ingestion_queues_thumbnails_job_in_database(service, tmp_path, monkeypatch):
+    job_id = enqueue_job(service, tmp_path / "a.pdf", "a.pdf", "a", options={"profile": "default"})
+    job = claim_job(service, "worker-1")
+    assert job is not None
+
+    monkeypatch.setattr(jobs, "find_document_by_path", lambda service, path: None)
+    monkeypatch.setattr(jobs, "ingest_pdf", lambda *args, **kwargs: IngestResult("doc-1", 3))
+    assert run_job(service, job) == JOB_DONE
+
+    thumbnails_job = claim_job(service, "worker-2")
+    assert thumbnails_job is not None
+    assert thumbnails_job["id"] != job_id
+    assert (thumbnails_job["kind"], thumbnails_job["document_id"]) == (JOB_KIND_THUMBNAILS, "doc-1")
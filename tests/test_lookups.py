@@ -0,0 +1,26 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from komm_vqa.db import get_schema
+from komm_vqa.ingest.lookups import metadata_only
+
+
+def _compiled(model) -> str:
+    return str(select(model).options(*metadata_only(model)).compile(dialect=postgresql.dialect()))
+
+
+def test_metadata_only_leaves_out_payload_columns():
+    schema = get_schema()
+
+    page_sql = _compiled(schema.Page)
+    assert "page.page_metadata" in page_sql
+    assert "image_contents" not in page_sql
+
+    chunk_sql = _compiled(schema.ImageChunk)
+    assert "image_chunk.parent_page" in chunk_sql
+    assert "image_chunk.contents" not in chunk_sql
+    assert "embedding" not in chunk_sql
+
+
+def test_metadata_only_ignores_other_models():
+    assert metadata_only(get_schema().Document) == []
@@ -0,0 +1,51 @@
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from komm_vqa.ingest.phash import DUPLICATE_MAX_DISTANCE, HASH_CHUNK_LENGTH, HASH_CHUNKS, dhash
+
+
+def _page(size=(600, 800), fmt="JPEG", **save_options) -> bytes:
+    img = Image.new("RGB", (600, 800), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((50, 50, 550, 200), fill="black")
+    draw.ellipse((150, 350, 450, 700), fill="gray")
+    buffer = BytesIO()
+    img.resize(size).save(buffer, format=fmt, **save_options)
+    return buffer.getvalue()
+
+
+def test_dhash_format():
+    h = dhash(_page())
+    assert len(h) == 16
+    int(h, 16)
+
+
+def test_dhash_ignores_reencoding_and_rescaling():
+    reference = dhash(_page(quality=90))
+    assert dhash(_page(quality=50)) == reference
+    assert dhash(_page(size=(450, 600), quality=90)) == reference
+    assert dhash(_page(fmt="PNG")) == reference
+
+
+def test_dhash_differs_for_different_pages():
+    other = Image.new("RGB", (600, 800), "white")
+    ImageDraw.Draw(other).rectangle((300, 0, 600, 800), fill="black")
+    buffer = BytesIO()
+    other.save(buffer, format="PNG")
+    assert dhash(buffer.getvalue()) != dhash(_page())
+
+
+def test_near_duplicates_share_a_hash_chunk():
+    reference = dhash(_page())
+    assert len(reference) == HASH_CHUNKS * HASH_CHUNK_LENGTH
+
+    def chunks(h: str) -> list[str]:
+        return [h[i * HASH_CHUNK_LENGTH : (i + 1) * HASH_CHUNK_LENGTH] for i in range(HASH_CHUNKS)]
+
+    # Flip DUPLICATE_MAX_DISTANCE bits spread over every chunk but one
+    value = int(reference, 16)
+    for i in range(DUPLICATE_MAX_DISTANCE):
+        value ^= 1 << (i * HASH_CHUNK_LENGTH * 4)
+    near = f"{value:016x}"
+    assert any(a == b for a, b in zip(chunks(near), chunks(reference), strict=True))
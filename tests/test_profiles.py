@@ -0,0 +1,32 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from komm_vqa.ingest.profiles import DEFAULT_PROFILE, PROFILES, RasterProfile, get_profile, profile_from_dict
+from komm_vqa.ingest.rasterize import encode_page
+
+
+def test_get_profile():
+    assert get_profile("default") == DEFAULT_PROFILE
+    with pytest.raises(ValueError):
+        get_profile("missing")
+
+
+def test_profile_round_trip():
+    for profile in PROFILES.values():
+        assert profile_from_dict(profile.to_dict()) == profile
+
+
+def test_describe():
+    assert PROFILES["compact"].describe() == "120 DPI, WEBP q75, max 1600px"
+    assert PROFILES["lossless"].describe() == "150 DPI, PNG"
+
+
+@pytest.mark.parametrize("codec", ["jpeg", "webp", "png"])
+def test_encode_page(codec):
+    profile = RasterProfile("test", codec=codec, max_dimension=100)
+    data = encode_page(Image.new("RGB", (400, 200), "white"), profile)
+    with Image.open(BytesIO(data)) as img:
+        assert img.format == profile.pil_format
+        assert img.size == (100, 50)
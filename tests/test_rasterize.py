@@ -0,0 +1,19 @@
+import pytest
+
+from komm_vqa.ingest.rasterize import page_windows
+
+
+def test_page_windows():
+    assert list(page_windows(19, 8)) == [(1, 8), (9, 16), (17, 19)]
+    assert list(page_windows(8, 8)) == [(1, 8)]
+    assert list(page_windows(0, 8)) == []
+
+
+def test_page_windows_rejects_empty_window():
+    with pytest.raises(ValueError):
+        list(page_windows(10, 0))
+
+
+def test_page_windows_from_checkpoint():
+    assert list(page_windows(19, 8, first_page=7)) == [(7, 14), (15, 19)]
+    assert list(page_windows(19, 8, first_page=20)) == []
@@ -0,0 +1,39 @@
+from io import BytesIO
+
+from PIL import Image
+
+from komm_vqa.ingest.renditions import MEDIUM, RENDITION_SIZES, THUMBNAIL, make_renditions, make_thumbnail, open_scaled
+
+
+def _jpeg(size: tuple[int, int]) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_make_renditions():
+    full_size, renditions = make_renditions(_jpeg((1240, 1754)))
+    assert full_size == (1240, 1754)
+    assert [r.name for r in renditions] == [THUMBNAIL, MEDIUM]
+    for r in renditions:
+        assert max(r.width, r.height) == RENDITION_SIZES[r.name]
+        with Image.open(BytesIO(r.contents)) as img:
+            assert img.size == (r.width, r.height)
+
+
+def test_make_renditions_skips_medium_for_small_pages():
+    full_size, renditions = make_renditions(_jpeg((600, 800)))
+    assert full_size == (600, 800)
+    assert [(r.name, r.width, r.height) for r in renditions] == [(THUMBNAIL, 150, 200)]
+
+
+def test_make_thumbnail_matches_full_decode_size():
+    image = _jpeg((2480, 3508))
+    fast = make_thumbnail(image, (200, 200))
+    full = make_thumbnail(image, (200, 200), draft=False)
+    assert (fast.width, fast.height) == (full.width, full.height) == (141, 200)
+
+
+def test_open_scaled_decodes_jpeg_at_reduced_size():
+    img = open_scaled(_jpeg((2480, 3508)), (200, 200))
+    assert 200 <= max(img.size) < 3508 / 4